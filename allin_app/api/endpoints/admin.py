@@ -1,8 +1,121 @@
-# Placeholder for Admin REST endpoints (Phase 4)
-from fastapi import APIRouter
+# Admin REST endpoints (Phase 4)
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import BaseModel
+from typing import Optional
+
+from allin_app.core.config import settings
+from allin_app.core.dependencies import (get_interaction_manager, get_knowledge_sync, get_loop_monitor, get_rag_handler,
+                                         get_ready_interaction_manager)
+from allin_app.core.interaction import InteractionManager
+from allin_app.core.logging_config import logger
+from allin_app.rag.sync import KnowledgeSync
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
+# --- Pydantic Models ---
+class SyncKnowledgeRequest(BaseModel):
+    source_dir: Optional[str] = None # Defaults to RAG_SOURCE_DIR; must be inside it
+
+class SyncJobResponse(BaseModel):
+    job_id: str
+    status: str
+    source_dir: str
+    error: Optional[str] = None
+    elapsed_seconds: Optional[float] = None
+    current_file: Optional[str] = None
+    files_total: int
+    files_processed: int
+    files_unchanged: int
+    files_changed: int
+    files_deleted: int
+    chunks_added: int
+    chunks_reused: int
+    chunks_tombstoned: int
+# ---------------------------------
+
+@router.post("/sync_knowledge", response_model=SyncJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def start_knowledge_sync(request: SyncKnowledgeRequest = None, sync: KnowledgeSync = Depends(get_knowledge_sync)):
+    """Starts an incremental knowledge sync in the background. Poll the returned job for progress."""
+    source_dir = (request.source_dir if request else None) or settings.rag_source_dir
+    logger.info(f"Knowledge sync requested for {source_dir}")
+    try:
+        job = sync.start(source_dir)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except (FileNotFoundError, ValueError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return job.as_dict()
+
+@router.get("/sync_knowledge/{job_id}", response_model=SyncJobResponse)
+async def get_knowledge_sync_job(job_id: str, sync: KnowledgeSync = Depends(get_knowledge_sync)):
+    """Returns progress for a sync job."""
+    job = sync.jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Sync job {job_id} not found.")
+    return job.as_dict()
+
+@router.delete("/sync_knowledge/{job_id}", response_model=SyncJobResponse)
+async def cancel_knowledge_sync_job(job_id: str, sync: KnowledgeSync = Depends(get_knowledge_sync)):
+    """Requests cancellation; the job stops after the current file. Re-running the sync resumes it."""
+    job = sync.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Sync job {job_id} not found.")
+    logger.info(f"Cancellation requested for knowledge sync {job_id}")
+    return job.as_dict()
+
+@router.get("/answer_cache")
+async def get_answer_cache_stats(rag=Depends(get_rag_handler)):
+    """RAG answer cache: entries, hit rate, hit latency, age of served answers, stale/invalidated entries."""
+    if rag.answer_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **rag.answer_cache.get_stats()}
+
+@router.get("/live_sessions")
+async def get_live_session_stats(manager: InteractionManager = Depends(get_interaction_manager)):
+    """Live API session pool: idle/detached/in-use sessions, hit rate and connect/acquire latency."""
+    if manager.live_sessions is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="AI Service not configured.")
+    return manager.live_sessions.get_stats()
+
+@router.get("/admission")
+async def get_admission_stats(manager: InteractionManager = Depends(get_interaction_manager)):
+    """Admission control: open sessions, active/queued turns, queue wait percentiles and rejections by reason."""
+    return manager.admission.get_stats()
+
+@router.get("/streaming")
+async def get_streaming_stats(manager: InteractionManager = Depends(get_interaction_manager)):
+    """Response streaming: time to first event (end to end and from the upstream send) and inter-chunk gaps."""
+    return manager.streaming_stats.get_stats()
+
+@router.get("/memory_context")
+async def get_memory_context_stats(manager: InteractionManager = Depends(get_interaction_manager)):
+    """Memory context packing: tokens sent and saved, duplicates and already-sent memories skipped."""
+    return manager.context_builder.get_stats()
+
+@router.get("/session_handles")
+async def get_session_handle_stats(manager: InteractionManager = Depends(get_ready_interaction_manager)):
+    """Session resumption handle store: entries, hit rate, expired and evicted handles (counters are per worker)."""
+    return manager.session_handles.get_stats()
+
+@router.get("/code_outputs")
+async def get_code_output_spool_stats(manager: InteractionManager = Depends(get_ready_interaction_manager)):
+    """Code output spool: bytes stored, blobs written, deduplicated and pruned."""
+    if manager.blob_spool is None:
+        return {"enabled": False}
+    return {"enabled": True, **manager.blob_spool.get_stats()}
+
+@router.get("/startup")
+async def get_startup_stats(manager: InteractionManager = Depends(get_interaction_manager)):
+    """Lifecycle state and how long each component took to initialize (they start concurrently)."""
+    return {"state": manager.state, "startup_ms": manager.startup_ms}
+
+@router.get("/event_loop")
+async def get_event_loop_stats(reset: bool = False, monitor=Depends(get_loop_monitor)):
+    """Event-loop lag percentiles over the recent window; `reset=true` starts a new window (load-test stages)."""
+    stats = monitor.get_stats()
+    if reset:
+        monitor.reset()
+    return stats
+
 # Example endpoints (to be implemented):
-# /sync_knowledge
 # /system-prompt
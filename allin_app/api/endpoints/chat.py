@@ -1,12 +1,19 @@
 # Placeholder for Chat REST endpoints (Phase 4)
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any, Type
+import asyncio
+import json
 import logging
+import os
+import time
 
 from allin_app.core.interaction import InteractionManager
-from allin_app.core.dependencies import get_interaction_manager # Import the dependency getter
-from allin_app.core.logging_config import logger
+from allin_app.core.dependencies import get_ready_interaction_manager # Import the dependency getter
+from allin_app.core.config import settings
+from allin_app.core.logging_config import logger, truncate_payload
+from allin_app.core.executor import ExecutorSaturatedError
 
 # Remove prefix here, it's added in main.py
 router = APIRouter(tags=["Chat Management"])
@@ -15,9 +22,18 @@ router = APIRouter(tags=["Chat Management"])
 class ChatHistoryListResponse(BaseModel):
     chat_ids: List[str] # Assuming client.users() returns a list of user IDs
 
+class ChatSummary(BaseModel):
+    chat_id: str
+    title: Optional[str] = None # First user message, truncated
+    created_at: str # ISO 8601, UTC
+    last_active: str
+    turn_count: int
+
 class UserChatsListResponse(BaseModel):
     user_id: str
-    chat_ids: List[str]
+    chat_ids: List[str] # Same order as `chats`
+    chats: List[ChatSummary] = Field(default_factory=list)
+    next_cursor: Optional[str] = None
 
 # --- Models for Detailed History --- 
 class MemoryItem(BaseModel):
@@ -30,19 +46,64 @@ class ChatHistoryDetailResponse(BaseModel):
     user_id: str
     chat_id: str # Added chat_id
     memories: List[MemoryItem]
+
+# --- Models for Raw Transcript (chat_turns) ---
+class ChatTurnItem(BaseModel):
+    id: int
+    role: str
+    content: str
+    timestamp: str # ISO 8601, UTC
+
+class ChatTurnsPageResponse(BaseModel):
+    user_id: str
+    chat_id: str
+    turns: List[ChatTurnItem] # Newest first
+    next_cursor: Optional[str] = None # Pass back as `cursor` for older turns; None on the last page
 # ---------------------------------
 
+# --- NDJSON streaming ---
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def _wants_ndjson(request: Request, stream: bool) -> bool:
+    """Streaming is opt-in: `?stream=true` or an `Accept: application/x-ndjson` header."""
+    return stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+async def _ndjson_stream(first_page: Optional[list], more_pages: Optional[AsyncIterator[list]],
+                         model: Type[BaseModel], label: str):
+    """Validates items against `model` and emits one JSON line per item, one page per chunk.
+
+    Only the current page is held in memory. Errors after the response has
+    started are reported as a final {"error": ...} line.
+    """
+    started = time.perf_counter()
+    items = size = 0
+    try:
+        page = first_page
+        while page is not None:
+            chunk = "".join(model(**item).model_dump_json() + "\n" for item in page)
+            items += len(page)
+            size += len(chunk)
+            yield chunk
+            page = await anext(more_pages, None) if more_pages else None
+    except Exception as e:
+        logger.error(f"NDJSON stream for {label} aborted after {items} item(s): {e}", exc_info=True)
+        yield json.dumps({"error": f"Stream aborted after {items} item(s)."}) + "\n"
+    finally:
+        logger.info(f"Streamed {items} item(s), {size} bytes for {label} in {(time.perf_counter() - started) * 1000:.1f} ms.")
+
 @router.get("/history", response_model=ChatHistoryListResponse)
-async def get_chat_history(manager: InteractionManager = Depends(get_interaction_manager)):
+async def get_chat_history(manager: InteractionManager = Depends(get_ready_interaction_manager)):
     """Retrieve a list of all known chat session IDs (user IDs)."""
     logger.info("Attempting to retrieve chat history list (user IDs).")
+    chat_ids = []
     try:
         client = manager.memory_manager.memory_client
         if client:
             try:
                 logger.info("Attempting to retrieve user list from memory client.")
-                users_response = client.users()
-                logger.info(f"Received response from users() method (type: {type(users_response)}): {users_response}")
+                # Offloaded to the memory executor so the event loop keeps serving WebSockets
+                users_response = await manager.memory_manager.list_users()
+                logger.opt(lazy=True).debug("users() response: {}", lambda: truncate_payload(users_response))
  
                 # --- Updated Parsing Logic --- 
                 # Check if the response is a dictionary and has the 'results' key
@@ -51,13 +112,19 @@ async def get_chat_history(manager: InteractionManager = Depends(get_interaction
                     if isinstance(results_list, list):
                         # Extract the 'name' (user_id) from each user object in the list
                         chat_ids = [user.get('name') for user in results_list if isinstance(user, dict) and 'name' in user]
-                        logger.info(f"Successfully extracted chat IDs (user IDs): {chat_ids}")
+                        logger.info(f"Successfully extracted {len(chat_ids)} chat IDs (user IDs).")
                     else:
-                        logger.warning(f"'results' key in users_response is not a list: {results_list}")
+                        logger.warning(f"'results' key in users_response is not a list: {truncate_payload(results_list)}")
                 else:
-                    logger.warning(f"Unexpected response structure from memory_client.users(): {users_response}. Expected dict with 'results' key.")
+                    logger.warning(f"Unexpected response structure from memory_client.users(): {truncate_payload(users_response)}. Expected dict with 'results' key.")
                 # -----------------------------
  
+            except asyncio.TimeoutError:
+                logger.error("Timed out retrieving user list from memory client.")
+                raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="Memory service timed out.")
+            except ExecutorSaturatedError as e:
+                logger.warning(f"Memory executor saturated while listing users: {e}")
+                raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Memory service busy, retry later.")
             except Exception as e:
                 logger.error(f"Error retrieving chat history from memory client: {e}", exc_info=True)
                 raise HTTPException(
@@ -66,6 +133,8 @@ async def get_chat_history(manager: InteractionManager = Depends(get_interaction
                 )
         return {"chat_ids": chat_ids}
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error retrieving chat history from mem0ai: {e}", exc_info=True)
         raise HTTPException(
@@ -73,14 +142,72 @@ async def get_chat_history(manager: InteractionManager = Depends(get_interaction
             detail="Failed to retrieve chat history."
         )
 
-@router.get("/history/{user_id}/{chat_id}", response_model=ChatHistoryDetailResponse)
+@router.get("/history/{user_id}/{chat_id}", response_model=ChatTurnsPageResponse)
 async def get_user_chat_history(
+    user_id: str,
+    chat_id: str,
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, description="Turns per page (default HISTORY_PAGE_SIZE)."),
+    cursor: Optional[str] = Query(None, description="`next_cursor` from the previous page."),
+    stream: bool = Query(False, description="Stream every turn from `cursor` on as NDJSON."),
+    manager: InteractionManager = Depends(get_ready_interaction_manager)
+):
+    """Retrieve one page of the raw transcript for a chat, newest turn first.
+
+    Uses keyset pagination on (timestamp, id), so each page costs the same no
+    matter how far back it is. With `?stream=true` (or `Accept:
+    application/x-ndjson`) the whole transcript is streamed as one ChatTurnItem
+    per line, read page by page.
+    """
+    writer = manager.history_writer
+    if not writer:
+        logger.warning("Chat history store not available.")
+        raise HTTPException(status_code=503, detail="Chat history unavailable.")
+    streaming = _wants_ndjson(request, stream)
+    if streaming:
+        limit = settings.history_stream_page_size
+    else:
+        limit = min(limit or settings.history_page_size, settings.history_max_page_size)
+    try:
+        if not cursor:
+            # Make turns still queued in the writer visible on the first page
+            await writer.flush()
+        turns, next_cursor = await asyncio.to_thread(writer.store.get_page, user_id, chat_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error reading chat history for user {user_id}, chat {chat_id}: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve chat history for user {user_id}, chat {chat_id}."
+        )
+    if streaming:
+        async def older_pages(page_cursor: Optional[str]):
+            while page_cursor:
+                page, page_cursor = await asyncio.to_thread(writer.store.get_page, user_id, chat_id, limit, page_cursor)
+                yield page
+        return StreamingResponse(
+            _ndjson_stream(turns, older_pages(next_cursor), ChatTurnItem, f"history {user_id}/{chat_id}"),
+            media_type=NDJSON_MEDIA_TYPE)
+    logger.info(f"Returning {len(turns)} turn(s) for user {user_id}, chat {chat_id} (more: {next_cursor is not None}).")
+    return ChatTurnsPageResponse(user_id=user_id, chat_id=chat_id, turns=turns, next_cursor=next_cursor)
+
+@router.get("/memories/{user_id}/{chat_id}", response_model=ChatHistoryDetailResponse)
+async def get_user_chat_memories(
     user_id: str, 
     chat_id: str, # Added chat_id
-    manager: InteractionManager = Depends(get_interaction_manager)
+    request: Request,
+    stream: bool = Query(False, description="Stream memories as NDJSON, one MemoryItem per line."),
+    manager: InteractionManager = Depends(get_ready_interaction_manager)
 ):
-    """Retrieve all memories for a specific user ID and chat ID."""
+    """Retrieve all memories (summarized by the memory store) for a specific user ID and chat ID.
+
+    With `?stream=true` (or `Accept: application/x-ndjson`) memories are read
+    page by page and streamed as they are validated, instead of being collected
+    into a single response.
+    """
     logger.info(f"Attempting to retrieve memory history for user_id: {user_id}, chat_id: {chat_id}")
+    streaming = _wants_ndjson(request, stream)
     memories_data = []
     client = manager.memory_manager.memory_client
     if client:
@@ -91,13 +218,20 @@ async def get_user_chat_history(
                     {"metadata": {"chat_id": chat_id}}
                 ]
             }
+            if streaming:
+                # The first page is read here so upstream errors still map to HTTP status codes
+                pages = manager.memory_manager.iter_all(user_id=user_id, filters=filters)
+                first_page = await anext(pages, None)
+                return StreamingResponse(
+                    _ndjson_stream(first_page, pages, MemoryItem, f"memories {user_id}/{chat_id}"),
+                    media_type=NDJSON_MEDIA_TYPE)
+
             logger.info(f"Calling memory_client.get_all for user: {user_id} with filter: {filters}")
             # Passing user_id directly and chat_id via filters
-            raw_memories = client.get_all(user_id=user_id, filters=filters) 
-            logger.info(f"Received response from get_all() for {user_id}/{chat_id} (type: {type(raw_memories)}): {raw_memories}")
-            # --- Add detailed logging for debugging filter --- 
-            logger.debug(f"RAW MEMORIES structure for {user_id}/{chat_id} with filter {filters}: {raw_memories}")
-            # --- End detailed logging --- 
+            raw_memories = await manager.memory_manager.get_all(user_id=user_id, filters=filters)
+            # Payloads can be large: counts at info level, a bounded excerpt at debug level
+            logger.opt(lazy=True).debug("get_all() response for {}/{}: {}", lambda: user_id, lambda: chat_id,
+                                        lambda: truncate_payload(raw_memories))
  
             # Basic validation/parsing - adjust based on actual return type!
             if isinstance(raw_memories, list):
@@ -108,10 +242,16 @@ async def get_user_chat_history(
                  if isinstance(results_list, list):
                     memories_data = results_list
                  else:
-                    logger.warning(f"'results' key in get_all response is not a list: {results_list}")
+                    logger.warning(f"'results' key in get_all response is not a list: {truncate_payload(results_list)}")
             else:
-                 logger.warning(f"Unexpected response structure from memory_client.get_all(): {raw_memories}")
+                 logger.warning(f"Unexpected response structure from memory_client.get_all(): {truncate_payload(raw_memories)}")
 
+        except asyncio.TimeoutError:
+            logger.error(f"Timed out retrieving memory history for user {user_id}, chat {chat_id}.")
+            raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="Memory service timed out.")
+        except ExecutorSaturatedError as e:
+            logger.warning(f"Memory executor saturated for user {user_id}, chat {chat_id}: {e}")
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Memory service busy, retry later.")
         except AttributeError:
              # This might occur if get_all doesn't exist or filters aren't supported as expected
              logger.error(f"MemoryClient method error (likely get_all or filters). User: {user_id}, Chat: {chat_id}", exc_info=True)
@@ -135,62 +275,74 @@ async def get_user_chat_history(
         return ChatHistoryDetailResponse(user_id=user_id, chat_id=chat_id, memories=validated_memories)
     except Exception as pydantic_e: # Catch potential Pydantic validation errors
         logger.error(f"Failed to validate memory data for user {user_id}, chat {chat_id}: {pydantic_e}", exc_info=True)
-        logger.error(f"Raw data causing validation error: {memories_data}")
+        logger.error(f"Raw data causing validation error: {truncate_payload(memories_data)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Memory data format error for user {user_id}, chat {chat_id}."
         )
 
 @router.get("/chats/{user_id}", response_model=UserChatsListResponse)
-async def list_user_chats(user_id: str, manager: InteractionManager = Depends(get_interaction_manager)):
-    """Lists unique chat IDs associated with a given user ID based on memory metadata."""
-    logger.info(f"Attempting to list chat IDs for user_id: {user_id}")
-    chat_ids = set()
-    client = manager.memory_manager.memory_client
+async def list_user_chats(
+    user_id: str,
+    sort: str = Query("last_active", pattern="^(last_active|created_at)$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    limit: Optional[int] = Query(None, ge=1, description="Chats per page (default HISTORY_PAGE_SIZE)."),
+    cursor: Optional[str] = Query(None, description="`next_cursor` from the previous page."),
+    manager: InteractionManager = Depends(get_ready_interaction_manager)
+):
+    """Lists a user's chats from the chat index (one row per chat), most recently active first by default."""
+    writer = manager.history_writer
+    if not writer:
+        logger.warning("Chat history store not available.")
+        raise HTTPException(status_code=503, detail="Chat history unavailable.")
+    limit = min(limit or settings.history_page_size, settings.history_max_page_size)
+    try:
+        if not cursor:
+            # Index entries are written with the turns; include turns still queued in the writer
+            await writer.flush()
+        chats, next_cursor = await asyncio.to_thread(
+            writer.store.list_chats, user_id, limit, cursor, sort, order == "desc")
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error listing chats for user {user_id}: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to list chats for user {user_id}."
+        )
+    logger.info(f"Found {len(chats)} chat(s) for user {user_id} (more: {next_cursor is not None}).")
+    return UserChatsListResponse(
+        user_id=user_id, chat_ids=[chat["chat_id"] for chat in chats], chats=chats, next_cursor=next_cursor)
 
-    if client:
-        try:
-            # Retrieve all memories for the user, we'll filter chat_ids locally
-            logger.info(f"Calling memory_client.get_all for user: {user_id} to extract chat IDs.")
-            # Note: This could be inefficient if a user has a vast number of memories.
-            # Consider pagination or if mem0 offers metadata aggregation in the future.
-            all_memories = client.get_all(user_id=user_id)
-            logger.debug(f"Received raw memories for user {user_id}: {all_memories}")
-
-            # Process the response to extract chat_ids from metadata
-            memories_list = []
-            if isinstance(all_memories, list):
-                memories_list = all_memories
-            elif isinstance(all_memories, dict) and 'results' in all_memories:
-                results = all_memories.get('results', [])
-                if isinstance(results, list):
-                    memories_list = results
-
-            # Extract chat_id from metadata
-            for memory in memories_list:
-                if isinstance(memory, dict):
-                    metadata = memory.get('metadata')
-                    if isinstance(metadata, dict):
-                        chat_id = metadata.get('chat_id')
-                        if chat_id and isinstance(chat_id, str):
-                            chat_ids.add(chat_id)
-            
-            logger.info(f"Found {len(chat_ids)} unique chat IDs for user {user_id}: {chat_ids}")
+def _read_blocks(f, block_size: int = 1 << 16):
+    with f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                return
+            yield block
 
-        except AttributeError:
-             logger.error(f"MemoryClient method error (likely get_all). User: {user_id}", exc_info=True)
-             raise HTTPException(status_code=501, detail="Memory retrieval method not implemented correctly.")
-        except Exception as e:
-            logger.error(f"Error retrieving memories to list chats for user {user_id}: {e}", exc_info=True)
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed to retrieve data to list chats for user {user_id}."
-            )
-    else:
-        logger.warning("Memory client not available.")
-        raise HTTPException(status_code=503, detail="Memory service unavailable.")
+@router.get("/code_outputs/{digest}", response_class=StreamingResponse)
+async def get_code_output(digest: str, manager: InteractionManager = Depends(get_ready_interaction_manager)):
+    """Full output of a code execution that was too large to send inline (the `url` of its code_result event).
 
-    return UserChatsListResponse(user_id=user_id, chat_ids=list(chat_ids))
+    Blobs are named by the sha256 of their content, so the digest doubles as the
+    ETag; they are cacheable until the spool expires them.
+    """
+    path = manager.blob_spool.path(digest) if manager.blob_spool else None
+    try:
+        # Opened up front: pruning may remove the blob at any time, and an open file stays readable
+        f = await asyncio.to_thread(open, path, "rb") if path else None
+    except FileNotFoundError:
+        f = None
+    if f is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Code output not found or expired.")
+    size = os.fstat(f.fileno()).st_size
+    return StreamingResponse(_read_blocks(f), media_type="text/plain; charset=utf-8", headers={
+        "Content-Length": str(size),
+        "ETag": f'"{digest}"',
+        "Cache-Control": f"private, max-age={int(settings.code_output_spool_ttl_seconds)}",
+    })
 
 # Example endpoints (to be implemented):
 # /start
@@ -1,10 +1,26 @@
-# Placeholder for Health check endpoint (already basic in main.py)
-# Can be expanded here if needed later.
-from fastapi import APIRouter
+# Health endpoints: readiness (/health/ready) and Prometheus metrics (/metrics)
+# Liveness stays the plain /health in main.py (it answers while the app is still initializing).
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from allin_app.core.dependencies import get_interaction_manager
+from allin_app.core.interaction import InteractionManager
+from allin_app.core.metrics import registry
 
 router = APIRouter(tags=["Health"])
 
-# @router.get("/health")
-# async def detailed_health_check():
-#     # Add more detailed checks if required
-#     return {"status": "ok", "details": "All systems nominal"}
+@router.get("/health/ready")
+async def readiness_check(manager: InteractionManager = Depends(get_interaction_manager)):
+    """Checks the Live API, memory backend and session handle store. Results are cached (HEALTH_CHECK_TTL_SECONDS).
+
+    503 while the app is starting or shutting down, or when a critical dependency (the Live API) is unavailable.
+    """
+    if manager.state != "ready":
+        return JSONResponse({"ready": False, "state": manager.state, "checks": {}}, status_code=503)
+    result = await manager.health.check()
+    return JSONResponse(result, status_code=200 if result["ready"] else 503)
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Stage latency histograms, counters and runtime gauges in the Prometheus text format (per worker)."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,20 +1,40 @@
 # WebSocket endpoint logic (Phase 2)
+import asyncio
+import time
+from typing import Optional
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
 from ...core.interaction import InteractionManager # Adjusted import path
-from google.genai import types # Import types for config
-from ...core.logging_config import logger # Adjusted import path
+from ...core.logging_config import debug_sampled, logger # Adjusted import path
 from ...core.dependencies import get_interaction_manager # Import the dependency getter
-import json # Import json for parsing incoming data
+from ...core.admission import AdmissionRejected
+from ...core.config import settings
+from ...core.metrics import WS_BYTES_SENT, WS_FRAMES_SENT, observe_stage
+from ..protocol import END_OF_TURN, negotiate, send_event
 
 router = APIRouter()
 
 # Add user_id and chat_id to the path for immediate identification and handle retrieval
 @router.websocket("/ws/{user_id}/{chat_id}")
 async def websocket_endpoint(websocket: WebSocket, user_id: str, chat_id: str, manager: InteractionManager = Depends(get_interaction_manager)):
-    client_host = websocket.client.host
-    client_port = websocket.client.port
-    logger.info(f"WebSocket connection accepted from {client_host}:{client_port} for user '{user_id}', chat '{chat_id}'")
-    await websocket.accept()
+    client = websocket.client # None when the server (or a test client) does not report the peer
+    client_host, client_port = (client.host, client.port) if client else ("unknown", 0)
+    # --- Negotiate wire protocol ---
+    # Clients offer versions via Sec-WebSocket-Protocol (or ?protocol= where they cannot set it);
+    # no offer means the original JSON protocol. Only a subprotocol the client offered in the
+    # header is echoed back: RFC 6455 clients fail the handshake on any other.
+    subprotocol, codec = negotiate(list(websocket.scope.get("subprotocols") or []))
+    if subprotocol is None and websocket.query_params.get("protocol"):
+        _, codec = negotiate([websocket.query_params["protocol"]])
+    await websocket.accept(subprotocol=subprotocol)
+    logger.info(f"WebSocket connection accepted from {client_host}:{client_port} for user '{user_id}', chat '{chat_id}' (protocol {codec.name})")
+
+    # --- Lifecycle: wait for startup to finish; turn away connections once shutdown begins ---
+    if not manager.accepting or not await manager.wait_ready(settings.startup_wait_seconds):
+        reason = "Server is starting" if manager.accepting else "Server is shutting down"
+        logger.warning(f"Closing WebSocket from {client_host}:{client_port}: {reason.lower()} ({manager.state}).")
+        # 1013 Try Again Later
+        await websocket.close(code=1013, reason=reason)
+        return
 
     # Use the injected InteractionManager instance ('manager')
     try:
@@ -33,119 +53,199 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str, chat_id: str, m
         await websocket.close(code=1011, reason="AI Service Unavailable")
         return
 
-    # --- Prepare Live API Config ---
-    system_prompt_text = manager.get_system_prompt()
+    # --- Admission: global / per-user session caps ---
+    try:
+        manager.admission.open_session(user_id)
+        turn_weight = manager.admission.weight_for(user_id) # this user's share of the turn queue
+    except AdmissionRejected as e:
+        logger.warning(f"Rejected WebSocket session for user '{user_id}' from {client_host}:{client_port}: {e.reason}")
+        await send_event(websocket, codec, {"type": "busy", "content": str(e), "reason": e.reason})
+        # 1013 Try Again Later
+        await websocket.close(code=1013, reason=str(e))
+        return
+
+    # --- Acquire Live API Session ---
     # Retrieve the handle for this specific user
-    initial_handle = manager.get_session_handle(user_id)
-    logger.info(f"Attempting connection with session handle: {initial_handle}")
-
-    # Use LiveConnectConfig class
-    live_config = types.LiveConnectConfig(
-        response_modalities=["TEXT"],
-        # Add Session Resumption config
-        session_resumption=types.SessionResumptionConfig(
-            handle=initial_handle
-        ),
-        # Add Context Window Compression config
-        context_window_compression=types.ContextWindowCompressionConfig(
-            sliding_window=types.SlidingWindow(), # Use default sliding window
-        )
-    )
-
-    # Add system instruction if available
-    if system_prompt_text:
-        live_config.system_instruction = types.Content(
-            parts=[types.Part(text=system_prompt_text)])
-        logger.info("System instruction included in Live API config.")
-    else:
+    initial_handle = await asyncio.to_thread(manager.get_session_handle, user_id, chat_id)
+    logger.info(f"Attempting connection with session handle: {'found' if initial_handle else 'none'}")
+    if not manager.system_prompt:
         logger.warning("No system prompt loaded, proceeding without system instruction.")
     # -----------------------------
 
+    lease = None
     try:
-        # --- Configure tools for the Live API session --- 
-        tools = [types.Tool(code_execution=types.ToolCodeExecution())]
-        # Add the tools to the existing live_config object
-        live_config.tools = tools
-        logger.info(f"Live API config now includes tools: {live_config.tools}")
-        # ---------------------------------------
-
-        # --- Establish Live API Session --- 
-        logger.info(f"Connecting to Live API model: {manager.live_model_name}")
-
-        async with manager.client.aio.live.connect(
-            model=manager.live_model_name, 
-            config=live_config # Pass the updated LiveConnectConfig object with tools
-        ) as session:
-            logger.info(f"Live API session established for connection from {client_host}:{client_port}")
-            
-            # --- Interaction Loop --- 
-            # Listen for messages from the WebSocket client
-            async for raw_data in websocket.iter_text(): # Changed variable name
-                logger.debug(f"Received raw data via WebSocket from {client_host}:{client_port}: {raw_data}")
-
-                # --- Parse Incoming JSON ---
-                try:
-                    data = json.loads(raw_data)
+        # Prefetch the user's memory profile concurrently with the upstream handshake
+        manager.prefetch_memory(user_id)
+        # The pool reattaches this chat's recently released session, hands out a
+        # pre-warmed one, or connects (resuming with the handle) as a fallback.
+        # ?reconnect=1 marks a client reconnecting mid-conversation: resume even under LIVE_POOL_RESUME_POLICY=reconnect.
+        # Config (system prompt, tools, resumption) is built by manager.build_live_config.
+        reconnect = websocket.query_params.get("reconnect", "").lower() in ("1", "true", "yes")
+        lease = await manager.live_sessions.acquire(user_id, chat_id, initial_handle, reconnect=reconnect)
+        session = lease.session
+        logger.info(f"Live API session ({lease.source}) established for connection from {client_host}:{client_port}")
+        
+        # --- Interaction Loop (full duplex) --- 
+        # reader: decodes client frames (text or binary) into `inbound`. A new message or a
+        #   {"type": "cancel"} interrupts the turn in progress instead of waiting behind it.
+        # writer: sends events from `outbound`. The queue is bounded, so a slow client pauses
+        #   the turn, which stops reading the upstream stream (backpressure).
+        inbound: asyncio.Queue = asyncio.Queue(maxsize=settings.ws_receive_queue_size)
+        outbound: asyncio.Queue = asyncio.Queue(maxsize=settings.ws_send_queue_size)
+        current_turn: Optional[asyncio.Task] = None
+        sent = {"frames": 0, "bytes": 0}
+
+        def interrupt(reason: str):
+            if current_turn is not None and not current_turn.done():
+                logger.info(f"Interrupting turn for user {user_id} ({reason}).")
+                current_turn.cancel()
+
+        async def reader():
+            try:
+                while True:
+                    frame = await websocket.receive()
+                    if frame["type"] == "websocket.disconnect":
+                        break
+                    raw_data = frame.get("text") if frame.get("text") is not None else frame.get("bytes")
+                    if debug_sampled(): # per frame: sampled
+                        logger.debug(f"Received {len(raw_data or '')} byte frame via WebSocket from {client_host}:{client_port}")
+
+                    # --- Parse Incoming Frame ---
+                    try:
+                        data = codec.decode(raw_data)
+                    except ValueError as e:
+                        logger.warning(f"Received undecodable frame from {client_host}:{client_port}: {e}")
+                        await outbound.put({"type": "error", "content": f"Error: {e}"})
+                        continue # Skip processing this message
+                    if data.get("type") == "cancel":
+                        interrupt("cancel requested")
+                        continue
                     # user_id is now obtained from the path parameter
                     message = data.get("message")
-
                     if message is None:
-                        logger.warning(f"Received invalid message structure: {raw_data}")
-                        await websocket.send_text(json.dumps({"type": "error", "content": "Invalid message format. 'message' is required."}))
+                        logger.warning(f"Received invalid message structure from {client_host}:{client_port}.")
+                        await outbound.put({"type": "error", "content": "Invalid message format. 'message' is required."})
                         continue # Skip processing this message
-
-                except json.JSONDecodeError:
-                    logger.warning(f"Received invalid JSON from {client_host}:{client_port}: {raw_data}")
-                    await websocket.send_text("Error: Invalid JSON format.")
-                    continue # Skip processing this message
-                # --------------------------
-
-                # Process the message using the live session
-                # Pass user_id and message extracted from JSON
+                    # --------------------------
+
+                    # The newest message supersedes the answer in progress
+                    interrupt("new message")
+                    try:
+                        inbound.put_nowait(message)
+                    except asyncio.QueueFull:
+                        await outbound.put({"type": "busy", "content": "Too many pending messages.", "reason": "queue_full"})
+            except WebSocketDisconnect:
+                pass
+            finally:
+                interrupt("client disconnected")
+                if inbound.full():
+                    inbound.get_nowait() # pending messages are moot once the client is gone
+                inbound.put_nowait(None)
+
+        async def writer():
+            alive = True
+            while True:
+                event = await outbound.get()
+                if event is None:
+                    break
+                if not alive:
+                    continue # keep draining so producers never block on a dead socket
                 try:
-                    async for response_part in manager.process_live_message(
+                    # Send the structured response part in the negotiated encoding
+                    send_started = time.perf_counter()
+                    size = await send_event(websocket, codec, event)
+                    observe_stage("websocket_send", time.perf_counter() - send_started)
+                    WS_FRAMES_SENT.inc()
+                    WS_BYTES_SENT.inc(size)
+                    sent["bytes"] += size
+                    sent["frames"] += 1
+                except Exception as e:
+                    alive = False
+                    logger.debug(f"Stopped sending to {client_host}:{client_port}: {e!r}")
+
+        async def run_turn(message: str):
+            frames = 0
+            try:
+                # Per-user rate limit, then a weighted fair share of the upstream's concurrent-turn capacity
+                async with manager.admission.turn(user_id, weight=turn_weight):
+                    stream = manager.process_live_message(
                         live_session=session,
                         user_id=user_id, # Pass user_id
                         chat_id=chat_id, # Pass chat_id
                         message=message, # Pass message content
                         websocket=websocket
-                    ):
-                        # Send the structured response part as a JSON string
-                        await websocket.send_text(json.dumps(response_part))
-
-                        # --- Handle Session Resumption Updates --- 
-                        # Check for session resumption updates within the response stream
-                        if response_part.get('type') == 'session_resumption_update':
-                            update_data = response_part.get('content') # Assuming content holds the update details
-                            if update_data and isinstance(update_data, dict):
-                                is_resumable = update_data.get('resumable')
-                                new_handle = update_data.get('new_handle')
-                                if is_resumable and new_handle:
-                                    # Store the new handle for this user
-                                    manager.set_session_handle(user_id, new_handle)
-                                    logger.info(f"Received and stored new session handle for user {user_id}.")
-                                elif not is_resumable:
-                                    # Session became non-resumable, clear the handle
-                                    manager.set_session_handle(user_id, None)
-                                    logger.warning(f"Session for user {user_id} became non-resumable. Cleared handle.")
-                        # -----------------------------------------
-
-                        # Indicate the end of the response stream (optional, depends on client needs)
-                        await websocket.send_text(json.dumps({"type": "end_of_response"}))
-                except Exception as e:
-                    logger.error(f"Error during message processing for {client_host}:{client_port}: {e}", exc_info=True)
-            # -----------------------
-
-        logger.info(f"Live API session closed for {client_host}:{client_port}")
+                    )
+                    try:
+                        async for response_part in stream:
+                            await outbound.put(response_part)
+                            frames += 1
+                            if response_part.get('type') == 'api_error':
+                                lease.healthy = False # don't reuse this upstream stream
+                    finally:
+                        # Runs the generator's cleanup now (records a partial response on interrupt)
+                        await stream.aclose()
+            except AdmissionRejected as e:
+                logger.warning(f"Turn for user {user_id} not admitted: {e.reason} (retry after {e.retry_after}s)")
+                await outbound.put({"type": "busy", "content": str(e), "reason": e.reason, "retry_after": e.retry_after})
+            except Exception as e:
+                lease.healthy = False
+                logger.error(f"Error during message processing for {client_host}:{client_port}: {e}", exc_info=True)
+            if debug_sampled(): # per turn: sampled
+                logger.debug(f"Turn for user {user_id} produced {frames} frame(s).")
+
+        reader_task = asyncio.create_task(reader())
+        writer_task = asyncio.create_task(writer())
+        try:
+            while True:
+                message = await inbound.get()
+                if message is None:
+                    break
+                current_turn = asyncio.create_task(run_turn(message))
+                await asyncio.wait({current_turn})
+                interrupted = current_turn.cancelled()
+                current_turn = None
+
+                # An interrupted turn is still streaming upstream; read it to the end so the
+                # session can take the next message
+                if interrupted and lease.healthy and not await manager.drain_live_turn(
+                        session, user_id, chat_id, timeout=settings.ws_cancel_drain_timeout):
+                    lease.healthy = False
+                if not lease.healthy:
+                    # Replace a broken upstream session (resuming with the latest handle) instead of failing every later turn
+                    await manager.live_sessions.release(lease, user_id, chat_id)
+                    lease = None
+                    handle = await asyncio.to_thread(manager.get_session_handle, user_id, chat_id)
+                    lease = await manager.live_sessions.acquire(user_id, chat_id, handle, reconnect=True)
+                    session = lease.session
+
+                # Exactly one end-of-turn marker per response, also after errors and interrupts so clients never hang
+                await outbound.put({**END_OF_TURN, "interrupted": True} if interrupted else END_OF_TURN)
+        finally:
+            reader_task.cancel()
+            interrupt("connection closing")
+            await outbound.put(None)
+            await asyncio.gather(reader_task, writer_task, return_exceptions=True)
+            logger.debug(f"Sent {sent['frames']} frame(s), {sent['bytes']} bytes to {client_host}:{client_port} ({codec.name}).")
+        # -----------------------
+
+        logger.info(f"WebSocket loop ended for {client_host}:{client_port}")
         # -------------------------------
 
     except WebSocketDisconnect:
         logger.info(f"WebSocket disconnected from {client_host}:{client_port}")
         # TODO: Handle client disconnection (e.g., cleanup resources associated with chat_id)
     except Exception as e:
+        if lease is not None:
+            lease.healthy = False
         logger.error(f"Error during WebSocket/Live API interaction for {client_host}:{client_port}: {e}", exc_info=True)
         # Attempt to close gracefully, but connection might already be dead
         try:
             await websocket.close(code=1011, reason=f"Server error: {e}")
         except RuntimeError:
             pass # Connection likely already closed
+    finally:
+        manager.admission.close_session(user_id)
+        # Keep the session reattachable for a reconnect of this chat (closed if unhealthy or expired)
+        if lease is not None:
+            await manager.live_sessions.release(lease, user_id, chat_id)
+            logger.info(f"Live API session released for {client_host}:{client_port}")
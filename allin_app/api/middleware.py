@@ -0,0 +1,39 @@
+# ASGI middleware: a correlation ID per HTTP request / WebSocket connection, attached to every log record
+import uuid
+
+from allin_app.core.logging_config import logger
+
+REQUEST_ID_HEADER = b"x-request-id"
+
+
+class CorrelationIdMiddleware:
+    """Runs each request or WebSocket connection inside `logger.contextualize(request_id=...)`.
+
+    The ID comes from the client's X-Request-ID header when present (so it can
+    be followed across services) or is generated, and is echoed back on HTTP
+    responses. Tasks created while handling the connection (the /ws reader,
+    writer and turns) inherit it through contextvars.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        request_id = None
+        for name, value in scope.get("headers") or ():
+            if name == REQUEST_ID_HEADER:
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex[:16]
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(REQUEST_ID_HEADER, request_id.encode("latin-1"))]
+            await send(message)
+
+        with logger.contextualize(request_id=request_id):
+            await self.app(scope, receive, send_with_id if scope["type"] == "http" else send)
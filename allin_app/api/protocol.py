@@ -0,0 +1,241 @@
+# WebSocket wire protocol: versions, encodings and event framing for /ws
+import json
+import zlib
+from enum import IntEnum
+from typing import List, Optional, Tuple, Union
+
+from allin_app.core.config import settings
+
+try: # Optional: enables the binary encoding
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class EventType(IntEnum):
+    """Small integer event types used on the wire by protocol v2."""
+    UNKNOWN = 0 # name carried in the frame's extras
+    TEXT = 1
+    CODE = 2
+    CODE_RESULT = 3
+    CODE_ERROR = 4
+    API_ERROR = 5
+    ERROR = 6
+    END_OF_TURN = 7
+    SESSION_RESUMPTION_UPDATE = 8
+    BUSY = 9 # admission control: rate limited or over capacity; extras carry retry_after
+    CANCEL = 10 # client -> server: interrupt the turn in progress
+    CODE_OUTPUT_CHUNK = 11 # part of a large code output; the code_result / code_error that follows references the rest
+
+
+_EVENT_NAMES = {
+    "text": EventType.TEXT,
+    "code": EventType.CODE,
+    "code_result": EventType.CODE_RESULT,
+    "code_error": EventType.CODE_ERROR,
+    "api_error": EventType.API_ERROR,
+    "error": EventType.ERROR,
+    "end_of_response": EventType.END_OF_TURN,
+    "session_resumption_update": EventType.SESSION_RESUMPTION_UPDATE,
+    "busy": EventType.BUSY,
+    "cancel": EventType.CANCEL,
+    "code_output_chunk": EventType.CODE_OUTPUT_CHUNK,
+}
+_EVENT_BY_TYPE = {event_type: name for name, event_type in _EVENT_NAMES.items()}
+
+# Set on the type of a binary frame whose content is zlib-compressed UTF-8
+COMPRESSED_FLAG = 0x80
+
+END_OF_TURN = {"type": "end_of_response"}
+
+
+class Codec:
+    """Turns event dicts ({"type", "content", ...}) into WebSocket frames and back."""
+
+    name = "base"
+    binary = False
+
+    def encode(self, event: dict) -> Union[str, bytes]:
+        raise NotImplementedError
+
+    def decode(self, data: Union[str, bytes]) -> dict:
+        """Decodes a client frame. Raises ValueError if it cannot be parsed."""
+        raise NotImplementedError
+
+
+class LegacyJsonCodec(Codec):
+    """Protocol v1: one JSON object per text frame, event types as strings.
+
+    Used when the client does not ask for a protocol, so existing clients work
+    unchanged.
+    """
+
+    name = "allin.v1.json"
+
+    def encode(self, event: dict) -> str:
+        return json.dumps(event)
+
+    def decode(self, data: Union[str, bytes]) -> dict:
+        try:
+            decoded = json.loads(data)
+        except (json.JSONDecodeError, UnicodeDecodeError, TypeError) as e:
+            raise ValueError("Invalid JSON format.") from e
+        if not isinstance(decoded, dict):
+            raise ValueError("Expected a JSON object.")
+        return decoded
+
+
+def _to_frame(event: dict) -> list:
+    """[type], [type, content] or [type, content, extras]; extras hold any other keys."""
+    name = event.get("type")
+    event_type = _EVENT_NAMES.get(name, EventType.UNKNOWN)
+    extras = {key: value for key, value in event.items() if key not in ("type", "content")}
+    if event_type is EventType.UNKNOWN:
+        extras["type"] = name
+    frame = [int(event_type), event.get("content")]
+    if extras:
+        frame.append(extras)
+    elif frame[1] is None:
+        frame.pop() # e.g. end of turn: just [7]
+    return frame
+
+
+def _from_frame(frame) -> dict:
+    if not isinstance(frame, (list, tuple)) or not frame or not isinstance(frame[0], int):
+        raise ValueError("Expected a [type, content, extras?] frame.")
+    extras = frame[2] if len(frame) > 2 and isinstance(frame[2], dict) else {}
+    event = {"type": extras.get("type") or _EVENT_BY_TYPE.get(frame[0], "unknown")}
+    if len(frame) > 1 and frame[1] is not None:
+        event["content"] = frame[1]
+    event.update((key, value) for key, value in extras.items() if key != "type")
+    return event
+
+
+def _client_message(decoded) -> dict:
+    """Client frames may be a frame array or a plain {"message": ...} / {"type": "cancel"} object."""
+    if isinstance(decoded, dict):
+        return decoded
+    event = _from_frame(decoded)
+    return {"type": event["type"], "message": event.get("content"),
+            **{k: v for k, v in event.items() if k not in ("type", "content")}}
+
+
+class CompactJsonCodec(Codec):
+    """Protocol v2 over text frames: JSON arrays [type, content, extras?] with integer types."""
+
+    name = "allin.v2.json"
+
+    def encode(self, event: dict) -> str:
+        return json.dumps(_to_frame(event), separators=(",", ":"))
+
+    def decode(self, data: Union[str, bytes]) -> dict:
+        try:
+            decoded = json.loads(data)
+        except (json.JSONDecodeError, UnicodeDecodeError, TypeError) as e:
+            raise ValueError("Invalid JSON format.") from e
+        try:
+            return _client_message(decoded)
+        except (TypeError, AttributeError) as e:
+            raise ValueError("Malformed frame.") from e
+
+
+class MsgpackCodec(Codec):
+    """Protocol v2 over binary frames: MessagePack arrays [type, content, extras?].
+
+    String content of at least `compress_threshold` bytes (typically code
+    output) is sent as zlib-compressed UTF-8 bytes, with COMPRESSED_FLAG set on
+    the type. Small frames are not compressed, so streamed text deltas carry
+    no deflate overhead. 0 disables it: permessage-deflate, which uvicorn
+    negotiates by default, already compresses every frame, so this layer only
+    helps where a proxy strips that extension.
+
+    Compressed client frames may expand to at most `max_decompressed_bytes`.
+    """
+
+    name = "allin.v2.msgpack"
+    binary = True
+
+    def __init__(self, compress_threshold: int = 0, compress_level: int = 6, max_decompressed_bytes: int = 1 << 20):
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+        self.max_decompressed_bytes = max_decompressed_bytes
+
+    def encode(self, event: dict) -> bytes:
+        frame = _to_frame(event)
+        content = frame[1] if len(frame) > 1 else None
+        if self.compress_threshold and isinstance(content, str) and len(content) >= self.compress_threshold:
+            raw = content.encode("utf-8")
+            compressed = zlib.compress(raw, self.compress_level)
+            if len(compressed) < len(raw):
+                frame[0] |= COMPRESSED_FLAG
+                frame[1] = compressed
+        return msgpack.packb(frame, use_bin_type=True)
+
+    def decode(self, data: Union[str, bytes]) -> dict:
+        if isinstance(data, str):
+            # Tolerate text frames from simple clients
+            return LegacyJsonCodec().decode(data)
+        try:
+            frame = msgpack.unpackb(data, raw=False)
+        except Exception as e:
+            raise ValueError("Invalid MessagePack frame.") from e
+        if isinstance(frame, list) and len(frame) > 1 and isinstance(frame[0], int) and frame[0] & COMPRESSED_FLAG:
+            frame[0] &= ~COMPRESSED_FLAG
+            frame[1] = self._decompress(frame[1])
+        try:
+            return _client_message(frame)
+        except (TypeError, AttributeError) as e:
+            raise ValueError("Malformed frame.") from e
+
+    def _decompress(self, payload) -> str:
+        """Inflates client-supplied content, refusing anything that expands beyond `max_decompressed_bytes`."""
+        if not isinstance(payload, bytes):
+            raise ValueError("Compressed frame content must be bytes.")
+        decompressor = zlib.decompressobj()
+        try:
+            raw = decompressor.decompress(payload, self.max_decompressed_bytes)
+        except zlib.error as e:
+            raise ValueError("Invalid compressed frame.") from e
+        if decompressor.unconsumed_tail:
+            raise ValueError(f"Compressed frame expands beyond {self.max_decompressed_bytes} bytes.")
+        if not decompressor.eof:
+            raise ValueError("Truncated compressed frame.")
+        try:
+            return raw.decode("utf-8")
+        except UnicodeDecodeError as e:
+            raise ValueError("Compressed frame is not valid UTF-8.") from e
+
+
+def available_codecs() -> List[Codec]:
+    """Codecs in server preference order (binary first when msgpack is installed)."""
+    codecs: List[Codec] = []
+    if msgpack is not None:
+        codecs.append(MsgpackCodec(compress_threshold=settings.ws_compress_threshold,
+                                   max_decompressed_bytes=settings.ws_max_decompressed_bytes))
+    codecs.extend([CompactJsonCodec(), LegacyJsonCodec()])
+    return codecs
+
+
+def negotiate(offered: List[str]) -> Tuple[Optional[str], Codec]:
+    """Picks the codec for a connection from the client's Sec-WebSocket-Protocol offers.
+
+    Returns (subprotocol to echo back or None, codec). The client's order of
+    preference wins. Clients that offer nothing we support get protocol v1 JSON
+    with no subprotocol, as before.
+    """
+    codecs = {codec.name: codec for codec in available_codecs()}
+    for name in offered:
+        codec = codecs.get(name)
+        if codec is not None:
+            return name, codec
+    return None, LegacyJsonCodec()
+
+
+async def send_event(websocket, codec: Codec, event: dict) -> int:
+    """Encodes and sends one event. Returns the frame size in bytes."""
+    frame = codec.encode(event)
+    if codec.binary:
+        await websocket.send_bytes(frame)
+        return len(frame)
+    await websocket.send_text(frame)
+    return len(frame.encode("utf-8"))
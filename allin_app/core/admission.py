@@ -0,0 +1,294 @@
+# Admission control for Live sessions: session caps, per-user rate limits and a weighted fair turn queue
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, List, Optional
+
+from .metrics import ADMISSION_REJECTED
+
+
+class AdmissionRejected(Exception):
+    """Raised when a session or turn is not admitted. `reason` is sessions | user_sessions | rate_limited | busy."""
+
+    def __init__(self, reason: str, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self) -> float:
+        """Takes one token. Returns 0 on success, otherwise the seconds until one is available."""
+        now = time.monotonic()
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def full(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.burst
+
+
+class _Waiter:
+    __slots__ = ("user_id", "future", "cancelled")
+
+    def __init__(self, user_id: str, future: asyncio.Future):
+        self.user_id = user_id
+        self.future = future
+        self.cancelled = False
+
+
+class AdmissionController:
+    """Decides which WebSocket sessions and turns reach the upstream Live API.
+
+    - Sessions: at most `max_sessions` open WebSockets, `max_sessions_per_user` per user.
+    - Turns: each user's messages are rate limited by a token bucket
+      (`user_rate` per second, bursts of `user_burst`).
+    - Upstream capacity: at most `max_concurrent_turns` turns run at once.
+      Waiting turns are ordered by start-time fair queuing: each user's turns
+      get increasing virtual finish tags (1/weight apart), so a user with many
+      queued turns is interleaved with everyone else instead of going first,
+      and a user with weight 2 gets twice the share of one with weight 1.
+      Weights come from `user_weights` (user_id -> weight), else `default_weight`.
+    - A turn is rejected as "busy" up front when the estimated queue wait
+      (position / capacity x average turn time) exceeds `queue_slo_seconds`,
+      and when it has actually waited that long.
+    Runs on the event loop; not thread-safe.
+    """
+
+    def __init__(self, max_sessions: int = 200, max_sessions_per_user: int = 5, max_concurrent_turns: int = 32,
+                 user_rate: float = 0.5, user_burst: float = 5.0, queue_slo_seconds: float = 5.0,
+                 max_tracked_users: int = 10000, user_weights: Optional[Dict[str, float]] = None,
+                 default_weight: float = 1.0):
+        weights = dict(user_weights or {})
+        if default_weight <= 0 or any(weight <= 0 for weight in weights.values()):
+            raise ValueError("Admission weights must be positive.")
+        self.max_sessions = max_sessions
+        self.max_sessions_per_user = max_sessions_per_user
+        self.max_concurrent_turns = max_concurrent_turns
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.queue_slo_seconds = queue_slo_seconds
+        self.max_tracked_users = max_tracked_users
+        self.user_weights = weights
+        self.default_weight = default_weight
+
+        self._sessions: Dict[str, int] = {}
+        self._session_count = 0
+        self._buckets: Dict[str, TokenBucket] = {}
+
+        # --- Weighted fair queue ---
+        self._active_turns = 0
+        self._queue: List[tuple] = [] # (tag, seq, waiter)
+        self._queued = 0
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._user_finish: Dict[str, float] = {} # last virtual finish tag per user
+        self._turn_seconds: Optional[float] = None # EWMA of admitted turn duration
+
+        # --- Stats ---
+        self.sessions_admitted = 0
+        self.turns_admitted = 0
+        self.turns_queued = 0
+        self.rejected: Dict[str, int] = {"sessions": 0, "user_sessions": 0, "rate_limited": 0, "busy": 0,
+                                         "shutting_down": 0}
+        self.closed = False # set by close() when the server begins shutting down
+        self._queue_wait_ms: Deque[float] = deque(maxlen=1024)
+
+    @property
+    def session_count(self) -> int:
+        return self._session_count
+
+    @property
+    def active_turns(self) -> int:
+        return self._active_turns
+
+    @property
+    def queued_turns(self) -> int:
+        return self._queued
+
+    # --- Shutdown ---
+
+    def close(self):
+        """Rejects new sessions and turns from now on; admitted and queued turns still run."""
+        self.closed = True
+
+    def _reject_closed(self):
+        self.rejected["shutting_down"] += 1
+        ADMISSION_REJECTED.labels("shutting_down").inc()
+        raise AdmissionRejected("shutting_down", "The server is restarting. Please reconnect shortly.", retry_after=5.0)
+
+    async def wait_idle(self, timeout: float, poll_interval: float = 0.05) -> bool:
+        """Waits until no turn is running or queued; False if `timeout` seconds passed first."""
+        deadline = time.monotonic() + timeout
+        while self._active_turns or self._queued:
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(poll_interval)
+        return True
+
+    # --- Sessions ---
+
+    def open_session(self, user_id: str):
+        """Admits a WebSocket session or raises AdmissionRejected. Pair with close_session."""
+        if self.closed:
+            self._reject_closed()
+        if self._session_count >= self.max_sessions:
+            self.rejected["sessions"] += 1
+            ADMISSION_REJECTED.labels("sessions").inc()
+            raise AdmissionRejected("sessions", "Server is at capacity. Please try again shortly.")
+        if self._sessions.get(user_id, 0) >= self.max_sessions_per_user:
+            self.rejected["user_sessions"] += 1
+            ADMISSION_REJECTED.labels("user_sessions").inc()
+            raise AdmissionRejected("user_sessions", "Too many open sessions for this user.")
+        self._sessions[user_id] = self._sessions.get(user_id, 0) + 1
+        self._session_count += 1
+        self.sessions_admitted += 1
+
+    def close_session(self, user_id: str):
+        count = self._sessions.get(user_id, 0)
+        if count <= 1:
+            self._sessions.pop(user_id, None)
+        else:
+            self._sessions[user_id] = count - 1
+        self._session_count = max(0, self._session_count - 1)
+
+    # --- Turns ---
+
+    def _check_rate(self, user_id: str):
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            if len(self._buckets) >= self.max_tracked_users:
+                # Full buckets carry no state worth keeping
+                for key in [key for key, b in self._buckets.items() if b.full()]:
+                    del self._buckets[key]
+            bucket = self._buckets[user_id] = TokenBucket(self.user_rate, self.user_burst)
+        wait = bucket.take()
+        if wait:
+            self.rejected["rate_limited"] += 1
+            ADMISSION_REJECTED.labels("rate_limited").inc()
+            raise AdmissionRejected("rate_limited", "You are sending messages too quickly.", retry_after=round(wait, 2))
+
+    def _estimated_wait(self) -> float:
+        if self._active_turns < self.max_concurrent_turns and not self._queued:
+            return 0.0
+        if self._turn_seconds is None:
+            return 0.0 # no samples yet; only the hard SLO timeout applies
+        return (self._queued + 1) / self.max_concurrent_turns * self._turn_seconds
+
+    def _reject_busy(self, retry_after: float):
+        self.rejected["busy"] += 1
+        ADMISSION_REJECTED.labels("busy").inc()
+        raise AdmissionRejected("busy", "The assistant is busy. Please try again shortly.",
+                                retry_after=round(retry_after, 2))
+
+    async def _acquire_turn(self, user_id: str, weight: float):
+        if self._active_turns < self.max_concurrent_turns and not self._queued:
+            self._active_turns += 1
+            self._queue_wait_ms.append(0.0)
+            return
+        estimate = self._estimated_wait()
+        if estimate > self.queue_slo_seconds:
+            self._reject_busy(estimate)
+
+        tag = max(self._virtual_time, self._user_finish.get(user_id, 0.0)) + 1.0 / weight
+        self._user_finish[user_id] = tag
+        waiter = _Waiter(user_id, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queue, (tag, next(self._seq), waiter))
+        self._queued += 1
+        self.turns_queued += 1
+        started = time.perf_counter()
+        try:
+            done, _ = await asyncio.wait({waiter.future}, timeout=self.queue_slo_seconds)
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        if not done:
+            self._abandon(waiter)
+            self._reject_busy(self._turn_seconds or self.queue_slo_seconds)
+        self._queue_wait_ms.append((time.perf_counter() - started) * 1000)
+
+    def _abandon(self, waiter: _Waiter):
+        if waiter.future.done() and not waiter.future.cancelled():
+            self._release_turn() # granted just as we gave up; pass the slot on
+        elif not waiter.cancelled:
+            waiter.cancelled = True
+            waiter.future.cancel()
+            self._queued -= 1
+
+    def _release_turn(self):
+        self._active_turns -= 1
+        while self._queue:
+            tag, _, waiter = heapq.heappop(self._queue)
+            if waiter.cancelled:
+                continue
+            self._queued -= 1
+            self._virtual_time = tag
+            self._active_turns += 1
+            waiter.future.set_result(None)
+            break
+        if not self._queue and len(self._user_finish) > self.max_tracked_users:
+            self._user_finish = {u: t for u, t in self._user_finish.items() if t > self._virtual_time}
+
+    def weight_for(self, user_id: str) -> float:
+        """The user's fair-queue weight."""
+        return self.user_weights.get(user_id, self.default_weight)
+
+    @asynccontextmanager
+    async def turn(self, user_id: str, weight: Optional[float] = None):
+        """Holds an upstream turn slot for the body. Raises AdmissionRejected when rate limited or busy.
+
+        `weight` defaults to `weight_for(user_id)`.
+        """
+        if self.closed:
+            self._reject_closed()
+        self._check_rate(user_id)
+        await self._acquire_turn(user_id, self.weight_for(user_id) if weight is None else weight)
+        self.turns_admitted += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self._turn_seconds = elapsed if self._turn_seconds is None else 0.9 * self._turn_seconds + 0.1 * elapsed
+            self._release_turn()
+
+    # --- Stats ---
+
+    def get_stats(self) -> dict:
+        waits = sorted(self._queue_wait_ms)
+        return {
+            "sessions": self._session_count,
+            "max_sessions": self.max_sessions,
+            "users_connected": len(self._sessions),
+            "turns_active": self._active_turns,
+            "turns_queued": self._queued,
+            "max_concurrent_turns": self.max_concurrent_turns,
+            "avg_turn_seconds": round(self._turn_seconds, 3) if self._turn_seconds is not None else None,
+            "sessions_admitted": self.sessions_admitted,
+            "turns_admitted": self.turns_admitted,
+            "turns_waited": self.turns_queued,
+            "rejected": dict(self.rejected),
+            "queue_wait_ms": {
+                "p50": round(waits[len(waits) // 2], 2) if waits else 0.0,
+                "p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 2) if waits else 0.0,
+                "max": round(waits[-1], 2) if waits else 0.0,
+            },
+        }
@@ -0,0 +1,120 @@
+# Content-addressed local spool for large code-execution outputs, fetched by clients by reference
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from .logging_config import logger
+
+_DIGEST_RE = re.compile(r"[0-9a-f]{64}")
+
+
+class BlobRef(NamedTuple):
+    digest: str # sha256 of the UTF-8 content; also the file name
+    size: int # bytes
+
+
+class BlobSpool:
+    """Stores blobs as files named by their sha256, so identical outputs are stored once.
+
+    Blocking (file I/O and hashing); call from a worker thread. Blobs older
+    than `ttl_seconds` are removed, and the oldest ones once the spool exceeds
+    `max_bytes`; a re-stored blob counts as new. Files are written to a
+    temporary name and renamed, so readers never see a partial blob.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 1 << 30, ttl_seconds: float = 86400.0, prune_every: int = 64):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.prune_every = prune_every
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._since_prune = 0
+        self.bytes = sum(entry.stat().st_size for entry in os.scandir(root) if _DIGEST_RE.fullmatch(entry.name))
+
+        # --- Stats ---
+        self.puts = 0
+        self.deduplicated = 0
+        self.pruned = 0
+
+    def path(self, digest: str) -> Optional[str]:
+        """File path of a stored blob, or None (also for anything that is not a sha256 hex digest)."""
+        if not _DIGEST_RE.fullmatch(digest):
+            return None
+        path = os.path.join(self.root, digest)
+        return path if os.path.isfile(path) else None
+
+    def put_text(self, text: str, slice_chars: int = 1 << 20) -> BlobRef:
+        """Stores `text` (UTF-8) unless an identical blob exists. Returns its reference.
+
+        Encoded, hashed and written `slice_chars` at a time, so no full-size copy is made.
+        """
+        sha = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for start in range(0, len(text), slice_chars):
+                    data = text[start:start + slice_chars].encode("utf-8")
+                    sha.update(data)
+                    f.write(data)
+                    size += len(data)
+            digest = sha.hexdigest()
+            path = os.path.join(self.root, digest)
+            with self._lock:
+                self.puts += 1
+                if os.path.isfile(path):
+                    self.deduplicated += 1
+                    os.utime(path) # restarts its TTL
+                    os.unlink(tmp_path)
+                    return BlobRef(digest, size)
+                os.replace(tmp_path, path)
+                self.bytes += size
+                self._since_prune += 1
+                prune = self.bytes > self.max_bytes or self._since_prune >= self.prune_every
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        if prune:
+            self.prune()
+        return BlobRef(digest, size)
+
+    def prune(self):
+        """Removes expired blobs, then the oldest until the spool fits in `max_bytes`."""
+        with self._lock:
+            self._since_prune = 0
+            entries = []
+            for entry in os.scandir(self.root):
+                if _DIGEST_RE.fullmatch(entry.name):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            entries.sort()
+            total = sum(size for _, size, _ in entries)
+            expire_before = time.time() - self.ttl_seconds
+            for mtime, size, path in entries:
+                if mtime >= expire_before and total <= self.max_bytes:
+                    break
+                try:
+                    os.unlink(path)
+                except OSError as e:
+                    logger.warning(f"Could not remove spooled blob {path}: {e}")
+                    continue
+                total -= size
+                self.pruned += 1
+            self.bytes = total
+
+    def get_stats(self) -> dict:
+        return {
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "puts": self.puts,
+            "deduplicated": self.deduplicated,
+            "pruned": self.pruned,
+        }
@@ -2,7 +2,7 @@ import os
 from dotenv import load_dotenv
 from pydantic import Field
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional
 
 # Determine the project root directory dynamically
 # __file__ is the path to the current file (config.py)
@@ -19,6 +19,130 @@ class Settings(BaseSettings):
     google_api_key: Optional[str] = Field(None, validation_alias="GOOGLE_API_KEY")
     mem0_api_key: Optional[str] = Field(None, validation_alias="MEM0_API_KEY")
     log_level: str = Field("INFO", validation_alias="LOG_LEVEL")
+    log_format: str = Field("text", validation_alias="LOG_FORMAT") # 'text' or 'json' (one object per line)
+    log_file_enabled: bool = Field(True, validation_alias="LOG_FILE_ENABLED") # daily file under logs/ (text format)
+    log_enqueue: bool = Field(True, validation_alias="LOG_ENQUEUE") # write on a background thread
+    log_payload_max_bytes: int = Field(300, validation_alias="LOG_PAYLOAD_MAX_BYTES") # payload excerpts (UTF-8 bytes)
+    log_message_max_bytes: int = Field(8192, validation_alias="LOG_MESSAGE_MAX_BYTES") # per JSON record
+    log_debug_sample_rate: float = Field(0.01, validation_alias="LOG_DEBUG_SAMPLE_RATE") # high-volume debug events kept
+    # --- Memory layer (mem0 calls run on a dedicated bounded thread pool) ---
+    memory_backend: str = Field("mem0", validation_alias="MEMORY_BACKEND") # 'mem0' (cloud), 'local' (SQLite + NumPy) or 'fake'
+    local_memory_db_path: str = Field(os.path.join(PROJECT_ROOT, "data", "memory.db"), validation_alias="LOCAL_MEMORY_DB_PATH")
+    local_embedding_dim: int = Field(384, validation_alias="LOCAL_EMBEDDING_DIM")
+    memory_executor_workers: int = Field(8, validation_alias="MEMORY_EXECUTOR_WORKERS")
+    memory_executor_max_queue: int = Field(64, validation_alias="MEMORY_EXECUTOR_MAX_QUEUE")
+    memory_search_timeout: float = Field(3.0, validation_alias="MEMORY_SEARCH_TIMEOUT") # seconds
+    memory_add_timeout: float = Field(10.0, validation_alias="MEMORY_ADD_TIMEOUT") # seconds
+    memory_list_page_size: int = Field(500, validation_alias="MEMORY_LIST_PAGE_SIZE") # rows per page when streaming
+    memory_list_timeout: float = Field(10.0, validation_alias="MEMORY_LIST_TIMEOUT") # seconds (get_all / users)
+    memory_cache_max_entries: int = Field(2048, validation_alias="MEMORY_CACHE_MAX_ENTRIES") # 0 disables the cache
+    memory_cache_ttl: float = Field(60.0, validation_alias="MEMORY_CACHE_TTL") # seconds
+    # --- Per-turn memory context ---
+    memory_context_budget_ms: int = Field(300, validation_alias="MEMORY_CONTEXT_BUDGET_MS") # max wait for memory search per turn
+    memory_prefetch_query: str = Field(
+        "user background, preferences and current projects", validation_alias="MEMORY_PREFETCH_QUERY")
+    memory_context_candidates: int = Field(8, validation_alias="MEMORY_CONTEXT_CANDIDATES") # memories searched per turn
+    memory_context_token_budget: int = Field(400, validation_alias="MEMORY_CONTEXT_TOKEN_BUDGET") # estimated tokens
+    memory_context_duplicate_threshold: float = Field(0.6, validation_alias="MEMORY_CONTEXT_DUPLICATE_THRESHOLD") # shingle Jaccard
+    memory_context_relevance_weight: float = Field(0.7, validation_alias="MEMORY_CONTEXT_RELEVANCE_WEIGHT") # rest is recency
+    memory_context_recency_half_life_days: float = Field(30.0, validation_alias="MEMORY_CONTEXT_RECENCY_HALF_LIFE_DAYS")
+    # Sent memories are not repeated for this many turns, then resent when relevant: the Live context's
+    # sliding-window compression (build_live_config) drops old turns, so the model may no longer have them
+    memory_context_resend_after_turns: int = Field(20, validation_alias="MEMORY_CONTEXT_RESEND_AFTER_TURNS") # 0 always resends
+    # --- Write-behind memory ingestion ---
+    memory_ingest_batch_size: int = Field(16, validation_alias="MEMORY_INGEST_BATCH_SIZE") # turns per flush
+    memory_ingest_flush_interval: float = Field(2.0, validation_alias="MEMORY_INGEST_FLUSH_INTERVAL") # seconds
+    memory_ingest_max_pending: int = Field(1000, validation_alias="MEMORY_INGEST_MAX_PENDING")
+    memory_ingest_max_retries: int = Field(5, validation_alias="MEMORY_INGEST_MAX_RETRIES")
+    memory_ingest_spool_compact_bytes: int = Field(8 << 20, validation_alias="MEMORY_INGEST_SPOOL_COMPACT_BYTES") # acknowledged bytes before rewriting
+    memory_ingest_spool_path: Optional[str] = Field(
+        os.path.join(PROJECT_ROOT, "data", "memory_spool.jsonl"), validation_alias="MEMORY_INGEST_SPOOL_PATH")
+    # --- Live API session pool ---
+    live_pool_size: int = Field(2, validation_alias="LIVE_POOL_SIZE") # pre-warmed sessions; 0 disables pre-warming
+    live_pool_grace_seconds: float = Field(30.0, validation_alias="LIVE_POOL_GRACE_SECONDS") # reattach window after disconnect
+    live_pool_max_age_seconds: float = Field(480.0, validation_alias="LIVE_POOL_MAX_AGE_SECONDS") # retire before upstream limits
+    live_pool_maintenance_interval: float = Field(5.0, validation_alias="LIVE_POOL_MAINTENANCE_INTERVAL")
+    live_pool_resume_policy: str = Field("always", validation_alias="LIVE_POOL_RESUME_POLICY") # 'always' (reopened chats resume by handle) or 'reconnect' (pre-warmed unless ?reconnect=1)
+    live_connect_timeout: float = Field(15.0, validation_alias="LIVE_CONNECT_TIMEOUT")
+    # --- Admission control (WebSocket sessions and upstream turns) ---
+    admission_max_sessions: int = Field(200, validation_alias="ADMISSION_MAX_SESSIONS") # open WebSockets per worker
+    admission_max_sessions_per_user: int = Field(5, validation_alias="ADMISSION_MAX_SESSIONS_PER_USER")
+    admission_max_concurrent_turns: int = Field(32, validation_alias="ADMISSION_MAX_CONCURRENT_TURNS") # upstream turns in flight
+    admission_user_rate: float = Field(0.5, validation_alias="ADMISSION_USER_RATE") # messages per second per user
+    admission_user_burst: float = Field(5.0, validation_alias="ADMISSION_USER_BURST")
+    admission_queue_slo_seconds: float = Field(5.0, validation_alias="ADMISSION_QUEUE_SLO_SECONDS") # max queue wait
+    admission_user_weights: Dict[str, float] = Field({}, validation_alias="ADMISSION_USER_WEIGHTS") # JSON {"user_id": weight}; fair-queue share
+    admission_default_weight: float = Field(1.0, validation_alias="ADMISSION_DEFAULT_WEIGHT") # users not in ADMISSION_USER_WEIGHTS
+    # --- Live API session resumption handles ---
+    session_handle_backend: str = Field("sqlite", validation_alias="SESSION_HANDLE_BACKEND") # sqlite (shared by workers) | memory
+    session_handle_db_path: str = Field(
+        os.path.join(PROJECT_ROOT, "data", "session_handles.db"), validation_alias="SESSION_HANDLE_DB_PATH")
+    session_handle_ttl_seconds: float = Field(7200.0, validation_alias="SESSION_HANDLE_TTL_SECONDS") # upstream handles expire
+    session_handle_max_entries: int = Field(10000, validation_alias="SESSION_HANDLE_MAX_ENTRIES")
+    # --- WebSocket protocol ---
+    # App-level zlib of large msgpack frames; off by default since uvicorn already negotiates permessage-deflate.
+    # Enable only where a proxy strips that extension.
+    ws_compress_threshold: int = Field(0, validation_alias="WS_COMPRESS_THRESHOLD") # bytes; 0 disables (binary protocol only)
+    ws_max_decompressed_bytes: int = Field(1 << 20, validation_alias="WS_MAX_DECOMPRESSED_BYTES") # compressed client frames
+    ws_send_queue_size: int = Field(32, validation_alias="WS_SEND_QUEUE_SIZE") # events buffered for a slow client
+    ws_receive_queue_size: int = Field(4, validation_alias="WS_RECEIVE_QUEUE_SIZE") # messages waiting for a turn
+    ws_cancel_drain_timeout: float = Field(5.0, validation_alias="WS_CANCEL_DRAIN_TIMEOUT") # then the session is replaced
+    ws_text_flush_policy: str = Field("interval", validation_alias="WS_TEXT_FLUSH_POLICY") # immediate | interval | boundary
+    ws_text_flush_interval_ms: float = Field(40.0, validation_alias="WS_TEXT_FLUSH_INTERVAL_MS")
+    # --- Code execution output (large outputs are spooled and fetched by reference) ---
+    code_output_inline_max_chars: int = Field(65536, validation_alias="CODE_OUTPUT_INLINE_MAX_CHARS") # larger: chunked + spooled
+    code_output_chunk_chars: int = Field(32768, validation_alias="CODE_OUTPUT_CHUNK_CHARS") # per code_output_chunk frame
+    code_output_stream_max_chars: int = Field(262144, validation_alias="CODE_OUTPUT_STREAM_MAX_CHARS") # streamed before the reference
+    code_output_memory_chars: int = Field(2000, validation_alias="CODE_OUTPUT_MEMORY_CHARS") # head + tail kept in memory / history
+    code_output_spool_dir: Optional[str] = Field(
+        os.path.join(PROJECT_ROOT, "data", "code_outputs"), validation_alias="CODE_OUTPUT_SPOOL_DIR") # empty disables
+    code_output_spool_max_bytes: int = Field(1 << 30, validation_alias="CODE_OUTPUT_SPOOL_MAX_BYTES")
+    code_output_spool_ttl_seconds: float = Field(86400.0, validation_alias="CODE_OUTPUT_SPOOL_TTL_SECONDS")
+    # --- Chat history (raw turns) ---
+    history_backend: str = Field("sqlite", validation_alias="HISTORY_BACKEND")
+    history_db_path: str = Field(os.path.join(PROJECT_ROOT, "data", "history.db"), validation_alias="HISTORY_DB_PATH")
+    history_write_batch_size: int = Field(128, validation_alias="HISTORY_WRITE_BATCH_SIZE") # turns per insert
+    history_flush_interval: float = Field(0.5, validation_alias="HISTORY_FLUSH_INTERVAL") # seconds
+    history_max_pending: int = Field(10000, validation_alias="HISTORY_MAX_PENDING")
+    history_page_size: int = Field(50, validation_alias="HISTORY_PAGE_SIZE")
+    history_max_page_size: int = Field(500, validation_alias="HISTORY_MAX_PAGE_SIZE")
+    history_stream_page_size: int = Field(500, validation_alias="HISTORY_STREAM_PAGE_SIZE") # rows per read when streaming
+    # --- Knowledge base (RAG) ---
+    rag_index_dir: str = Field(os.path.join(PROJECT_ROOT, "data", "knowledge_index"), validation_alias="RAG_INDEX_DIR")
+    rag_chunk_size: int = Field(1000, validation_alias="RAG_CHUNK_SIZE") # characters
+    rag_chunk_overlap: int = Field(200, validation_alias="RAG_CHUNK_OVERLAP") # characters
+    rag_embed_batch_size: int = Field(64, validation_alias="RAG_EMBED_BATCH_SIZE") # chunks per embedding call
+    rag_top_k: int = Field(5, validation_alias="RAG_TOP_K")
+    rag_model_name: str = Field("gemini-2.0-flash", validation_alias="RAG_MODEL_NAME")
+    rag_source_dir: str = Field(os.path.join(PROJECT_ROOT, "knowledge"), validation_alias="RAG_SOURCE_DIR") # docs synced by /admin/sync_knowledge
+    rag_sync_workers: int = Field(2, validation_alias="RAG_SYNC_WORKERS") # parser processes per sync job
+    rag_retrieval_mode: str = Field("hybrid", validation_alias="RAG_RETRIEVAL_MODE") # 'hybrid' (BM25 + vector, RRF) or 'vector'
+    rag_candidate_k: int = Field(50, validation_alias="RAG_CANDIDATE_K") # candidates per retriever before fusion
+    rag_rrf_k: int = Field(60, validation_alias="RAG_RRF_K") # reciprocal rank fusion constant
+    rag_index_type: str = Field("flat", validation_alias="RAG_INDEX_TYPE") # 'flat' (exact) or 'ivf' (approximate)
+    rag_ivf_nlist: int = Field(1024, validation_alias="RAG_IVF_NLIST") # coarse clusters
+    rag_ivf_nprobe: int = Field(16, validation_alias="RAG_IVF_NPROBE") # clusters scanned per query
+    rag_ivf_min_rows: int = Field(50000, validation_alias="RAG_IVF_MIN_ROWS") # below this, search stays exact
+    rag_answer_cache_size: int = Field(1024, validation_alias="RAG_ANSWER_CACHE_SIZE") # cached answers; 0 disables
+    rag_answer_cache_threshold: float = Field(0.92, validation_alias="RAG_ANSWER_CACHE_THRESHOLD") # query cosine similarity
+    rag_answer_cache_ttl: float = Field(3600.0, validation_alias="RAG_ANSWER_CACHE_TTL") # seconds
+    # --- Readiness checks (/health/ready) ---
+    health_check_ttl_seconds: float = Field(15.0, validation_alias="HEALTH_CHECK_TTL_SECONDS") # cached between probes
+    health_check_timeout: float = Field(5.0, validation_alias="HEALTH_CHECK_TIMEOUT") # per dependency
+    # --- Startup / shutdown ---
+    startup_wait_seconds: float = Field(30.0, validation_alias="STARTUP_WAIT_SECONDS") # /ws connections wait this long for init
+    shutdown_drain_seconds: float = Field(20.0, validation_alias="SHUTDOWN_DRAIN_SECONDS") # in-flight turns and pending writes
+    # --- Offline fakes (load tests without upstream quota) ---
+    live_api_backend: str = Field("google", validation_alias="LIVE_API_BACKEND") # 'google' or 'fake' (see core/fakes.py)
+    fake_live_connect_ms: float = Field(150.0, validation_alias="FAKE_LIVE_CONNECT_MS") # session handshake
+    fake_live_first_token_ms: float = Field(300.0, validation_alias="FAKE_LIVE_FIRST_TOKEN_MS")
+    fake_live_token_rate: float = Field(50.0, validation_alias="FAKE_LIVE_TOKEN_RATE") # tokens per second
+    fake_live_jitter_ms: float = Field(5.0, validation_alias="FAKE_LIVE_JITTER_MS") # per chunk, +-
+    fake_live_response_tokens: int = Field(60, validation_alias="FAKE_LIVE_RESPONSE_TOKENS")
+    fake_live_code_probability: float = Field(0.0, validation_alias="FAKE_LIVE_CODE_PROBABILITY") # turns with code parts
+    fake_live_code_output_bytes: int = Field(2048, validation_alias="FAKE_LIVE_CODE_OUTPUT_BYTES")
+    fake_memory_latency_ms: float = Field(80.0, validation_alias="FAKE_MEMORY_LATENCY_MS") # per MEMORY_BACKEND=fake call
+    fake_memory_jitter_ms: float = Field(20.0, validation_alias="FAKE_MEMORY_JITTER_MS")
     # Add other settings as needed
     # Example: database_url: str = Field(None, validation_alias="DATABASE_URL")
 
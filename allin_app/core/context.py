@@ -0,0 +1,306 @@
+# Assembles per-turn memory context under a latency budget and packs it into a token budget
+import asyncio
+import hashlib
+import re
+import time
+import weakref
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from .logging_config import logger
+
+
+class MemoryContextAssembler:
+    """Fetches memory context for a turn without letting it dominate time-to-first-token.
+
+    `assemble` waits at most `budget_seconds` for the memory search. If the
+    search is late, the turn proceeds with the last context seen for that user
+    (or none), and the late result is stored as that user's last context so the
+    next turn can use it. `prefetch` warms the last context at connect time with
+    a generic profile query so the first turn has something to fall back on.
+    """
+
+    def __init__(
+        self,
+        memory_manager,
+        budget_seconds: float = 0.3,
+        profile_query: str = "user background, preferences and current projects",
+        profile_limit: int = 5,
+        candidate_limit: int = 5,
+        max_users: int = 4096,
+    ):
+        self.memory_manager = memory_manager
+        self.budget_seconds = budget_seconds
+        self.profile_query = profile_query
+        self.profile_limit = profile_limit
+        self.candidate_limit = candidate_limit
+        self.max_users = max_users
+        self._last_context: "OrderedDict[str, List[dict]]" = OrderedDict()
+        self._background: Set[asyncio.Task] = set() # keep references to late/prefetch tasks
+
+        # --- Stats ---
+        self.on_time = 0
+        self.late = 0
+        self.fallback_used = 0
+        self.prefetches = 0
+
+    def _remember(self, user_id: str, memories: List[dict]):
+        if not memories:
+            return
+        self._last_context[user_id] = memories
+        self._last_context.move_to_end(user_id)
+        while len(self._last_context) > self.max_users:
+            self._last_context.popitem(last=False)
+
+    def _track(self, task: asyncio.Task, user_id: str):
+        self._background.add(task)
+
+        def _on_done(fut: asyncio.Task):
+            self._background.discard(fut)
+            if fut.cancelled() or fut.exception() is not None:
+                return
+            self._remember(user_id, fut.result())
+
+        task.add_done_callback(_on_done)
+
+    def get_cached_context(self, user_id: str) -> List[dict]:
+        """Returns the most recent memory context seen for a user (possibly empty)."""
+        return self._last_context.get(user_id, [])
+
+    def prefetch(self, user_id: str) -> Optional[asyncio.Task]:
+        """Starts a background profile search for a user; returns the task (not awaited)."""
+        if not self.memory_manager:
+            return None
+        self.prefetches += 1
+        task = asyncio.create_task(
+            self.memory_manager.search_memories(user_id=user_id, query=self.profile_query, limit=self.profile_limit),
+            name=f"memory-prefetch-{user_id}",
+        )
+        self._track(task, user_id)
+        return task
+
+    async def assemble(self, user_id: str, query: str) -> List[dict]:
+        """Returns candidate memories (memory objects) for this turn within the latency budget."""
+        task = asyncio.create_task(
+            self.memory_manager.search_memories(user_id=user_id, query=query, limit=self.candidate_limit))
+        try:
+            # shield: on timeout the search keeps running and feeds the next turn
+            memories = await asyncio.wait_for(asyncio.shield(task), timeout=self.budget_seconds)
+        except asyncio.TimeoutError:
+            self.late += 1
+            self._track(task, user_id)
+            fallback = self.get_cached_context(user_id)
+            if fallback:
+                self.fallback_used += 1
+            logger.debug(f"Memory search for user {user_id} exceeded {self.budget_seconds * 1000:.0f} ms budget; using {len(fallback)} cached memories.")
+            return fallback
+        except asyncio.CancelledError:
+            self._track(task, user_id)
+            raise
+        self.on_time += 1
+        self._remember(user_id, memories)
+        return memories
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "budget_ms": int(self.budget_seconds * 1000),
+            "on_time": self.on_time,
+            "late": self.late,
+            "fallback_used": self.fallback_used,
+            "prefetches": self.prefetches,
+            "background_tasks": len(self._background),
+            "cached_users": len(self._last_context),
+        }
+
+
+# --- Token-budgeted packing ---
+
+CONTEXT_HEADER = "CONTEXT FROM PREVIOUS CONVERSATIONS:\n"
+_WORDS = re.compile(r"\w+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Local token estimate (~4 characters per token for English text and code); no tokenizer call."""
+    return (len(text) + 3) // 4 if text else 0
+
+
+def _shingles(text: str, size: int = 3) -> Set[str]:
+    words = _WORDS.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _fingerprint(memory: dict) -> str:
+    """Identifies a memory across turns: its id, or a hash of its normalized text."""
+    if memory.get("id"):
+        return str(memory["id"])
+    return hashlib.blake2b(" ".join(_WORDS.findall(memory.get("memory", "").lower())).encode("utf-8"),
+                           digest_size=12).hexdigest()
+
+
+def _age_days(value) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return max(0.0, (time.time() - parsed.timestamp()) / 86400)
+
+
+def _line(memory: dict) -> str:
+    return f"- {memory.get('memory', '')}\n"
+
+
+class _SessionContext:
+    __slots__ = ("turns", "memories")
+
+    def __init__(self):
+        self.turns = 0 # turns sent on the session
+        self.memories: Dict[str, Tuple[int, Set[str]]] = {} # fingerprint -> (turn it was sent on, shingles)
+
+
+class MemoryContextBuilder:
+    """Turns candidate memories into the context block sent ahead of the user's message.
+
+    Per turn:
+      1. drops memories already sent earlier in the same Live session, and
+         near-duplicates of them (the upstream keeps them in its context window),
+      2. drops near-duplicates (Jaccard similarity of word 3-shingles at or
+         above `duplicate_threshold`; candidate lists are small, so exact
+         set comparison is cheaper than MinHash signatures),
+      3. ranks by `relevance_weight` x search score + (1 - relevance_weight)
+         x recency (exponential decay with `recency_half_life_days`),
+      4. packs greedily into `token_budget` estimated tokens.
+    Tokens saved are measured against the previous behaviour: the top
+    `baseline_count` search results sent verbatim on every turn.
+
+    The Live session compresses its context with a sliding window, so older
+    turns (and the memories sent with them) eventually fall out of it. A sent
+    memory is therefore only suppressed for `resend_after_turns` turns; after
+    that it is sent again when relevant (0 sends it again on every turn).
+    """
+
+    def __init__(self, token_budget: int = 400, duplicate_threshold: float = 0.6, relevance_weight: float = 0.7,
+                 recency_half_life_days: float = 30.0, baseline_count: int = 5, resend_after_turns: int = 20):
+        self.token_budget = token_budget
+        self.duplicate_threshold = duplicate_threshold
+        self.relevance_weight = relevance_weight
+        self.recency_half_life_days = recency_half_life_days
+        self.baseline_count = baseline_count
+        self.resend_after_turns = resend_after_turns
+        # live session -> memories it was sent within the last `resend_after_turns` turns
+        self._sent: "weakref.WeakKeyDictionary[object, _SessionContext]" = weakref.WeakKeyDictionary()
+
+        # --- Stats ---
+        self.turns = 0
+        self.tokens_sent = 0
+        self.tokens_saved = 0
+        self.skipped_already_sent = 0
+        self.dropped_duplicates = 0
+        self.dropped_over_budget = 0
+
+    def _rank(self, memories: List[dict]) -> List[dict]:
+        count = len(memories)
+        scored = []
+        for position, memory in enumerate(memories):
+            score = memory.get("score")
+            # Without a search score, fall back to the search order
+            relevance = float(score) if isinstance(score, (int, float)) else 1.0 - position / max(count, 1)
+            age = _age_days(memory.get("created_at"))
+            recency = 0.5 ** (age / self.recency_half_life_days) if age is not None else 0.5
+            scored.append((self.relevance_weight * relevance + (1 - self.relevance_weight) * recency, -position, memory))
+        scored.sort(key=lambda item: (item[0], item[1]), reverse=True)
+        return [memory for _, _, memory in scored]
+
+    def build(self, memories: List[dict], live_session=None) -> Tuple[Optional[str], dict, Dict[str, Set[str]]]:
+        """Returns (context text or None when nothing is worth sending, per-turn report, selected memories).
+
+        The selected memories only count as sent to `live_session` once the
+        caller passes them to `mark_sent` after the context reached the upstream.
+        """
+        if not memories:
+            return None, {"candidates": 0, "sent": 0, "tokens": 0, "tokens_saved": 0}, {}
+        baseline = estimate_tokens(CONTEXT_HEADER + "".join(_line(m) for m in memories[:self.baseline_count]))
+        context = self._sent.get(live_session) if live_session is not None else None
+        sent = {fingerprint: shingles for fingerprint, (_, shingles) in context.memories.items()} if context else {}
+        selected: Dict[str, Set[str]] = {}
+
+        kept: List[dict] = []
+        kept_shingles: List[Set[str]] = []
+        for memory in self._rank(memories):
+            fingerprint = _fingerprint(memory)
+            shingles = _shingles(memory.get("memory", ""))
+            if fingerprint in sent or any(
+                    _jaccard(shingles, other) >= self.duplicate_threshold for other in sent.values()):
+                self.skipped_already_sent += 1
+                continue
+            if any(_jaccard(shingles, other) >= self.duplicate_threshold for other in kept_shingles):
+                self.dropped_duplicates += 1
+                continue
+            kept.append(memory)
+            kept_shingles.append(shingles)
+
+        lines: List[str] = []
+        used = estimate_tokens(CONTEXT_HEADER)
+        for memory, shingles in zip(kept, kept_shingles):
+            line = _line(memory)
+            cost = estimate_tokens(line)
+            if used + cost > self.token_budget:
+                self.dropped_over_budget += 1
+                continue
+            lines.append(line)
+            used += cost
+            selected[_fingerprint(memory)] = shingles
+
+        tokens = used if lines else 0
+        self.turns += 1
+        self.tokens_sent += tokens
+        self.tokens_saved += baseline - tokens
+        report = {"candidates": len(memories), "sent": len(lines), "tokens": tokens, "tokens_saved": baseline - tokens}
+        if not lines:
+            return None, report, selected
+        return CONTEXT_HEADER + "".join(lines).rstrip("\n"), report, selected
+
+    def mark_sent(self, live_session, selected: Dict[str, Set[str]]):
+        """Records memories from `build` as present in the session's context (call after every successful send).
+
+        Each call counts as one turn of the session; memories sent
+        `resend_after_turns` turns ago are forgotten.
+        """
+        if live_session is None:
+            return
+        context = self._sent.get(live_session)
+        if context is None:
+            if not selected:
+                return
+            context = self._sent[live_session] = _SessionContext()
+        context.turns += 1
+        for fingerprint, shingles in selected.items():
+            context.memories[fingerprint] = (context.turns, shingles)
+        oldest = context.turns - self.resend_after_turns
+        for fingerprint in [f for f, (turn, _) in context.memories.items() if turn <= oldest]:
+            del context.memories[fingerprint]
+
+    def get_stats(self) -> Dict[str, float]:
+        return {
+            "token_budget": self.token_budget,
+            "resend_after_turns": self.resend_after_turns,
+            "turns": self.turns,
+            "tokens_sent": self.tokens_sent,
+            "tokens_saved": self.tokens_saved,
+            "avg_tokens_saved_per_turn": round(self.tokens_saved / self.turns, 1) if self.turns else 0.0,
+            "skipped_already_sent": self.skipped_already_sent,
+            "dropped_duplicates": self.dropped_duplicates,
+            "dropped_over_budget": self.dropped_over_budget,
+        }
@@ -1,12 +1,58 @@
 # Shared dependencies for the Allin AI Assistant
+from fastapi import HTTPException, status
 
 from allin_app.core.interaction import InteractionManager
+from allin_app.core.config import settings
+from allin_app.core.loop_monitor import EventLoopLagMonitor
 
 # --- Global instances (Centralized) ---
-# Initialize InteractionManager once globally
+# Created once globally; cheap until the app lifespan (main.py) starts its initialization
 interaction_manager = InteractionManager()
 
+# Started with the app (see main.py)
+loop_monitor = EventLoopLagMonitor()
+
+# The knowledge base is only opened when an endpoint first needs it
+rag_handler = None
+knowledge_sync = None
+
 def get_interaction_manager():
     """Dependency function to get the global InteractionManager instance."""
     return interaction_manager
+
+async def get_ready_interaction_manager():
+    """Like get_interaction_manager, but waits for startup (STARTUP_WAIT_SECONDS); 503 if it is not ready."""
+    if not await interaction_manager.wait_ready(settings.startup_wait_seconds):
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail=f"Service {interaction_manager.state}.")
+    return interaction_manager
+
+def get_loop_monitor():
+    """Dependency function to get the event-loop lag monitor."""
+    return loop_monitor
+
+def get_rag_handler():
+    """Dependency function to get the global RAGHandler (created on first use)."""
+    global rag_handler
+    if rag_handler is None:
+        from allin_app.rag.rag_handler import RAGHandler
+        rag_handler = RAGHandler(genai_client=interaction_manager.client)
+    if rag_handler.client is None and interaction_manager.client is not None:
+        rag_handler.client = interaction_manager.client # first used while the app was still starting
+    return rag_handler
+
+def get_knowledge_sync():
+    """Dependency function to get the global KnowledgeSync job runner (created on first use)."""
+    global knowledge_sync
+    if knowledge_sync is None:
+        from allin_app.rag.sync import KnowledgeSync
+        knowledge_sync = KnowledgeSync(
+            get_rag_handler(),
+            chunk_size=settings.rag_chunk_size,
+            overlap=settings.rag_chunk_overlap,
+            embed_batch_size=settings.rag_embed_batch_size,
+            workers=settings.rag_sync_workers,
+            root=settings.rag_source_dir, # clients may only sync inside the configured knowledge directory
+        )
+    return knowledge_sync
 # ---------------------------------------
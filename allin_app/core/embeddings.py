@@ -0,0 +1,48 @@
+# Deterministic local text embeddings (no network, no model download)
+import re
+import zlib
+from typing import Iterable, List
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"[a-z0-9_]+")
+
+
+class HashingEmbedder:
+    """Feature-hashing embedder over word unigrams, word bigrams and character trigrams.
+
+    Every feature is hashed with CRC32 (stable across processes and runs, unlike
+    Python's salted `hash`) into one of `dim` signed buckets; the resulting vector
+    is L2-normalized so a dot product is the cosine similarity. Quality is far
+    below a neural embedding model, but it is fast, dependency-light and good at
+    lexical overlap, which is what the offline/local modes need.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    @staticmethod
+    def _features(text: str) -> List[str]:
+        words = _TOKEN_RE.findall(text.lower())
+        features = list(words)
+        features.extend(f"{a} {b}" for a, b in zip(words, words[1:]))
+        for word in words:
+            padded = f"#{word}#"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def embed(self, texts: Iterable[str]) -> np.ndarray:
+        """Embeds a batch of texts into a (n, dim) float32 matrix of unit vectors."""
+        texts = list(texts)
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                matrix[row, h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+        return matrix
+
+    def embed_one(self, text: str) -> np.ndarray:
+        return self.embed([text])[0]
@@ -0,0 +1,142 @@
+# Bounded thread-pool offloading for blocking SDK calls (e.g. mem0 MemoryClient)
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from .logging_config import logger
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """Raised when the executor queue is full and a call is rejected immediately."""
+
+
+class OperationStats:
+    """Running latency statistics for a single operation name."""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds: float):
+        self.count += 1
+        self.total_seconds += seconds
+        if seconds > self.max_seconds:
+            self.max_seconds = seconds
+
+    def as_dict(self) -> Dict[str, Any]:
+        avg = self.total_seconds / self.count if self.count else 0.0
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "avg_ms": round(avg * 1000, 3),
+            "max_ms": round(self.max_seconds * 1000, 3),
+        }
+
+
+class BoundedExecutor:
+    """Runs blocking callables on a dedicated, size-limited thread pool.
+
+    The pool has `max_workers` threads and at most `max_queue` calls may wait
+    for a free thread. Calls beyond that are rejected with ExecutorSaturatedError
+    instead of piling up behind a slow upstream. Each call gets its own timeout;
+    on timeout (or cancellation of the awaiting task) a call that has not started
+    yet is dropped from the queue. A call that is already running cannot be
+    interrupted, but its result is discarded.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._queued = 0   # submitted, not yet started
+        self._running = 0  # currently executing on a worker thread
+        self._rejected = 0
+        self._stats: Dict[str, OperationStats] = {}
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queued
+
+    @property
+    def in_flight(self) -> int:
+        return self._running
+
+    def _op_stats(self, op_name: str) -> OperationStats:
+        stats = self._stats.get(op_name)
+        if stats is None:
+            stats = self._stats[op_name] = OperationStats()
+        return stats
+
+    async def run(self, func: Callable[..., Any], *args, timeout: Optional[float] = None, op_name: str = "call", **kwargs) -> Any:
+        """Runs `func(*args, **kwargs)` on the pool and awaits it with an optional timeout."""
+        with self._lock:
+            if self._queued >= self.max_queue:
+                self._rejected += 1
+                raise ExecutorSaturatedError(
+                    f"{self.name} executor queue is full ({self._queued} waiting); rejected '{op_name}'.")
+            self._queued += 1
+
+        # state["started"] / state["abandoned"] are only touched under self._lock so
+        # a call abandoned by its waiter before a worker picks it up never runs.
+        state = {"started": False, "abandoned": False}
+        submitted_at = time.perf_counter()
+
+        def _call():
+            with self._lock:
+                if state["abandoned"]:
+                    return None
+                state["started"] = True
+                self._queued -= 1
+                self._running += 1
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._pool, _call)
+        stats = self._op_stats(op_name)
+        try:
+            result = await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            logger.warning(f"{self.name} executor: '{op_name}' timed out after {timeout}s.")
+            raise
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            with self._lock:
+                if not state["started"] and not state["abandoned"]:
+                    # Timed out or cancelled while still queued: release the slot.
+                    state["abandoned"] = True
+                    self._queued -= 1
+            stats.record(time.perf_counter() - submitted_at)
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Returns queue depth, in-flight count and per-operation latency stats."""
+        return {
+            "name": self.name,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "queue_depth": self._queued,
+            "in_flight": self._running,
+            "rejected": self._rejected,
+            "operations": {name: s.as_dict() for name, s in self._stats.items()},
+        }
+
+    def shutdown(self, wait: bool = False):
+        """Stops the pool. Pending (not yet started) calls are cancelled."""
+        self._pool.shutdown(wait=wait, cancel_futures=True)
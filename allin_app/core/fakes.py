@@ -0,0 +1,266 @@
+# Offline stand-ins for the Live API and mem0, for load tests and local development without quota
+#
+# FakeGenAIClient mimics the parts of `genai.Client` the app uses
+# (`aio.live.connect`, `aio.models.generate_content`); FakeMemoryClient mimics
+# mem0's MemoryClient. Enable them with LIVE_API_BACKEND=fake and
+# MEMORY_BACKEND=fake, or pass them to InteractionManager / MemoryManager.
+import asyncio
+import itertools
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from google.genai import types
+
+from .config import settings
+
+_WORDS = ("the", "service", "config", "returns", "an", "error", "when", "python", "function", "request",
+          "database", "token", "cache", "worker", "handler", "timeout", "retry", "value", "deploy", "branch",
+          "test", "merge", "review", "build", "pipeline", "logs", "and", "to", "with", "for")
+
+_CODE = "rows = fetch_rows(limit=10)\nfor row in rows:\n    print(row)"
+
+
+class FakeLiveSession:
+    """A Live API session answering each turn with generated text at a configurable token rate.
+
+    Each turn streams `response_tokens` words as `model_turn` text parts of
+    `tokens_per_chunk` words, `first_token_ms` after the turn is sent and then at
+    `token_rate` tokens per second, each gap varied by +-`jitter_ms`. With
+    probability `code_probability` a turn also carries an `executable_code` part
+    and a `code_execution_result` of `code_output_bytes` (a failing run with
+    `code_error_probability`). Every turn ends with a session resumption update
+    and `turn_complete`.
+
+    Like the real session, `receive()` yields until the turn completes; a
+    receive that is abandoned mid-turn resumes where it stopped on the next call.
+    """
+
+    def __init__(self, token_rate: float = 50.0, jitter_ms: float = 5.0, first_token_ms: float = 300.0,
+                 response_tokens: int = 60, tokens_per_chunk: int = 4, code_probability: float = 0.0,
+                 code_output_bytes: int = 2048, code_error_probability: float = 0.1, seed: Optional[int] = None):
+        self.token_rate = token_rate
+        self.jitter_ms = jitter_ms
+        self.first_token_ms = first_token_ms
+        self.response_tokens = response_tokens
+        self.tokens_per_chunk = max(1, tokens_per_chunk)
+        self.code_probability = code_probability
+        self.code_output_bytes = code_output_bytes
+        self.code_error_probability = code_error_probability
+        self._rng = random.Random(seed)
+        self._turns: asyncio.Queue = asyncio.Queue()
+        self._current: Optional[list] = None # (delay seconds, message) still to deliver for the open turn
+        self.turns_received = 0
+        self.closed = False
+
+    async def send_client_content(self, turns=None, turn_complete: bool = True):
+        if self.closed:
+            raise ConnectionError("Fake Live session is closed.")
+        self.turns_received += 1
+        if turn_complete:
+            self._turns.put_nowait(self._plan_turn())
+
+    def _delay(self, seconds: float) -> float:
+        jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) / 1000 if self.jitter_ms else 0.0
+        return max(0.0, seconds + jitter)
+
+    def _plan_turn(self) -> list:
+        chunk_seconds = self.tokens_per_chunk / self.token_rate if self.token_rate > 0 else 0.0
+        words = [self._rng.choice(_WORDS) for _ in range(self.response_tokens)]
+        plan = []
+        for start in range(0, len(words), self.tokens_per_chunk):
+            text = " ".join(words[start:start + self.tokens_per_chunk]) + " "
+            delay = self.first_token_ms / 1000 if not plan else chunk_seconds
+            plan.append((self._delay(delay), _content(types.Part(text=text))))
+        if self.code_probability and self._rng.random() < self.code_probability:
+            failed = self._rng.random() < self.code_error_probability
+            plan.insert(len(plan) // 2, (self._delay(chunk_seconds), _content(
+                types.Part(executable_code=types.ExecutableCode(code=_CODE, language="PYTHON")))))
+            plan.insert(len(plan) // 2 + 1, (self._delay(chunk_seconds), _content(
+                types.Part(code_execution_result=types.CodeExecutionResult(
+                    outcome="OUTCOME_FAILED" if failed else "OUTCOME_OK", output=self._code_output(failed))))))
+        plan.append((0.0, types.LiveServerMessage(session_resumption_update=types.LiveServerSessionResumptionUpdate(
+            new_handle=uuid.uuid4().hex, resumable=True))))
+        plan.append((0.0, types.LiveServerMessage(server_content=types.LiveServerContent(turn_complete=True))))
+        return plan
+
+    def _code_output(self, failed: bool) -> str:
+        line = "row {}: status=ok latency_ms=42\n"
+        lines = [line.format(i) for i in range(max(1, self.code_output_bytes // len(line.format(0))))]
+        if failed:
+            lines.append("Traceback (most recent call last):\n  File \"<string>\", line 1\nValueError: bad row\n")
+        return "".join(lines)
+
+    async def receive(self):
+        if self._current is None:
+            self._current = await self._turns.get()
+        while self._current:
+            delay, message = self._current[0]
+            if delay:
+                await asyncio.sleep(delay)
+            self._current.pop(0)
+            yield message
+        self._current = None
+
+    async def close(self):
+        self.closed = True
+
+
+def _content(part: types.Part) -> types.LiveServerMessage:
+    return types.LiveServerMessage(server_content=types.LiveServerContent(model_turn=types.Content(parts=[part])))
+
+
+class _FakeConnect:
+    """Async context manager returned by `FakeGenAIClient.aio.live.connect(...)`."""
+
+    def __init__(self, client: "FakeGenAIClient"):
+        self._client = client
+        self._session: Optional[FakeLiveSession] = None
+
+    async def __aenter__(self) -> FakeLiveSession:
+        if self._client.connect_ms:
+            await asyncio.sleep(self._client.connect_ms / 1000)
+        self._session = FakeLiveSession(seed=next(self._client._seeds), **self._client.session_options)
+        self._client.connects += 1
+        self._client.open_sessions += 1
+        return self._session
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            self._client.open_sessions -= 1
+
+
+class _FakeLive:
+    def __init__(self, client: "FakeGenAIClient"):
+        self._client = client
+
+    def connect(self, model: str = None, config=None) -> _FakeConnect:
+        return _FakeConnect(self._client)
+
+
+class _FakeModels:
+    def __init__(self, client: "FakeGenAIClient"):
+        self._client = client
+
+    async def get(self, model: str = None, config=None):
+        return types.Model(name=model)
+
+    async def generate_content(self, model: str = None, contents=None, config=None):
+        options = self._client.session_options
+        tokens = options.get("response_tokens", 60)
+        await asyncio.sleep(options.get("first_token_ms", 300.0) / 1000 + tokens / options.get("token_rate", 50.0))
+        rng = random.Random(next(self._client._seeds))
+        return types.GenerateContentResponse(candidates=[types.Candidate(content=types.Content(
+            role="model", parts=[types.Part(text=" ".join(rng.choice(_WORDS) for _ in range(tokens)))]))])
+
+
+class _FakeAio:
+    def __init__(self, client: "FakeGenAIClient"):
+        self.live = _FakeLive(client)
+        self.models = _FakeModels(client)
+
+
+class FakeGenAIClient:
+    """Stands in for `genai.Client`. `session_options` are FakeLiveSession arguments; `connect_ms` is the handshake time."""
+
+    def __init__(self, connect_ms: float = 150.0, seed: Optional[int] = None, **session_options):
+        self.connect_ms = connect_ms
+        self.session_options = session_options
+        self._seeds = itertools.count(seed if seed is not None else random.randrange(2**31))
+        self.aio = _FakeAio(self)
+        self.connects = 0
+        self.open_sessions = 0
+
+
+class FakeMemoryClient:
+    """Stands in for mem0's `MemoryClient`: blocking calls taking `latency_ms` +- `jitter_ms`.
+
+    Memories are kept in process; search ranks them by word overlap with the query.
+    """
+
+    def __init__(self, latency_ms: float = 80.0, jitter_ms: float = 20.0, add_latency_ms: Optional[float] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.add_latency_ms = latency_ms if add_latency_ms is None else add_latency_ms
+        self._memories: Dict[str, List[dict]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _wait(self, latency_ms: float):
+        self.calls += 1
+        delay = latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def add(self, messages, user_id: str = None, metadata: Optional[dict] = None, **kwargs):
+        self._wait(self.add_latency_ms)
+        created_at = datetime.now(timezone.utc).isoformat()
+        results = []
+        with self._lock:
+            for message in messages:
+                memory = {"id": uuid.uuid4().hex, "memory": message.get("content", ""), "user_id": user_id,
+                          "metadata": metadata or {}, "created_at": created_at}
+                self._memories[user_id].append(memory)
+                results.append({"id": memory["id"], "memory": memory["memory"], "event": "ADD"})
+        return results
+
+    def search(self, query: str, user_id: str = None, limit: int = 5, **kwargs):
+        self._wait(self.latency_ms)
+        words = set(query.lower().split())
+        with self._lock:
+            memories = list(self._memories.get(user_id, ()))
+        scored = []
+        for memory in memories:
+            overlap = len(words & set(memory["memory"].lower().split()))
+            if overlap:
+                scored.append({**memory, "score": overlap / len(words)})
+        scored.sort(key=lambda memory: memory["score"], reverse=True)
+        return scored[:limit]
+
+    def get_all(self, user_id: str = None, filters: Optional[dict] = None, version: str = "v1",
+                page: Optional[int] = None, page_size: Optional[int] = None, **kwargs):
+        """v1: all of `user_id`'s memories. v2: memories matching `filters` ({"AND": [{"user_id": ...},
+        {"metadata": {...}}]}), paged like the cloud API when `page` is given."""
+        self._wait(self.latency_ms)
+        if version != "v2":
+            with self._lock:
+                return list(self._memories.get(user_id, ()))
+        conditions = (filters or {}).get("AND", [])
+        user_ids = [c["user_id"] for c in conditions if "user_id" in c]
+        metadata = {k: v for c in conditions for k, v in c.get("metadata", {}).items()}
+        with self._lock:
+            memories = [m for uid in user_ids for m in self._memories.get(uid, ())
+                        if all(m["metadata"].get(k) == v for k, v in metadata.items())]
+        if page is None:
+            return memories
+        page_size = page_size or 100
+        start = (page - 1) * page_size
+        results = memories[start:start + page_size]
+        more = start + page_size < len(memories)
+        return {"count": len(memories), "next": f"?page={page + 1}" if more else None,
+                "previous": f"?page={page - 1}" if page > 1 else None, "results": results}
+
+    def users(self):
+        self._wait(self.latency_ms)
+        with self._lock:
+            return {"count": len(self._memories),
+                    "results": [{"name": user_id, "total_memories": len(memories)}
+                                for user_id, memories in self._memories.items()]}
+
+
+def create_fake_genai_client() -> FakeGenAIClient:
+    """FakeGenAIClient configured by the FAKE_LIVE_* settings."""
+    return FakeGenAIClient(
+        connect_ms=settings.fake_live_connect_ms,
+        token_rate=settings.fake_live_token_rate,
+        jitter_ms=settings.fake_live_jitter_ms,
+        first_token_ms=settings.fake_live_first_token_ms,
+        response_tokens=settings.fake_live_response_tokens,
+        code_probability=settings.fake_live_code_probability,
+        code_output_bytes=settings.fake_live_code_output_bytes,
+    )
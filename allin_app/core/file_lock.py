@@ -0,0 +1,61 @@
+# Advisory inter-process file locks (flock) for data shared by uvicorn workers
+import os
+import threading
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError: # Windows: locks only exclude threads of this process
+    fcntl = None
+
+
+class FileLock:
+    """Exclusive lock on `path`, held across processes (fcntl.flock) and threads.
+
+    The lock file is created if needed and never deleted. The OS releases the
+    lock when the holding process exits, so a crashed worker never leaves it
+    held. Not re-entrant.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._fd: Optional[int] = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """Takes the lock; with blocking=False returns False instead of waiting."""
+        if not self._thread_lock.acquire(blocking):
+            return False
+        fd = None
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            os.close(fd)
+            self._thread_lock.release()
+            return False
+        except BaseException:
+            if fd is not None:
+                os.close(fd)
+            self._thread_lock.release()
+            raise
+        self._fd = fd
+        return True
+
+    def release(self):
+        fd, self._fd = self._fd, None
+        if fd is not None:
+            os.close(fd) # closing the descriptor drops the flock
+        self._thread_lock.release()
+
+    @property
+    def locked(self) -> bool:
+        return self._fd is not None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
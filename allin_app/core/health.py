@@ -0,0 +1,76 @@
+# Readiness checks against upstream dependencies, cached so frequent probes do not hit them every time
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from .logging_config import logger
+
+
+class _CheckResult:
+    __slots__ = ("ok", "error", "latency_ms", "checked_at")
+
+    def __init__(self, ok: bool, error: Optional[str], latency_ms: float):
+        self.ok = ok
+        self.error = error
+        self.latency_ms = latency_ms
+        self.checked_at = time.monotonic()
+
+
+class HealthChecker:
+    """Runs named async checks and caches each result for `ttl_seconds`.
+
+    A probe within the TTL is answered from the cache. Expired checks run
+    concurrently, each bounded by `timeout`; concurrent probes share one run
+    (single flight). Non-critical checks are reported but do not fail readiness.
+    """
+
+    def __init__(self, ttl_seconds: float = 15.0, timeout: float = 5.0):
+        self.ttl_seconds = ttl_seconds
+        self.timeout = timeout
+        self._checks: Dict[str, tuple] = {} # name -> (check, critical)
+        self._results: Dict[str, _CheckResult] = {}
+        self._running: Optional[asyncio.Task] = None
+        self.runs = 0
+
+    def register(self, name: str, check: Callable[[], Awaitable[None]], critical: bool = True):
+        """`check()` returns normally when healthy and raises otherwise."""
+        self._checks[name] = (check, critical)
+
+    async def _run_one(self, name: str, check):
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(check(), timeout=self.timeout)
+            result = _CheckResult(True, None, (time.perf_counter() - started) * 1000)
+        except Exception as e:
+            result = _CheckResult(False, str(e) or type(e).__name__, (time.perf_counter() - started) * 1000)
+            logger.warning(f"Readiness check '{name}' failed: {result.error}")
+        self._results[name] = result
+
+    async def _run_expired(self):
+        now = time.monotonic()
+        expired = [(name, check) for name, (check, _) in self._checks.items()
+                   if name not in self._results or now - self._results[name].checked_at >= self.ttl_seconds]
+        if expired:
+            self.runs += 1
+            await asyncio.gather(*(self._run_one(name, check) for name, check in expired))
+
+    async def check(self) -> dict:
+        """Returns {"ready": bool, "checks": {name: {...}}}."""
+        if self._running is None or self._running.done():
+            self._running = asyncio.get_running_loop().create_task(self._run_expired())
+        # Shielded: a probe that disconnects does not cancel the run other probes wait on
+        await asyncio.shield(self._running)
+        now = time.monotonic()
+        checks = {}
+        ready = True
+        for name, (_, critical) in self._checks.items():
+            result = self._results.get(name)
+            if result is None:
+                continue
+            checks[name] = {"ok": result.ok, "critical": critical, "latency_ms": round(result.latency_ms, 1),
+                            "age_seconds": round(now - result.checked_at, 1)}
+            if result.error:
+                checks[name]["error"] = result.error
+            if critical and not result.ok:
+                ready = False
+        return {"ready": ready, "checks": checks}
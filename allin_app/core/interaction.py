@@ -1,25 +1,103 @@
 # Placeholder for Core Interaction Logic (Phase 2)
-from google import genai
-from google.genai import types
+# google.genai is imported on first use (it accounts for about half of the app's import time)
 from .config import settings  # Use relative import for config
 from ..memory.manager import MemoryManager # Import MemoryManager
-from .logging_config import logger # Use relative import for logger
+from .context import MemoryContextAssembler, MemoryContextBuilder
+from .admission import AdmissionController
+from .health import HealthChecker
+from .metrics import ACTIVE_SESSIONS, ACTIVE_TURNS, QUEUED_TURNS, TURNS, WRITE_BEHIND_PENDING, observe_stage
+from .live_pool import LiveSessionPool
+from .streaming import StreamingStats, TextStreamEmitter, TurnLatency, receive_with_deadline
+from .session_handles import InMemorySessionHandleStore, create_session_handle_store
+from ..history.store import create_history_store
+from ..history.writer import ChatHistoryWriter
+from .blob_spool import BlobSpool
+from .logging_config import logger, truncate_payload # Use relative import for logger
 import asyncio
+import re
+import time
+import weakref
 from pathlib import Path
-from typing import Dict, Optional
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from google.genai import types
+
+# Any of these in a code output marks a failed run; one pass over the output instead of one per marker
+_CODE_ERROR_MARKERS = re.compile(r"Traceback \(most recent call last\):|Error:|Exception:")
+
+def _is_code_error(result) -> bool:
+    outcome = getattr(result, "outcome", None)
+    if outcome is not None and outcome not in ("OUTCOME_OK", "OUTCOME_UNSPECIFIED"):
+        return True
+    return _CODE_ERROR_MARKERS.search(result.output or "") is not None
+
+def _code_output_digest(output: str, max_chars: int, url: Optional[str] = None) -> str:
+    """What memory and chat history keep of a code output: all of it up to `max_chars`, else its head and tail."""
+    if len(output) > max_chars:
+        head, tail = output[:max_chars * 3 // 4], output[len(output) - max_chars // 4:]
+        omitted = f"{len(output) - len(head) - len(tail)} characters omitted" + (f"; full output: {url}" if url else "")
+        output = f"{head}\n... [{omitted}] ...\n{tail}"
+    return f"\n--- Code Output ---\n{output}\n-------------------\n"
 
 class InteractionManager:
-    def __init__(self):
-        """Initializes the Interaction Manager, including the Google AI client and system prompt."""
+    def __init__(self, client=None, memory_manager=None):
+        """Sets up the in-process state. Clients and stores are built by `initialize()` (see `start()`).
+
+        `client` (a genai.Client or core/fakes.FakeGenAIClient) and `memory_manager`
+        replace the ones built from settings, e.g. for offline load tests.
+        """
         logger.info("Initializing InteractionManager...")
         # Change to a model confirmed to support 'generateContent'
         self.live_model_name = 'models/gemini-2.0-flash-live-001' 
         self.client = None # Initialize client attribute
         self.system_prompt = None # Initialize system_prompt attribute
-        self._session_handles: Dict[str, Optional[str]] = {} # Store user_id -> session handle
+        self.session_handles = None # (user_id, chat_id) -> latest Live API resumption handle
+        self._open_turns = weakref.WeakSet() # Live sessions with a sent turn whose response was not fully read
+        self.streaming_stats = StreamingStats() # Per-turn TTFT / inter-chunk latency
         self.memory_manager = None # Initialize memory manager attribute
+        self.context_assembler = None # Latency-budgeted memory context (needs memory_manager)
+        self.context_builder = MemoryContextBuilder( # Token-budgeted, deduplicated memory context per turn
+            token_budget=settings.memory_context_token_budget,
+            duplicate_threshold=settings.memory_context_duplicate_threshold,
+            relevance_weight=settings.memory_context_relevance_weight,
+            recency_half_life_days=settings.memory_context_recency_half_life_days,
+            resend_after_turns=settings.memory_context_resend_after_turns,
+        )
+        self.history_writer = None # Raw chat transcript (chat_turns), written in batches
+        self.blob_spool = None # Large code outputs, fetched by clients by reference
+        self.live_sessions = None # Pre-warmed / reattachable Live API sessions (needs client)
+        self.admission = AdmissionController( # Session caps, per-user rate limits, fair upstream turn queue
+            max_sessions=settings.admission_max_sessions,
+            max_sessions_per_user=settings.admission_max_sessions_per_user,
+            max_concurrent_turns=settings.admission_max_concurrent_turns,
+            user_rate=settings.admission_user_rate,
+            user_burst=settings.admission_user_burst,
+            queue_slo_seconds=settings.admission_queue_slo_seconds,
+            user_weights=settings.admission_user_weights,
+            default_weight=settings.admission_default_weight,
+        )
 
-        # --- Load System Prompt ---
+        ACTIVE_SESSIONS.set_function(lambda: self.admission.session_count)
+        ACTIVE_TURNS.set_function(lambda: self.admission.active_turns)
+        QUEUED_TURNS.set_function(lambda: self.admission.queued_turns)
+        self.health = HealthChecker( # /health/ready, cached so probes don't hit upstreams each time
+            ttl_seconds=settings.health_check_ttl_seconds, timeout=settings.health_check_timeout)
+        self.health.register("live_api", self._check_live_api)
+        self.health.register("memory", self._check_memory, critical=False) # turns proceed without memory
+        self.health.register("session_handles", self._check_session_handles, critical=False)
+
+        # --- Lifecycle: starting -> ready -> draining -> stopped ---
+        self.state = "starting"
+        self._client_override = client
+        self._memory_manager_override = memory_manager
+        self._ready = asyncio.Event()
+        self._init_task: Optional[asyncio.Task] = None
+        self.startup_ms = {} # per component, plus "total" (wall clock)
+
+    # --- Initialization (each step runs on a worker thread, concurrently with the others) ---
+
+    def _load_system_prompt(self):
         try:
             # Construct path relative to this file's location
             prompt_path = Path(__file__).parent.parent / "system_prompt.txt"
@@ -31,17 +109,60 @@ class InteractionManager:
         except Exception as e:
             logger.error(f"Failed to load system prompt: {e}")
 
-        # --- Initialize Memory Manager ---
+    def _init_session_handles(self):
+        try:
+            self.session_handles = create_session_handle_store()
+        except Exception as e:
+            # Resumption still works for reconnects that land on this worker
+            logger.error(f"Failed to initialize session handle store, using an in-memory one: {e}", exc_info=True)
+            self.session_handles = InMemorySessionHandleStore(
+                settings.session_handle_max_entries, settings.session_handle_ttl_seconds)
+
+    def _init_memory(self):
         try:
-            self.memory_manager = MemoryManager()
+            memory_manager = self._memory_manager_override
+            self.memory_manager = memory_manager if memory_manager is not None else MemoryManager()
+            self.context_assembler = MemoryContextAssembler(
+                self.memory_manager,
+                budget_seconds=settings.memory_context_budget_ms / 1000,
+                profile_query=settings.memory_prefetch_query,
+                candidate_limit=settings.memory_context_candidates,
+            )
         except Exception as e:
             logger.error(f"Failed to initialize MemoryManager: {e}", exc_info=True)
             # Allow InteractionManager to continue, but memory features will be disabled
-        # ---------------------------------
 
-        # --- Initialize Google Client --- 
-        if settings.google_api_key:
+    def _init_history(self):
+        try:
+            self.history_writer = ChatHistoryWriter(
+                create_history_store(),
+                batch_size=settings.history_write_batch_size,
+                flush_interval=settings.history_flush_interval,
+                max_pending=settings.history_max_pending,
+            )
+        except Exception as e:
+            logger.error(f"Failed to initialize chat history store: {e}", exc_info=True)
+
+    def _init_blob_spool(self):
+        if not settings.code_output_spool_dir:
+            return
+        try:
+            self.blob_spool = BlobSpool(settings.code_output_spool_dir, max_bytes=settings.code_output_spool_max_bytes,
+                                        ttl_seconds=settings.code_output_spool_ttl_seconds)
+        except Exception as e:
+            # Large outputs are then streamed in full, in chunks
+            logger.error(f"Failed to initialize code output spool: {e}", exc_info=True)
+
+    def _init_client(self):
+        if self._client_override is not None:
+            self.client = self._client_override
+        elif settings.live_api_backend.lower() == "fake":
+            from .fakes import create_fake_genai_client
+            self.client = create_fake_genai_client()
+            logger.warning("Using the offline fake Live API client (LIVE_API_BACKEND=fake).")
+        elif settings.google_api_key:
             try:
+                from google import genai
                 # Initialize the client directly with the API key
                 self.client = genai.Client(api_key=settings.google_api_key)
                 logger.info(f"Google GenAI client initialized successfully.")
@@ -51,26 +172,270 @@ class InteractionManager:
                 logger.error(f"Failed to initialize Google GenAI client: {e}")
                 logger.error("Please ensure GOOGLE_API_KEY is set correctly in the .env file and network is accessible.")
                 self.client = None
+        # Loaded here rather than on the first turn
+        from google.genai import types # noqa: F401
 
-        # TODO: Initialize other components like:
-        # - Memory Manager
-        # - RAG Handler
-        pass
+    async def initialize(self):
+        """Builds the GenAI client, memory manager, chat history and handle stores concurrently, then
+        starts the session pool. Idempotent; `start()` runs it in the background."""
+        if self.state != "starting":
+            return
+        started = time.perf_counter()
+
+        async def timed(name, step):
+            step_started = time.perf_counter()
+            try:
+                await asyncio.to_thread(step)
+            except Exception as e:
+                logger.error(f"Startup step '{name}' failed: {e}", exc_info=True)
+            self.startup_ms[name] = round((time.perf_counter() - step_started) * 1000, 1)
+
+        await asyncio.gather(
+            timed("system_prompt", self._load_system_prompt),
+            timed("session_handles", self._init_session_handles),
+            timed("memory", self._init_memory),
+            timed("chat_history", self._init_history),
+            timed("blob_spool", self._init_blob_spool),
+            timed("genai_client", self._init_client),
+        )
+        if self.memory_manager:
+            # Replays turns spooled before a restart now, rather than on the next finished turn
+            self.memory_manager.start()
+        if self.history_writer:
+            WRITE_BEHIND_PENDING.labels("chat_history").set_function(lambda: self.history_writer.get_stats()["queue_depth"])
+        if self.client:
+            self.live_sessions = LiveSessionPool(
+                self.open_live_session,
+                size=settings.live_pool_size,
+                grace_seconds=settings.live_pool_grace_seconds,
+                max_age_seconds=settings.live_pool_max_age_seconds,
+                maintenance_interval=settings.live_pool_maintenance_interval,
+                connect_timeout=settings.live_connect_timeout,
+                resume_policy=settings.live_pool_resume_policy,
+            )
+            self.live_sessions.start() # begins pre-warming sessions
+        self.startup_ms["total"] = round((time.perf_counter() - started) * 1000, 1)
+        if self.state == "starting":
+            self.state = "ready"
+        self._ready.set()
+        logger.info(f"InteractionManager ready in {self.startup_ms['total']:.0f} ms: {self.startup_ms}")
+
+    def start(self) -> asyncio.Task:
+        """Runs `initialize()` in the background so the server can accept (and answer liveness probes) meanwhile."""
+        if self._init_task is None:
+            self._init_task = asyncio.get_running_loop().create_task(self.initialize(), name="interaction-init")
+        return self._init_task
+
+    @property
+    def accepting(self) -> bool:
+        """False once shutdown has begun: new connections are turned away."""
+        return self.state in ("starting", "ready")
+
+    async def wait_ready(self, timeout: float) -> bool:
+        """Waits for initialization (bounded by `timeout`); False if it did not finish or shutdown began."""
+        if not self._ready.is_set():
+            try:
+                await asyncio.wait_for(asyncio.shield(self._ready.wait()), timeout=timeout)
+            except asyncio.TimeoutError:
+                return False
+        return self.state == "ready"
+
+    async def stop(self, timeout: float = 20.0):
+        """Graceful shutdown within `timeout` seconds.
+
+        Stops admitting sessions and turns, waits for in-flight turns, drains
+        pending memory and chat history writes, then closes the session pool,
+        the handle store and the memory backend.
+        """
+        if self.state in ("draining", "stopped"):
+            return
+        self.state = "draining"
+        deadline = time.monotonic() + timeout
+        self.admission.close()
+        if self._init_task is not None and not self._init_task.done():
+            # Shutting down mid-startup: let it finish so everything it opened gets closed
+            await asyncio.wait({self._init_task}, timeout=max(0.0, deadline - time.monotonic()))
+        self._ready.set()
+
+        drained = await self.admission.wait_idle(timeout=max(0.0, deadline - time.monotonic()))
+        if not drained:
+            logger.warning(f"Shutdown: {self.admission.active_turns} turn(s) still running after the drain deadline.")
+        # Turns hand their writes to the write-behind queues when they finish, so these go last
+        remaining = max(0.1, deadline - time.monotonic())
+        writes = []
+        if self.memory_manager:
+            writes.append(self.memory_manager.drain(timeout=remaining))
+        if self.history_writer:
+            writes.append(self.history_writer.stop(timeout=remaining))
+        for result in await asyncio.gather(*writes, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.error(f"Shutdown: failed to drain pending writes: {result!r}")
+
+        if self.live_sessions is not None:
+            await self.live_sessions.stop()
+        if self.session_handles is not None:
+            self.session_handles.close()
+        if self.memory_manager:
+            self.memory_manager.shutdown()
+        self.state = "stopped"
+        logger.info(f"InteractionManager stopped ({'drained' if drained else 'drain deadline reached'}).")
+
+    async def _check_live_api(self):
+        if not self.client:
+            raise RuntimeError("Google GenAI client not initialized.")
+        await self.client.aio.models.get(model=self.live_model_name)
+
+    async def _check_memory(self):
+        if not self.memory_manager:
+            raise RuntimeError("MemoryManager not initialized.")
+        await self.memory_manager.check_health()
+
+    async def _check_session_handles(self):
+        await asyncio.to_thread(len, self.session_handles)
 
     def get_system_prompt(self) -> str | None:
         """Returns the loaded system prompt text."""
         return self.system_prompt
 
-    def get_session_handle(self, user_id: str) -> Optional[str]:
-        """Retrieves the last known session handle for a given user_id."""
-        handle = self._session_handles.get(user_id)
-        logger.debug(f"Retrieved session handle for user '{user_id}': {'Exists' if handle else 'None'}")
+    def build_live_config(self, handle: Optional[str] = None) -> "types.LiveConnectConfig":
+        """Live API config: text responses, resumption (with `handle` if given), compression, tools, system prompt."""
+        from google.genai import types
+        live_config = types.LiveConnectConfig(
+            response_modalities=["TEXT"],
+            # Add Session Resumption config
+            session_resumption=types.SessionResumptionConfig(
+                handle=handle
+            ),
+            # Add Context Window Compression config
+            context_window_compression=types.ContextWindowCompressionConfig(
+                # Use default sliding window. Old turns (and the memory context sent with them) are dropped,
+                # so the context builder resends a memory after MEMORY_CONTEXT_RESEND_AFTER_TURNS turns
+                sliding_window=types.SlidingWindow(),
+            ),
+            tools=[types.Tool(code_execution=types.ToolCodeExecution())],
+        )
+        # Add system instruction if available
+        if self.system_prompt:
+            live_config.system_instruction = types.Content(
+                parts=[types.Part(text=self.system_prompt)])
+        return live_config
+
+    def open_live_session(self, handle: Optional[str] = None):
+        """Returns an un-entered `client.aio.live.connect(...)` context manager (used by the session pool)."""
+        return self.client.aio.live.connect(model=self.live_model_name, config=self.build_live_config(handle))
+
+    def get_session_handle(self, user_id: str, chat_id: str) -> Optional[str]:
+        """Retrieves the last known (unexpired) session handle for a user's chat."""
+        try:
+            handle = self.session_handles.get(user_id, chat_id)
+        except Exception as e:
+            logger.error(f"Failed to read session handle for user '{user_id}': {e}")
+            return None
+        logger.debug(f"Retrieved session handle for user '{user_id}', chat '{chat_id}': {'Exists' if handle else 'None'}")
         return handle
 
-    def set_session_handle(self, user_id: str, handle: Optional[str]):
-        """Stores the session handle for a given user_id."""
-        self._session_handles[user_id] = handle
-        logger.info(f"Stored session handle for user '{user_id}': {'Set' if handle else 'Cleared'}")
+    def set_session_handle(self, user_id: str, chat_id: str, handle: Optional[str]):
+        """Stores the session handle for a user's chat; None clears it."""
+        try:
+            if handle:
+                self.session_handles.set(user_id, chat_id, handle)
+            else:
+                self.session_handles.delete(user_id, chat_id)
+        except Exception as e:
+            logger.error(f"Failed to store session handle for user '{user_id}': {e}")
+            return
+        logger.debug(f"Stored session handle for user '{user_id}', chat '{chat_id}': {'Set' if handle else 'Cleared'}")
+
+    async def _store_resumption_update(self, user_id: str, chat_id: str, update):
+        if update.resumable and update.new_handle:
+            await asyncio.to_thread(self.set_session_handle, user_id, chat_id, update.new_handle)
+        elif update.resumable is False:
+            await asyncio.to_thread(self.set_session_handle, user_id, chat_id, None)
+            logger.warning(f"Session for user {user_id} became non-resumable. Cleared handle.")
+
+    async def drain_live_turn(self, live_session, user_id: str, chat_id: str, timeout: float) -> bool:
+        """Reads and discards the rest of an interrupted turn so the session can take the next one.
+
+        Returns False if the upstream did not finish the turn within `timeout`
+        (the session should then be replaced). No-op if no turn is open.
+        """
+        if live_session not in self._open_turns:
+            return True
+
+        async def _drain():
+            discarded = 0
+            async for chunk in live_session.receive():
+                if chunk.session_resumption_update:
+                    await self._store_resumption_update(user_id, chat_id, chunk.session_resumption_update)
+                discarded += 1
+            return discarded
+
+        started = time.perf_counter()
+        try:
+            discarded = await asyncio.wait_for(_drain(), timeout=timeout)
+        except Exception as e:
+            logger.warning(f"Could not drain interrupted turn for user {user_id} within {timeout}s: {e!r}")
+            return False
+        self._open_turns.discard(live_session)
+        logger.debug(f"Drained interrupted turn for user {user_id}: {discarded} message(s) discarded "
+                     f"in {(time.perf_counter() - started) * 1000:.0f} ms.")
+        return True
+
+    async def _large_code_output_events(self, output: str, event_type: str):
+        """Events for a code output over CODE_OUTPUT_INLINE_MAX_CHARS: bounded code_output_chunk frames,
+        then `event_type` with the spool reference (size, blob digest, url) for the rest.
+
+        The output is spooled once (on a worker thread); only its first
+        CODE_OUTPUT_STREAM_MAX_CHARS are streamed. Without a spool it is streamed in full.
+        """
+        blob = None
+        if self.blob_spool:
+            try:
+                blob = await asyncio.to_thread(self.blob_spool.put_text, output)
+            except Exception as e:
+                logger.error(f"Failed to spool {len(output)} character code output: {e}")
+        streamed = len(output) if blob is None else min(len(output), settings.code_output_stream_max_chars)
+        chunk_chars = settings.code_output_chunk_chars
+        for seq, start in enumerate(range(0, streamed, chunk_chars)):
+            yield {"type": "code_output_chunk", "content": output[start:min(start + chunk_chars, streamed)], "seq": seq}
+        final = {"type": event_type, "content": "", "size": len(output), "streamed": streamed}
+        if blob is not None:
+            url = f"/api/v1/chat/code_outputs/{blob.digest}"
+            final.update(blob=blob.digest, bytes=blob.size, url=url)
+            if streamed < len(output):
+                final["content"] = f"[Output truncated after {streamed} of {len(output)} characters. Full output: {url}]"
+        yield final
+
+    def _record_turn(self, user_id: str, chat_id: str, message: str, user_message_ts: float,
+                     response_text: str, interrupted: bool):
+        """Hands the turn to chat history and memory ingestion. Synchronous, so it also runs on cancellation."""
+        if interrupted:
+            # Only what the client was sent; the marker keeps memory from treating it as a complete answer
+            response_text = f"{response_text}\n[Response interrupted by the user]" if response_text else ""
+            logger.info(f"Turn for user {user_id} interrupted; recording {len(response_text)} chars of partial response.")
+
+        # --- Record the raw turn in chat history ---
+        if self.history_writer:
+            history_messages = [{"role": "user", "content": message, "timestamp": user_message_ts}]
+            if response_text:
+                history_messages.append({"role": "assistant", "content": response_text, "timestamp": time.time()})
+            self.history_writer.submit_turns(user_id=user_id, chat_id=chat_id, messages=history_messages)
+
+        # --- Store AI Response in Memory --- 
+        if self.memory_manager and response_text:
+            # Write-behind: the turn is spooled and batched in the background so the
+            # client gets end_of_response without waiting on mem0.
+            logger.opt(lazy=True).debug("Queueing turn for memory ingestion for user {}: {}",
+                                        lambda: user_id, lambda: truncate_payload(response_text))
+            self.memory_manager.submit_turn(
+                user_id=user_id, user_message=message, assistant_message=response_text, chat_id=chat_id)
+        # --------------------------------- 
+
+    def prefetch_memory(self, user_id: str):
+        """Warms the user's memory context in the background (call when a connection opens)."""
+        if not self.context_assembler:
+            return None
+        return self.context_assembler.prefetch(user_id)
 
     async def process_live_message(
         self, 
@@ -80,127 +445,182 @@ class InteractionManager:
         message: str, 
         websocket
     ):
-        """Processes a message within an active Live API session."""
+        """Processes a message within an active Live API session.
+
+        Yields event dicts ({"type", "content", ...}); the caller encodes them
+        for its wire protocol, so errors are yielded as events too.
+        """
         if not self.client:
             logger.error("Google GenAI client not initialized.")
-            await websocket.send_text("Error: AI Service not configured.")
+            yield {"type": "error", "content": "AI Service not configured."}
             return
+        from google.genai import types
 
-        logger.info(f"Processing live message for user_id '{user_id}': {message[:50]}...")
+        logger.info(f"Processing live message for user_id '{user_id}' ({len(message)} chars).")
+        logger.opt(lazy=True).debug("Message from user {}: {}", lambda: user_id, lambda: truncate_payload(message))
+        user_message_ts = time.time()
+        latency = TurnLatency()
 
         # --- Prepare content with Memory --- 
         turns_to_send = []
-        if self.memory_manager:
+        context_selected = {} # memories in the context turn; marked as sent once the send succeeds
+        if self.context_assembler:
+            context_started = time.perf_counter()
             try:
-                # Retrieve relevant memories
-                relevant_memories = await self.memory_manager.get_relevant_memory(user_id=user_id, query=message)
-                if relevant_memories:
-                    # Use more explicit labels for the AI
-                    memory_prefix = "CONTEXT FROM PREVIOUS CONVERSATIONS:\n"
-                    formatted_memories_text = "\n".join(f"- {mem}" for mem in relevant_memories)
+                # Retrieve relevant memories within the latency budget (falls back to the last context)
+                relevant_memories = await self.context_assembler.assemble(user_id=user_id, query=message)
+                # Deduplicate, rank and pack into the token budget, skipping what this session already has
+                context_text, report, context_selected = self.context_builder.build(
+                    relevant_memories, live_session=live_session)
+                if context_text:
                     # Create a separate turn for the memory context
                     # Using role='user' for context might be okay, or might need refinement based on API behavior
-                    context_turn = types.Content(role="user", parts=[types.Part(text=f"{memory_prefix}{formatted_memories_text}")])
+                    context_turn = types.Content(role="user", parts=[types.Part(text=context_text)])
                     turns_to_send.append(context_turn)
-                    logger.debug(f"Prepended {len(relevant_memories)} memories to message for user {user_id}.")
+                if relevant_memories:
+                    logger.info(f"Memory context for user {user_id}: {report['sent']}/{report['candidates']} memories, "
+                                f"~{report['tokens']} tokens (saved ~{report['tokens_saved']}).")
                 else:
                     logger.debug(f"No relevant memories found for user {user_id} query.")
 
             except Exception as e:
                 logger.error(f"Failed to retrieve/format memory for user {user_id}: {e}", exc_info=True)
                 # Proceed without memory if retrieval fails
+            observe_stage("context_assembly", time.perf_counter() - context_started)
 
         # Always add the current user message as the final turn
         current_message_turn = types.Content(role="user", parts=[types.Part(text=message)])
         turns_to_send.append(current_message_turn)
 
         try:
-            logger.debug(f"Sending {len(turns_to_send)} turn(s) to live session for user {user_id}: {str(turns_to_send)[:150]}...")
+            logger.opt(lazy=True).debug("Sending {} turn(s) to live session for user {}: {}", lambda: len(turns_to_send),
+                                        lambda: user_id, lambda: truncate_payload(turns_to_send))
             # Send the list of turns
+            # Marked before sending: a turn cancelled mid-send may still have reached the upstream
+            self._open_turns.add(live_session)
+            send_started = time.perf_counter()
             await live_session.send_client_content(turns=turns_to_send, turn_complete=True)
+            self.context_builder.mark_sent(live_session, context_selected)
+            latency.sent_upstream()
+            observe_stage("upstream_send", latency.upstream_started - send_started)
             # --------------------------------------- 
 
             # --- Receive response and handle resumption --- 
-            full_response_text = ""
-            text_buffer = "" # Buffer for consecutive text parts
+            response_parts = [] # What the client was sent (plus placeholders), joined once for history/memory
+            text_stream = TextStreamEmitter(settings.ws_text_flush_policy, settings.ws_text_flush_interval_ms)
 
+            # A cancelled turn (client interrupt or disconnect) exits at a yield or await;
+            # whatever was already sent is still recorded, marked as interrupted.
+            interrupted = True
+            stream_failed = False
             try:
-                async for chunk in live_session.receive():
-                    # Process structured server content
-                    if chunk.server_content:
-                        model_turn = chunk.server_content.model_turn
-                        if model_turn:
-                            for part in model_turn.parts:
-                                if part.text is not None:
-                                    text_content = part.text
-                                    # Append to buffer instead of yielding immediately
-                                    text_buffer += text_content
-                                elif part.executable_code is not None:
-                                    # If buffer has content, yield it first
-                                    if text_buffer:
-                                        full_response_text += text_buffer 
-                                        yield {"type": "text", "content": text_buffer}
-                                        text_buffer = "" # Clear buffer
-                                    # Process Code Part
-                                    # Add a placeholder to memory indicating code was generated
-                                    full_response_text += "\n[AI generated code to perform the requested task]\n"
-                                    code_content = part.executable_code.code
-                                    yield {"type": "code", "content": code_content}
-                                elif part.code_execution_result is not None:
-                                    # If buffer has content, yield it first
-                                    if text_buffer:
-                                        full_response_text += text_buffer 
-                                        yield {"type": "text", "content": text_buffer}
-                                        text_buffer = "" # Clear buffer
-                                    # Process Code Result (Check for Errors)
-                                    result_output = part.code_execution_result.output
-                                    is_error = "Traceback (most recent call last):" in result_output or \
-                                               "Error:" in result_output or \
-                                               "Exception:" in result_output
-                                    if is_error:
-                                        logger.warning(f"Code execution error: {result_output[:100]}...")
-                                        # Use a clearer placeholder for failed execution in memory
-                                        full_response_text += "\n[AI code execution FAILED]\n"
-                                        yield {"type": "code_error", "content": result_output}
-                                    else:
-                                        full_response_text += f"\n--- Code Output ---\n{result_output}\n-------------------\n"
-                                        yield {"type": "code_result", "content": result_output}
-                                # TODO: Handle other potential parts like inline_data
-            except Exception as e:
-                logger.error(f"Error during Live API stream processing for user {user_id}: {e}", exc_info=True)
-                # Yield a specific error message to the client
-                yield {"type": "api_error", 
-                       "content": "An error occurred while processing the AI response.", 
-                       "details": str(e)}
-                # We might want to break or ensure the session closes gracefully depending on the error
-                # For now, we'll let it proceed to the 'finally' block equivalent (post-loop yield)
-                # Note: The error might mean the 'end_of_response' from the websocket endpoint won't be sent naturally.
-
-            # After the loop (or if an error occurred), yield any remaining text in the buffer
-            if text_buffer:
-                full_response_text += text_buffer # Add final buffered text to memory
-                yield {"type": "text", "content": text_buffer}
-
-            # --- Store AI Response in Memory --- 
-            if self.memory_manager and full_response_text:
                 try:
-                    # Add user message
-                    await self.memory_manager.add_memory(user_id=user_id, role="user", content=message, chat_id=chat_id)
-                    # Log the content being saved for the assistant
-                    logger.debug(f"Saving assistant response to memory for user {user_id}: '{full_response_text}'")                    # Add AI response
-                    await self.memory_manager.add_memory(user_id=user_id, role="assistant", content=full_response_text, chat_id=chat_id)
-                    logger.debug(f"Added user message and AI response to memory for user {user_id}.")
+                    # Wakes up without a new fragment when pending text is due (flush interval)
+                    async for chunk in receive_with_deadline(live_session.receive(), text_stream.due_in):
+                        if chunk is None:
+                            text_chunk = text_stream.flush()
+                            if text_chunk:
+                                response_parts.append(text_chunk)
+                                latency.event(len(text_chunk))
+                                yield {"type": "text", "content": text_chunk}
+                            continue
+                        # --- Session resumption: keep the latest handle so a reconnect (on any worker) can resume ---
+                        if chunk.session_resumption_update:
+                            await self._store_resumption_update(user_id, chat_id, chunk.session_resumption_update)
+                        # Process structured server content
+                        if chunk.server_content:
+                            model_turn = chunk.server_content.model_turn
+                            if model_turn:
+                                for part in model_turn.parts:
+                                    if part.text is not None:
+                                        # Forward text as it streams, batched by the flush policy
+                                        text_chunk = text_stream.push(part.text)
+                                        if text_chunk:
+                                            response_parts.append(text_chunk)
+                                            latency.event(len(text_chunk))
+                                            yield {"type": "text", "content": text_chunk}
+                                    elif part.executable_code is not None:
+                                        # Send pending text first
+                                        text_chunk = text_stream.flush()
+                                        if text_chunk:
+                                            response_parts.append(text_chunk)
+                                            latency.event(len(text_chunk))
+                                            yield {"type": "text", "content": text_chunk}
+                                        # Process Code Part
+                                        # Add a placeholder to memory indicating code was generated
+                                        response_parts.append("\n[AI generated code to perform the requested task]\n")
+                                        code_content = part.executable_code.code
+                                        latency.event()
+                                        yield {"type": "code", "content": code_content}
+                                    elif part.code_execution_result is not None:
+                                        # Send pending text first
+                                        text_chunk = text_stream.flush()
+                                        if text_chunk:
+                                            response_parts.append(text_chunk)
+                                            latency.event(len(text_chunk))
+                                            yield {"type": "text", "content": text_chunk}
+                                        # Process Code Result (Check for Errors)
+                                        result_output = part.code_execution_result.output or ""
+                                        is_error = _is_code_error(part.code_execution_result)
+                                        event_type = "code_error" if is_error else "code_result"
+                                        if is_error:
+                                            logger.warning(f"Code execution error: {result_output[:100]}...")
+                                        url = None
+                                        if len(result_output) <= settings.code_output_inline_max_chars:
+                                            latency.event()
+                                            yield {"type": event_type, "content": result_output}
+                                        else:
+                                            # Bounded frames plus a reference, instead of one frame of the whole output
+                                            async for event in self._large_code_output_events(result_output, event_type):
+                                                url = event.get("url", url)
+                                                latency.event()
+                                                yield event
+                                        if is_error:
+                                            # Use a clearer placeholder for failed execution in memory
+                                            response_parts.append("\n[AI code execution FAILED]\n")
+                                        else:
+                                            # Memory and chat history keep a truncated digest, not the whole output
+                                            response_parts.append(_code_output_digest(
+                                                result_output, settings.code_output_memory_chars, url))
+                                    # TODO: Handle other potential parts like inline_data
+                    self._open_turns.discard(live_session) # turn_complete reached
                 except Exception as e:
-                    logger.error(f"Failed to add interaction to memory for user {user_id}: {e}", exc_info=True)
-            # --------------------------------- 
+                    stream_failed = True
+                    self._open_turns.discard(live_session) # stream is broken; nothing left to drain
+                    logger.error(f"Error during Live API stream processing for user {user_id}: {e}", exc_info=True)
+                    # Yield a specific error message to the client
+                    yield {"type": "api_error", 
+                           "content": "An error occurred while processing the AI response.", 
+                           "details": str(e)}
+                    # We might want to break or ensure the session closes gracefully depending on the error
+                    # For now, we'll let it proceed to the 'finally' block equivalent (post-loop yield)
+                    # Note: The error might mean the 'end_of_response' from the websocket endpoint won't be sent naturally.
+
+                # After the loop (or if an error occurred), send any text still pending
+                text_chunk = text_stream.flush()
+                if text_chunk:
+                    response_parts.append(text_chunk)
+                    latency.event(len(text_chunk))
+                    yield {"type": "text", "content": text_chunk}
+                interrupted = False
+            finally:
+                self.streaming_stats.record(latency)
+                if latency.first_event is not None:
+                    observe_stage("first_chunk", latency.first_event - latency.upstream_started)
+                    observe_stage("last_chunk", latency.last_event - latency.upstream_started)
+                TURNS.labels("interrupted" if interrupted else "error" if stream_failed else "completed").inc()
+                logger.info(f"Turn latency for user {user_id}: {latency.summary()}")
+                self._record_turn(user_id, chat_id, message, user_message_ts, "".join(response_parts), interrupted)
 
         except Exception as e:
+            # Typically a failed send: the upstream turn is in an unknown state, so the caller must
+            # replace the session (api_error) rather than reuse, drain or keep it for reattach
+            self._open_turns.discard(live_session)
             logger.error(f"Error processing live message for user {user_id}: {e}", exc_info=True)
-            try:
-                await websocket.send_text(f"Error processing message: {e}")
-            except Exception:
-                logger.error(f"Failed to send error via WebSocket: {e}")
+            yield {"type": "api_error",
+                   "content": "An error occurred while sending the message to the AI service.",
+                   "details": str(e)}
 
-async def cleanup_interaction(interaction_manager):
-    # TODO: Implement cleanup logic here
-    pass
+async def cleanup_interaction(interaction_manager, timeout: float = None):
+    """Gracefully stops the manager (see InteractionManager.stop); called from the app lifespan."""
+    await interaction_manager.stop(settings.shutdown_drain_seconds if timeout is None else timeout)
@@ -0,0 +1,299 @@
+# Live API session pool: pre-warmed sessions, reattach within a grace period, idle retirement
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from .logging_config import logger
+
+RESUME_POLICIES = ("always", "reconnect")
+
+
+class LiveSessionLease:
+    """A Live API session owned by one WebSocket connection at a time."""
+
+    def __init__(self, context_manager, session, handle: Optional[str], connect_ms: float):
+        self._context_manager = context_manager
+        self.session = session
+        self.handle = handle # resumption handle the session was opened with
+        self.created_at = time.monotonic()
+        self.released_at: Optional[float] = None
+        self.connect_ms = connect_ms
+        self.source = "new" # new | prewarmed | reattached
+        self.healthy = True # cleared when the upstream stream fails; unhealthy leases are closed
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.created_at
+
+    async def close(self):
+        try:
+            await self._context_manager.__aexit__(None, None, None)
+        except Exception as e:
+            logger.debug(f"Error closing Live API session: {e}")
+
+
+class LiveSessionPool:
+    """Hands out Live API sessions so a WebSocket rarely waits for the upstream handshake.
+
+    Sources, in order of preference for an arriving (user_id, chat_id):
+      1. reattach: the session that connection released less than
+         `grace_seconds` ago (page reloads, flaky networks). The conversation
+         continues in place.
+      2. resume: if the chat has a stored resumption handle, a fresh connect
+         with it, which restores the chat's server-side context.
+      3. prewarmed: an idle pre-connected session (system prompt and tools
+         already configured) for chats without a handle.
+      4. a fresh connect.
+    Handles are stored per chat, so new chats use the pre-warmed sessions while
+    reopened chats resume, which costs a full handshake but keeps the upstream
+    context. With `resume_policy="reconnect"` a reopened chat takes a
+    pre-warmed session too (the model then sees only the memory context) and
+    resumes only when the caller marks the acquire as a reconnect, or when no
+    pre-warmed session is idle. Hits and misses are reported separately for
+    acquires with and without a handle; size the pool for the no-handle rate
+    (plus the handle rate under "reconnect"), since idle sessions that are
+    never taken only burn upstream connections.
+    A maintenance task closes detached sessions after the grace period, retires
+    sessions older than `max_age_seconds` (the upstream limits connection
+    lifetime) and keeps `size` pre-warmed sessions ready.
+
+    `connect(handle)` must return an un-entered async context manager yielding a
+    Live session (i.e. `client.aio.live.connect(...)`).
+    """
+
+    def __init__(self, connect: Callable[[Optional[str]], object], size: int = 2, grace_seconds: float = 30.0,
+                 max_age_seconds: float = 480.0, maintenance_interval: float = 5.0, connect_timeout: float = 15.0,
+                 resume_policy: str = "always"):
+        if resume_policy not in RESUME_POLICIES:
+            raise ValueError(f"Unknown resume policy '{resume_policy}'. Expected one of {', '.join(RESUME_POLICIES)}.")
+        self._connect = connect
+        self.resume_policy = resume_policy
+        self.size = size
+        self.grace_seconds = grace_seconds
+        self.max_age_seconds = max_age_seconds
+        self.maintenance_interval = maintenance_interval
+        self.connect_timeout = connect_timeout
+
+        self._idle: Deque[LiveSessionLease] = deque() # pre-warmed, never used
+        self._detached: Dict[Tuple[str, str], LiveSessionLease] = {} # released, within grace
+        self._in_use = 0
+        self._warming = 0
+        self._task: Optional[asyncio.Task] = None
+        self._closing: set = set() # background close tasks (kept referenced until done)
+        self._refill: Optional[asyncio.Event] = None
+        self._closed = False
+
+        # --- Stats ---
+        self.acquired = 0
+        self.hits_reattached = 0
+        self.hits_prewarmed = 0
+        self.connects_resumed = 0
+        self.connects_fresh = 0
+        self.connect_failures = 0
+        # handle | no_handle -> reattached / prewarmed (hits) and connected (misses)
+        self._outcomes: Dict[str, Dict[str, int]] = {
+            kind: {"reattached": 0, "prewarmed": 0, "connected": 0} for kind in ("handle", "no_handle")}
+        self.retired_idle = 0
+        self.expired_detached = 0
+        self._connect_ms: Deque[float] = deque(maxlen=512)
+        self._acquire_ms: Deque[float] = deque(maxlen=512)
+
+    # --- Lifecycle ---
+
+    def start(self):
+        """Starts maintenance and pre-warming (needs a running loop). Safe to call repeatedly."""
+        if self._task is not None or self._closed:
+            return
+        self._refill = asyncio.Event()
+        self._refill.set()
+        self._task = asyncio.get_running_loop().create_task(self._maintain(), name="live-session-pool")
+
+    async def stop(self):
+        """Closes every pooled session. Sessions still in use are closed by their release."""
+        self._closed = True
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        sessions = list(self._idle) + list(self._detached.values())
+        self._idle.clear()
+        self._detached.clear()
+        await asyncio.gather(*(lease.close() for lease in sessions))
+
+    # --- Acquire / release ---
+
+    async def acquire(self, user_id: str, chat_id: str, handle: Optional[str] = None,
+                      reconnect: bool = False) -> LiveSessionLease:
+        """Returns a session for this connection. Raises if a new connect fails or times out.
+
+        `reconnect` marks the acquire as continuing a conversation in progress (a
+        client reconnect or a replaced session): the handle is then always
+        used, whatever the resume policy.
+        """
+        self.start()
+        started = time.perf_counter()
+        outcomes = self._outcomes["handle" if handle else "no_handle"]
+        lease = self._detached.pop((user_id, chat_id), None)
+        if lease is not None and lease.age < self.max_age_seconds:
+            lease.source = "reattached"
+            self.hits_reattached += 1
+            outcomes["reattached"] += 1
+        else:
+            if lease is not None:
+                self._close_later(lease)
+            lease = None
+            if not handle or (self.resume_policy == "reconnect" and not reconnect):
+                lease = self._take_idle()
+            if lease is not None:
+                lease.source = "prewarmed"
+                self.hits_prewarmed += 1
+                outcomes["prewarmed"] += 1
+            else:
+                # Connecting anyway, so resume when there is a handle
+                lease = await self._open(handle)
+                outcomes["connected"] += 1
+                if handle:
+                    self.connects_resumed += 1
+                else:
+                    self.connects_fresh += 1
+            self._refill.set()
+        lease.released_at = None
+        self._in_use += 1
+        self.acquired += 1
+        self._acquire_ms.append((time.perf_counter() - started) * 1000)
+        logger.info(f"Live session for user {user_id}, chat {chat_id}: {lease.source} "
+                    f"(acquire {self._acquire_ms[-1]:.1f} ms, pool idle {len(self._idle)}).")
+        return lease
+
+    async def release(self, lease: LiveSessionLease, user_id: str, chat_id: str):
+        """Detaches a session from its connection; it stays reattachable for `grace_seconds`."""
+        self._in_use -= 1
+        if self._closed or not lease.healthy or lease.age >= self.max_age_seconds or self.grace_seconds <= 0:
+            await lease.close()
+            return
+        lease.released_at = time.monotonic()
+        previous = self._detached.pop((user_id, chat_id), None)
+        self._detached[(user_id, chat_id)] = lease
+        if previous is not None and previous is not lease:
+            await previous.close()
+
+    def _close_later(self, lease: LiveSessionLease):
+        task = asyncio.get_running_loop().create_task(lease.close())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    def _take_idle(self) -> Optional[LiveSessionLease]:
+        while self._idle:
+            lease = self._idle.popleft()
+            if lease.age < self.max_age_seconds:
+                return lease
+            self._close_later(lease)
+            self.retired_idle += 1
+        return None
+
+    async def _open(self, handle: Optional[str]) -> LiveSessionLease:
+        context_manager = self._connect(handle)
+        started = time.perf_counter()
+        try:
+            session = await asyncio.wait_for(context_manager.__aenter__(), timeout=self.connect_timeout)
+        except BaseException:
+            self.connect_failures += 1
+            raise
+        connect_ms = (time.perf_counter() - started) * 1000
+        self._connect_ms.append(connect_ms)
+        return LiveSessionLease(context_manager, session, handle, connect_ms)
+
+    # --- Maintenance ---
+
+    async def _maintain(self):
+        # Also checks _closed: on 3.11 a cancel that races a set refill event is swallowed by wait_for
+        while not self._closed:
+            try:
+                await self._sweep()
+                await self._warm()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Live session pool maintenance failed: {e}", exc_info=True)
+            try:
+                await asyncio.wait_for(self._refill.wait(), timeout=self.maintenance_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._refill.clear()
+
+    async def _sweep(self):
+        now = time.monotonic()
+        expired: List[LiveSessionLease] = []
+        for key, lease in list(self._detached.items()):
+            if now - lease.released_at >= self.grace_seconds or lease.age >= self.max_age_seconds:
+                expired.append(self._detached.pop(key))
+                self.expired_detached += 1
+        while self._idle and self._idle[0].age >= self.max_age_seconds:
+            expired.append(self._idle.popleft())
+            self.retired_idle += 1
+        if expired:
+            await asyncio.gather(*(lease.close() for lease in expired))
+
+    async def _warm(self):
+        missing = self.size - len(self._idle) - self._warming
+        if missing <= 0:
+            return
+        self._warming += missing
+        try:
+            results = await asyncio.gather(*(self._open(None) for _ in range(missing)), return_exceptions=True)
+        finally:
+            self._warming -= missing
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.warning(f"Pre-warming a Live API session failed: {result}")
+            elif self._closed:
+                await result.close()
+            else:
+                self._idle.append(result)
+
+    # --- Stats ---
+
+    @staticmethod
+    def _percentiles(samples) -> Dict[str, float]:
+        if not samples:
+            return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+        ordered = sorted(samples)
+        return {
+            "p50": round(ordered[len(ordered) // 2], 2),
+            "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+            "max": round(ordered[-1], 2),
+        }
+
+    @staticmethod
+    def _split(outcomes: Dict[str, int]) -> dict:
+        hits = outcomes["reattached"] + outcomes["prewarmed"]
+        acquired = hits + outcomes["connected"]
+        return {**outcomes, "hits": hits, "misses": outcomes["connected"],
+                "hit_rate": round(hits / acquired, 3) if acquired else 0.0}
+
+    def get_stats(self) -> dict:
+        hits = self.hits_reattached + self.hits_prewarmed
+        return {
+            "target_size": self.size,
+            "resume_policy": self.resume_policy,
+            "idle": len(self._idle),
+            "detached": len(self._detached),
+            "in_use": self._in_use,
+            "warming": self._warming,
+            "acquired": self.acquired,
+            "hits_reattached": self.hits_reattached,
+            "hits_prewarmed": self.hits_prewarmed,
+            "connects_resumed": self.connects_resumed,
+            "connects_fresh": self.connects_fresh,
+            "connect_failures": self.connect_failures,
+            "hit_rate": round(hits / self.acquired, 3) if self.acquired else 0.0,
+            "with_handle": self._split(self._outcomes["handle"]),
+            "without_handle": self._split(self._outcomes["no_handle"]),
+            "retired_idle": self.retired_idle,
+            "expired_detached": self.expired_detached,
+            "connect_ms": self._percentiles(self._connect_ms),
+            "acquire_ms": self._percentiles(self._acquire_ms),
+        }
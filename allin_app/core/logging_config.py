@@ -1,48 +1,194 @@
 import sys
 import os
+import json
+import random
+import queue
+import reprlib
+import threading
+import traceback
 from loguru import logger
 # Use relative import to access config within the same package ('core')
 from .config import settings
 
 # --- Log Configuration --- #
+#
+# LOG_FORMAT=text (default): coloured lines on stderr, plus a daily file unless LOG_FILE_ENABLED=false.
+# LOG_FORMAT=json: one JSON object per line on stderr (for log collectors); no file by default.
+# Either way records carry `request_id` (one per HTTP request / WebSocket connection, see
+# main.py) and any fields bound with logger.bind()/contextualize().
+
+_TEXT_FORMAT = ("<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | {extra[request_id]} | "
+                "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>")
+_FILE_FORMAT = "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {extra[request_id]} | {name}:{function}:{line} - {message}"
+
+
+def truncate_bytes(text: str, max_bytes: int) -> str:
+    """`text` cut to at most `max_bytes` UTF-8 bytes (never splitting a character), with "..." when cut."""
+    if len(text) * 4 <= max_bytes: # cannot exceed the limit; skip encoding
+        return text
+    encoded = text[:max_bytes].encode("utf-8") # no more than max_bytes characters can fit
+    if len(encoded) <= max_bytes and len(text) <= max_bytes:
+        return text
+    return encoded[:max_bytes].decode("utf-8", errors="ignore") + "..."
+
+
+class _BackgroundStream:
+    """Loguru stream sink that hands formatted records to a writer thread.
+
+    Cheaper for the caller than loguru's own `enqueue=True` (which pickles every
+    record onto a multiprocessing queue): the caller only appends to an in-process
+    queue, and the thread renders (`render(message)`), writes and flushes once
+    the queue is empty. `stop()` (called by logger.remove) writes what is queued.
+    """
+
+    def __init__(self, stream, render=str):
+        self._stream = stream
+        self._render = render
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, message):
+        self._queue.put(message)
+
+    def _run(self):
+        while True:
+            message = self._queue.get()
+            if message is None:
+                break
+            try:
+                self._stream.write(self._render(message))
+                if self._queue.empty():
+                    self._stream.flush()
+            except Exception:
+                pass # a broken stream must not take the writer down
+        try:
+            self._stream.flush()
+        except Exception:
+            pass
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+def _json_renderer(max_message_bytes: int):
+    """Renders a record as one compact JSON line. Runs on the writer thread when enqueued."""
+    def render(message) -> str:
+        record = message.record
+        entry = {
+            "ts": record["time"].isoformat(),
+            "level": record["level"].name,
+            "logger": record["name"],
+            "func": record["function"],
+            "line": record["line"],
+            "msg": truncate_bytes(record["message"], max_message_bytes),
+        }
+        for key, value in record["extra"].items():
+            entry[key] = value if isinstance(value, (str, int, float, bool)) or value is None else str(value)
+        if record["exception"] is not None:
+            error_type, error, tb = record["exception"]
+            entry["exception"] = truncate_bytes("".join(traceback.format_exception(error_type, error, tb)),
+                                                max_message_bytes * 4)
+        return json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+    return render
+
+
+def configure_logging(level: str = None, log_format: str = None, log_dir: str = None, file_enabled: bool = None,
+                      enqueue: bool = None, stream=None):
+    """(Re)installs the handlers. Called once at import; benchmarks call it with their own sinks."""
+    global DEBUG_ENABLED
+    level = (level or settings.log_level).upper()
+    DEBUG_ENABLED = logger.level(level).no <= logger.level("DEBUG").no
+    log_format = (log_format or settings.log_format).lower()
+    file_enabled = settings.log_file_enabled if file_enabled is None else file_enabled
+    enqueue = settings.log_enqueue if enqueue is None else enqueue
+    stream = stream or sys.stderr
+
+    logger.remove()
+    logger.configure(extra={"request_id": "-"})
+    if log_format == "json":
+        # The record is serialised to JSON by the writer thread, not by the caller
+        render = _json_renderer(settings.log_message_max_bytes)
+        if enqueue:
+            sink = _BackgroundStream(stream, render)
+        else:
+            def sink(message):
+                stream.write(render(message))
+        logger.add(sink, level=level, format="{message}", backtrace=False, diagnose=False)
+    else:
+        # Standard output handler
+        colorize = stream.isatty() if hasattr(stream, "isatty") else False
+        logger.add(_BackgroundStream(stream) if enqueue else stream, level=level, format=_TEXT_FORMAT,
+                   colorize=colorize)
+
+    # Optional file handler
+    if file_enabled and log_dir:
+        if not os.path.exists(log_dir):
+            try:
+                os.makedirs(log_dir)
+            except OSError as e:
+                logger.error(f"Could not create log directory: {log_dir}. Error: {e}")
+                log_dir = None # Disable file logging if dir creation fails
+        if log_dir:
+            logger.add(
+                os.path.join(log_dir, "allin_app_{time:YYYY-MM-DD}.log"),
+                rotation="00:00", # Rotate daily at midnight
+                retention="7 days", # Keep logs for 7 days
+                compression="zip", # Compress rotated files
+                level=level,
+                format=_FILE_FORMAT,
+                enqueue=enqueue, # loguru's queue: rotation and zip compression also run off the caller
+            )
+    return log_dir if file_enabled else None
 
-# Remove default logger
-logger.remove()
 
 # Determine log level from settings
 log_level = settings.log_level.upper()
+DEBUG_ENABLED = False # set by configure_logging; sampled debug events are skipped entirely unless DEBUG is on
+
+_default_log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "logs")
+_file_dir = configure_logging(log_dir=_default_log_dir if settings.log_format.lower() != "json" else None)
+
+logger.info(f"Logging configured. Level: {log_level}, format: {settings.log_format}. "
+            f"File logging to: {_file_dir if _file_dir else 'Disabled'}")
+
+# --- Payload logging --- #
+
+# Bounded repr: only the first few items/characters of large payloads are ever formatted
+_payload_repr = reprlib.Repr()
+_payload_repr.maxlevel = 3
+_payload_repr.maxlist = _payload_repr.maxtuple = _payload_repr.maxset = 5
+_payload_repr.maxdict = 8
+_payload_repr.maxstring = _payload_repr.maxother = 120
+
+def truncate_payload(payload, max_bytes: int = None) -> str:
+    """Short excerpt of a payload for logs, at most `max_bytes` UTF-8 bytes; cost does not grow with the payload size.
+
+    Use with lazy logging so nothing is formatted unless debug is enabled:
+        logger.opt(lazy=True).debug("Raw response: {}", lambda: truncate_payload(raw))
+    """
+    max_bytes = max_bytes or settings.log_payload_max_bytes
+    if isinstance(payload, str):
+        text = truncate_bytes(payload, max_bytes)
+    else:
+        text = truncate_bytes(_payload_repr.repr(payload), max_bytes)
+    if isinstance(payload, (list, tuple, dict, str, bytes)):
+        text += f" <len={len(payload)}>"
+    return text
+
+def debug_sampled(rate: float = None) -> bool:
+    """True for roughly a `rate` fraction of calls (LOG_DEBUG_SAMPLE_RATE) when DEBUG is enabled.
 
-# Standard output handler
-logger.add(
-    sys.stderr, # Log to standard error
-    level=log_level,
-    format="<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
-    colorize=True,
-    enqueue=True # Make logging asynchronous
-)
-
-# Optional file handler
-log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "logs")
-if not os.path.exists(log_dir):
-    try:
-        os.makedirs(log_dir)
-    except OSError as e:
-        logger.error(f"Could not create log directory: {log_dir}. Error: {e}")
-        log_dir = None # Disable file logging if dir creation fails
-
-if log_dir:
-    log_file_path = os.path.join(log_dir, "allin_app_{time:YYYY-MM-DD}.log")
-    logger.add(
-        log_file_path,
-        rotation="00:00", # Rotate daily at midnight
-        retention="7 days", # Keep logs for 7 days
-        compression="zip", # Compress rotated files
-        level=log_level,
-        format="{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {name}:{function}:{line} - {message}",
-        enqueue=True # Make file logging asynchronous
-    )
-
-logger.info(f"Logging configured. Level: {log_level}. File logging to: {log_dir if log_dir else 'Disabled'}")
+    Guards high-volume debug events (per frame, per chunk) so neither the
+    message nor its arguments are built for the skipped ones:
+        if debug_sampled():
+            logger.debug(f"Received {len(frame)} byte frame")
+    """
+    if not DEBUG_ENABLED:
+        return False
+    rate = settings.log_debug_sample_rate if rate is None else rate
+    return rate >= 1.0 or random.random() < rate
 
 # --- Example Usage --- #
 # In other modules:
@@ -0,0 +1,72 @@
+# Event-loop lag: how late a periodic timer fires, i.e. how long callbacks wait behind blocking work
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Optional
+
+from .logging_config import logger
+from .metrics import EVENT_LOOP_LAG
+
+
+class EventLoopLagMonitor:
+    """Samples the event loop every `interval` seconds and records how late each wakeup was.
+
+    Any lag is time during which no WebSocket frame could be sent or read, so
+    it shows CPU-bound or blocking calls on the loop. Lags above `warn_ms` are
+    logged.
+    """
+
+    def __init__(self, interval: float = 0.1, window: int = 3000, warn_ms: float = 250.0):
+        self.interval = interval
+        self.warn_ms = warn_ms
+        self._lag_ms: Deque[float] = deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+        self.samples = 0
+        self.max_lag_ms = 0.0 # since start (the window only keeps recent samples)
+
+    def start(self):
+        """Starts sampling on the running loop. Safe to call repeatedly."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="event-loop-lag")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (time.perf_counter() - expected) * 1000)
+            self._lag_ms.append(lag_ms)
+            self.samples += 1
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            EVENT_LOOP_LAG.observe(lag_ms / 1000)
+            if lag_ms > self.warn_ms:
+                logger.warning(f"Event loop lagged {lag_ms:.0f} ms.")
+
+    @property
+    def last_lag_ms(self) -> float:
+        return self._lag_ms[-1] if self._lag_ms else 0.0
+
+    def reset(self):
+        """Clears the window (e.g. between load-test stages)."""
+        self._lag_ms.clear()
+        self.max_lag_ms = 0.0
+
+    def get_stats(self) -> dict:
+        lags = sorted(self._lag_ms)
+
+        def pct(q: float) -> float:
+            return round(lags[min(len(lags) - 1, int(len(lags) * q))], 2) if lags else 0.0
+
+        return {
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "lag_ms": {"p50": pct(0.5), "p95": pct(0.95), "p99": pct(0.99), "max": round(self.max_lag_ms, 2)},
+        }
@@ -0,0 +1,237 @@
+# Metrics: counters, gauges and fixed-bucket histograms rendered in the Prometheus text format
+#
+# Recording is an integer increment (plus a bisect for histograms) on the
+# event loop; nothing is formatted until /metrics is scraped. Values are per
+# worker process, so scrape every worker (or sum them in Prometheus).
+import bisect
+import math
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds (1 ms .. 30 s)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values: str):
+        """The child for these label values (created on first use)."""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.label_names):
+                raise ValueError(f"{self.name} expects labels {self.label_names}, got {key}.")
+            child = self._children[key] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _default(self):
+        return self.labels() if not self.label_names else None
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for key, child in list(self._children.items()):
+            yield from self._render_child(key, child)
+
+    def _render_child(self, key: Tuple[str, ...], child) -> Iterator[str]:
+        raise NotImplementedError
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class Counter(_Metric):
+    """Monotonically increasing count. Name it `..._total`."""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    def _render_child(self, key, child):
+        yield f"{self.name}{_labels(self.label_names, key)} {_format_value(child.value)}"
+
+
+class _GaugeChild:
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self.value = value
+
+    def set_function(self, function: Callable[[], float]):
+        """Reads the value from `function` at scrape time (e.g. a queue length)."""
+        self.function = function
+
+    def get(self) -> float:
+        if self.function is not None:
+            try:
+                return float(self.function())
+            except Exception:
+                return math.nan
+        return self.value
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, set directly or read from a function at scrape time."""
+
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default().set(value)
+
+    def set_function(self, function: Callable[[], float]):
+        self._default().set_function(function)
+
+    def _render_child(self, key, child):
+        yield f"{self.name}{_labels(self.label_names, key)} {_format_value(child.get())}"
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # per bucket (not cumulative); last is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class Histogram(_Metric):
+    """Observations counted into fixed buckets (upper bounds, inclusive), plus their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    def _render_child(self, key, child):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), child.counts):
+            cumulative += count
+            le = 'le="' + _format_value(bound) + '"'
+            yield f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}"
+        yield f"{self.name}_sum{_labels(self.label_names, key)} {_format_value(child.sum)}"
+        yield f"{self.name}_count{_labels(self.label_names, key)} {child.count}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, label_names))
+
+    def gauge(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help_text, label_names))
+
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, label_names, buckets))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# --- Turn pipeline ---
+# memory_search: memory backend search (cache misses); context_assembly: memory context for a turn;
+# upstream_send: send_client_content; first_chunk / last_chunk: from the send to the first / last
+# event of the response; memory_write: a batched memory add; websocket_send: one frame to a client.
+STAGE_SECONDS = registry.histogram("allin_stage_seconds", "Latency of each turn pipeline stage.", ["stage"])
+TURNS = registry.counter("allin_turns_total", "Turns processed, by outcome.", ["outcome"])
+WS_FRAMES_SENT = registry.counter("allin_ws_frames_sent_total", "WebSocket frames sent to clients.")
+WS_BYTES_SENT = registry.counter("allin_ws_bytes_sent_total", "WebSocket payload bytes sent to clients.")
+ADMISSION_REJECTED = registry.counter("allin_admission_rejected_total", "Sessions and turns not admitted.", ["reason"])
+
+# --- Runtime ---
+ACTIVE_SESSIONS = registry.gauge("allin_active_sessions", "Open /ws sessions.")
+ACTIVE_TURNS = registry.gauge("allin_active_turns", "Turns holding an upstream slot.")
+QUEUED_TURNS = registry.gauge("allin_queued_turns", "Turns waiting for an upstream slot.")
+EVENT_LOOP_LAG = registry.histogram("allin_event_loop_lag_seconds", "How late the event loop ran a periodic timer.",
+                                    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+EXECUTOR_QUEUE_DEPTH = registry.gauge("allin_executor_queue_depth", "Calls waiting for an executor thread.",
+                                      ["executor"])
+EXECUTOR_IN_FLIGHT = registry.gauge("allin_executor_in_flight", "Calls running on an executor thread.", ["executor"])
+WRITE_BEHIND_PENDING = registry.gauge("allin_write_behind_pending", "Items waiting in a write-behind queue.",
+                                      ["queue"])
+
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_SECONDS.labels(stage).observe(seconds)
@@ -0,0 +1,223 @@
+# Live API session resumption handles: bounded in-process store and a SQLite store shared by workers
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from .config import settings
+from .logging_config import logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS session_handles (
+    user_id TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    handle TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (user_id, chat_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_session_handles_expires ON session_handles (expires_at);
+CREATE INDEX IF NOT EXISTS idx_session_handles_updated ON session_handles (updated_at);
+"""
+
+
+class SessionHandleStore(ABC):
+    """Latest resumption handle per (user_id, chat_id), valid for `ttl_seconds` after it was issued.
+
+    Handles are scoped to a chat: resuming restores that conversation's
+    server-side context, so a different chat of the same user must not reuse it.
+    Counters are per process.
+    """
+
+    name = "base"
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        self.writes = 0
+        self.deletes = 0
+
+    @abstractmethod
+    def get(self, user_id: str, chat_id: str) -> Optional[str]:
+        """Returns the handle, or None if there is none or it has expired."""
+
+    @abstractmethod
+    def set(self, user_id: str, chat_id: str, handle: str):
+        ...
+
+    @abstractmethod
+    def delete(self, user_id: str, chat_id: str):
+        ...
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    def close(self):
+        pass
+
+    def get_stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.name,
+            "entries": len(self),
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "writes": self.writes,
+            "deletes": self.deletes,
+        }
+
+
+class InMemorySessionHandleStore(SessionHandleStore):
+    """LRU bounded to `max_entries`, entries expire after `ttl_seconds`. Only visible to this worker."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 7200.0):
+        super().__init__(ttl_seconds)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, float]]" = OrderedDict() # key -> (handle, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str, chat_id: str) -> Optional[str]:
+        key = (user_id, chat_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            handle, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return handle
+
+    def set(self, user_id: str, chat_id: str, handle: str):
+        key = (user_id, chat_id)
+        with self._lock:
+            self._entries[key] = (handle, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            self.writes += 1
+            while len(self._entries) > self.max_entries:
+                _, (_, expires_at) = self._entries.popitem(last=False)
+                if expires_at <= time.monotonic():
+                    self.expired += 1
+                else:
+                    self.evicted += 1
+
+    def delete(self, user_id: str, chat_id: str):
+        with self._lock:
+            if self._entries.pop((user_id, chat_id), None) is not None:
+                self.deletes += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteSessionHandleStore(SessionHandleStore):
+    """Handles in a SQLite file (WAL) so a reconnect that lands on another uvicorn worker can still resume.
+
+    Expiry uses wall-clock time (shared between processes). Expired rows are
+    purged every `purge_every` writes; beyond `max_entries` the least recently
+    updated rows are dropped.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, db_path: str, max_entries: int = 100000, ttl_seconds: float = 7200.0, purge_every: int = 256):
+        super().__init__(ttl_seconds)
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.purge_every = purge_every
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        # Several workers write this file; wait on their locks instead of failing
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str, chat_id: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT handle, expires_at FROM session_handles WHERE user_id = ? AND chat_id = ?",
+                (user_id, chat_id)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            if row[1] <= now:
+                with self._conn:
+                    self._conn.execute(
+                        "DELETE FROM session_handles WHERE user_id = ? AND chat_id = ? AND expires_at <= ?",
+                        (user_id, chat_id, now))
+                self.expired += 1
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def set(self, user_id: str, chat_id: str, handle: str):
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO session_handles (user_id, chat_id, handle, updated_at, expires_at) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (user_id, chat_id) DO UPDATE SET "
+                    "handle = excluded.handle, updated_at = excluded.updated_at, expires_at = excluded.expires_at",
+                    (user_id, chat_id, handle, now, now + self.ttl_seconds))
+            self.writes += 1
+            if self.writes % self.purge_every == 0:
+                self._purge(now)
+
+    def _purge(self, now: float):
+        with self._conn:
+            self.expired += self._conn.execute(
+                "DELETE FROM session_handles WHERE expires_at <= ?", (now,)).rowcount
+            self.evicted += self._conn.execute(
+                "DELETE FROM session_handles WHERE (user_id, chat_id) IN ("
+                "SELECT user_id, chat_id FROM session_handles ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)).rowcount
+
+    def delete(self, user_id: str, chat_id: str):
+        with self._lock:
+            with self._conn:
+                if self._conn.execute("DELETE FROM session_handles WHERE user_id = ? AND chat_id = ?",
+                                      (user_id, chat_id)).rowcount:
+                    self.deletes += 1
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM session_handles").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_session_handle_store() -> SessionHandleStore:
+    """Builds the handle store selected by SESSION_HANDLE_BACKEND."""
+    backend = settings.session_handle_backend.lower()
+    if backend == "memory":
+        logger.info(f"Using in-memory session handle store (max {settings.session_handle_max_entries} entries).")
+        return InMemorySessionHandleStore(settings.session_handle_max_entries, settings.session_handle_ttl_seconds)
+    if backend == "sqlite":
+        logger.info(f"Using SQLite session handle store at {settings.session_handle_db_path}.")
+        return SQLiteSessionHandleStore(settings.session_handle_db_path, settings.session_handle_max_entries,
+                                        settings.session_handle_ttl_seconds)
+    raise ValueError(f"Unknown SESSION_HANDLE_BACKEND '{settings.session_handle_backend}'. Expected 'memory' or 'sqlite'.")
@@ -0,0 +1,188 @@
+# Streaming text to the client: flush policies for model text fragments and per-turn latency metrics
+import asyncio
+import re
+import time
+from collections import deque
+from typing import AsyncIterable, AsyncIterator, Callable, Deque, List, Optional
+
+FLUSH_POLICIES = ("immediate", "interval", "boundary")
+
+# End of a sentence (followed by whitespace) or of a line
+_BOUNDARY = re.compile(r"[.!?:;](?=\s)|\n")
+_END = object()
+
+
+class TextStreamEmitter:
+    """Decides when buffered model text is sent as a `text` event.
+
+    Policies:
+      immediate: every fragment is sent as it arrives.
+      interval:  pending text is sent once `interval_ms` passed since the last send.
+      boundary:  text is sent up to the last sentence/line boundary; without a
+                 boundary it is sent anyway after `interval_ms`, so long
+                 unpunctuated output still streams.
+    The first fragment of a turn is always sent at once (time to first token).
+    `push` flushes when a fragment arrives; between fragments the caller waits
+    at most `due_in()` seconds and then calls `flush()` (see `receive_with_deadline`),
+    so pending text never waits for the next upstream fragment. `flush()` also
+    sends the rest before a code part or at the end of the turn.
+    """
+
+    def __init__(self, policy: str = "interval", interval_ms: float = 40.0):
+        if policy not in FLUSH_POLICIES:
+            raise ValueError(f"Unknown flush policy '{policy}'. Expected one of {', '.join(FLUSH_POLICIES)}.")
+        self.policy = policy
+        self.interval = interval_ms / 1000
+        self._pending: List[str] = []
+        self._scanned = 0 # pending characters already searched for a boundary
+        self._last_flush: Optional[float] = None
+
+    def push(self, fragment: str) -> Optional[str]:
+        """Adds a fragment; returns the text to send now, if any."""
+        if not fragment:
+            return None
+        self._pending.append(fragment)
+        if self.policy == "immediate" or self._last_flush is None:
+            return self.flush()
+        if time.perf_counter() - self._last_flush >= self.interval:
+            return self.flush()
+        if self.policy == "boundary":
+            text = "".join(self._pending)
+            # Back up one character: a sentence end at the old tail only matches once whitespace follows
+            cut = 0
+            for match in _BOUNDARY.finditer(text, max(0, self._scanned - 1)):
+                cut = match.end()
+            if cut:
+                self._pending = [text[cut:]] if cut < len(text) else []
+                self._scanned = len(text) - cut
+                self._last_flush = time.perf_counter()
+                return text[:cut]
+            self._pending = [text]
+            self._scanned = len(text)
+        return None
+
+    def due_in(self) -> Optional[float]:
+        """Seconds until pending text is due to be flushed (0 if overdue, None if nothing is pending)."""
+        if not self._pending or self._last_flush is None:
+            return None
+        return max(0.0, self.interval - (time.perf_counter() - self._last_flush))
+
+    def flush(self) -> Optional[str]:
+        """Returns all pending text (None if there is none)."""
+        if not self._pending:
+            return None
+        text = "".join(self._pending)
+        self._pending = []
+        self._scanned = 0
+        self._last_flush = time.perf_counter()
+        return text
+
+
+async def receive_with_deadline(source: AsyncIterable, due_in: Callable[[], Optional[float]]) -> AsyncIterator:
+    """Yields the items of `source`, and None whenever `due_in()` seconds pass without one.
+
+    The pending read is shielded from the timeout, so the upstream stream is
+    never cancelled mid-message; it is cancelled only if the caller stops early.
+    """
+    iterator = source.__aiter__()
+    pending: Optional[asyncio.Future] = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(anext(iterator, _END))
+            timeout = due_in()
+            if timeout is None:
+                item = await pending
+            else:
+                try:
+                    item = await asyncio.wait_for(asyncio.shield(pending), timeout)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+            pending = None
+            if item is _END:
+                return
+            yield item
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
+
+
+class TurnLatency:
+    """Times one turn: time to first content event and the gaps between events."""
+
+    def __init__(self):
+        self.started = time.perf_counter() # message received
+        self.upstream_started: Optional[float] = None # turn sent to the Live API
+        self.first_event: Optional[float] = None
+        self.last_event: Optional[float] = None
+        self.gaps_ms: List[float] = []
+        self.events = 0
+        self.text_chars = 0
+
+    def sent_upstream(self):
+        self.upstream_started = time.perf_counter()
+
+    def event(self, text_chars: int = 0):
+        now = time.perf_counter()
+        if self.first_event is None:
+            self.first_event = now
+        else:
+            self.gaps_ms.append((now - self.last_event) * 1000)
+        self.last_event = now
+        self.events += 1
+        self.text_chars += text_chars
+
+    def summary(self) -> dict:
+        gaps = sorted(self.gaps_ms)
+        return {
+            "ttft_ms": round((self.first_event - self.started) * 1000, 1) if self.first_event else None,
+            "upstream_ttft_ms": round((self.first_event - self.upstream_started) * 1000, 1)
+            if self.first_event and self.upstream_started else None,
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "events": self.events,
+            "text_chars": self.text_chars,
+            "inter_chunk_p50_ms": round(gaps[len(gaps) // 2], 1) if gaps else None,
+            "inter_chunk_max_ms": round(gaps[-1], 1) if gaps else None,
+        }
+
+
+class StreamingStats:
+    """Recent per-turn latency summaries, aggregated for the admin endpoint."""
+
+    def __init__(self, window: int = 1024):
+        self.turns = 0
+        self._ttft_ms: Deque[float] = deque(maxlen=window)
+        self._upstream_ttft_ms: Deque[float] = deque(maxlen=window)
+        self._gap_ms: Deque[float] = deque(maxlen=window * 8)
+        self._events: Deque[int] = deque(maxlen=window)
+
+    def record(self, latency: TurnLatency):
+        summary = latency.summary()
+        self.turns += 1
+        if summary["ttft_ms"] is not None:
+            self._ttft_ms.append(summary["ttft_ms"])
+        if summary["upstream_ttft_ms"] is not None:
+            self._upstream_ttft_ms.append(summary["upstream_ttft_ms"])
+        self._gap_ms.extend(latency.gaps_ms)
+        self._events.append(summary["events"])
+
+    @staticmethod
+    def _percentiles(samples) -> dict:
+        if not samples:
+            return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+        ordered = sorted(samples)
+        return {
+            "p50": round(ordered[len(ordered) // 2], 1),
+            "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+            "max": round(ordered[-1], 1),
+        }
+
+    def get_stats(self) -> dict:
+        return {
+            "turns": self.turns,
+            "ttft_ms": self._percentiles(self._ttft_ms),
+            "upstream_ttft_ms": self._percentiles(self._upstream_ttft_ms),
+            "inter_chunk_ms": self._percentiles(self._gap_ms),
+            "events_per_turn": round(sum(self._events) / len(self._events), 1) if self._events else 0.0,
+        }
@@ -0,0 +1,89 @@
+# Rebuilds the per-user chat index from chat_turns and backfills it from the memory store
+#
+# Usage (from the project root):
+#   python -m allin_app.history.rebuild_index               # every user
+#   python -m allin_app.history.rebuild_index --user alice  # one user
+#   python -m allin_app.history.rebuild_index --no-memories # chat_turns only
+import argparse
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from ..core.logging_config import logger
+from ..memory.backends import MemoryBackend, create_memory_backend
+from .store import ChatTurnStore, create_history_store, summarize_chats
+
+
+def _results(response) -> List[dict]:
+    """Unwraps mem0-style responses, which are either a list or {"results": [...]}."""
+    if isinstance(response, dict):
+        response = response.get("results", [])
+    return response if isinstance(response, list) else []
+
+
+def _epoch(value) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def memory_chat_entries(backend: MemoryBackend, user_ids: List[str]) -> Dict[Tuple[str, str], list]:
+    """Derives chat index entries from memories carrying a `chat_id` in their metadata."""
+    turns = []
+    for user_id in user_ids:
+        for memory in _results(backend.get_all(user_id=user_id)):
+            metadata = memory.get("metadata") if isinstance(memory, dict) else None
+            chat_id = metadata.get("chat_id") if isinstance(metadata, dict) else None
+            timestamp = _epoch(memory.get("created_at"))
+            if not chat_id or timestamp is None:
+                continue
+            turns.append({
+                "user_id": user_id,
+                "chat_id": chat_id,
+                # mem0 memories carry no role; treat them as user-side text for the title
+                "role": metadata.get("role") or "user",
+                "content": memory.get("memory") or "",
+                "timestamp": timestamp,
+            })
+    turns.sort(key=lambda turn: turn["timestamp"])
+    return summarize_chats(turns)
+
+
+def rebuild(store: ChatTurnStore, backend: Optional[MemoryBackend], user_id: Optional[str] = None) -> Dict[str, int]:
+    started = time.perf_counter()
+    indexed = store.rebuild_chat_index(user_id)
+    backfilled = 0
+    if backend is not None:
+        user_ids = [user_id] if user_id else [
+            user.get("name") for user in _results(backend.users()) if isinstance(user, dict) and user.get("name")]
+        backfilled = store.merge_chat_index(memory_chat_entries(backend, user_ids))
+    stats = {"chats_from_turns": indexed, "chats_from_memories": backfilled,
+             "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+    logger.info(f"Chat index rebuilt{f' for user {user_id}' if user_id else ''}: {stats}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the per-user chat index.")
+    parser.add_argument("--user", help="Only rebuild this user's chats.")
+    parser.add_argument("--no-memories", action="store_true", help="Skip the memory-store backfill.")
+    args = parser.parse_args()
+
+    store = create_history_store()
+    backend = None if args.no_memories else create_memory_backend()
+    try:
+        print(rebuild(store, backend, user_id=args.user))
+    finally:
+        store.close()
+        if backend is not None:
+            backend.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+# Raw chat transcript storage (`chat_turns`) and per-user chat index, with keyset pagination
+import base64
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ..core.config import settings
+from ..core.logging_config import logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_turns (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    timestamp REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chat_turns_user_chat_ts ON chat_turns (user_id, chat_id, timestamp);
+CREATE TABLE IF NOT EXISTS chat_index (
+    user_id TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_active REAL NOT NULL,
+    turn_count INTEGER NOT NULL,
+    title TEXT,
+    PRIMARY KEY (user_id, chat_id)
+);
+CREATE INDEX IF NOT EXISTS idx_chat_index_last_active ON chat_index (user_id, last_active, chat_id);
+CREATE INDEX IF NOT EXISTS idx_chat_index_created_at ON chat_index (user_id, created_at, chat_id);
+"""
+
+CHAT_SORT_FIELDS = ("last_active", "created_at")
+TITLE_CHARS = 80
+
+# Merges a batch into the index; the title is set once, from the first user message seen
+_UPSERT_CHAT = """
+INSERT INTO chat_index (user_id, chat_id, created_at, last_active, turn_count, title)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (user_id, chat_id) DO UPDATE SET
+    created_at = MIN(created_at, excluded.created_at),
+    last_active = MAX(last_active, excluded.last_active),
+    turn_count = turn_count + excluded.turn_count,
+    title = COALESCE(title, excluded.title)
+"""
+
+
+def encode_cursor(*values) -> str:
+    """Opaque keyset cursor: the sort key of the last item on the previous page."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, *types) -> tuple:
+    """Inverse of `encode_cursor`, coercing each value with `types`. Raises ValueError for malformed cursors."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if len(values) != len(types):
+            raise ValueError("wrong arity")
+        return tuple(kind(value) for kind, value in zip(types, values))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def _iso(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat()
+
+
+def chat_title(text: str) -> Optional[str]:
+    """Single-line title snippet for a chat, from its first user message."""
+    return " ".join(text.split())[:TITLE_CHARS] or None
+
+
+def summarize_chats(turns: Iterable[dict]) -> Dict[Tuple[str, str], list]:
+    """Folds turns into per-chat [created_at, last_active, turn_count, title] index entries."""
+    chats: Dict[Tuple[str, str], list] = {}
+    for turn in turns:
+        key = (turn["user_id"], turn["chat_id"])
+        entry = chats.get(key)
+        if entry is None:
+            entry = chats[key] = [turn["timestamp"], turn["timestamp"], 0, None]
+        entry[0] = min(entry[0], turn["timestamp"])
+        entry[1] = max(entry[1], turn["timestamp"])
+        entry[2] += 1
+        if entry[3] is None and turn["role"] == "user":
+            entry[3] = chat_title(turn["content"])
+    return chats
+
+
+class ChatTurnStore(ABC):
+    """Append-only store of raw conversation turns.
+
+    A turn is a dict with `user_id`, `chat_id`, `role`, `content` and
+    `timestamp` (epoch seconds). Pages are returned newest first and walked
+    with a keyset cursor, so every page costs the same regardless of depth.
+    """
+
+    name = "abstract"
+
+    @abstractmethod
+    def add_turns(self, turns: List[dict]) -> int:
+        """Inserts turns in one transaction. Returns the number written."""
+
+    @abstractmethod
+    def get_page(self, user_id: str, chat_id: str, limit: int,
+                 cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """Returns (turns newest first, next_cursor or None when there are no older turns)."""
+
+    @abstractmethod
+    def list_chats(self, user_id: str, limit: int, cursor: Optional[str] = None, sort: str = "last_active",
+                   descending: bool = True) -> Tuple[List[dict], Optional[str]]:
+        """Returns (chat summaries from the chat index, next_cursor or None)."""
+
+    @abstractmethod
+    def rebuild_chat_index(self, user_id: Optional[str] = None) -> int:
+        """Recomputes index entries from the stored turns (one user, or everyone). Returns chats indexed."""
+
+    @abstractmethod
+    def merge_chat_index(self, entries: Dict[Tuple[str, str], list]) -> int:
+        """Merges externally derived entries (see `summarize_chats`) without double-counting known chats."""
+
+    def close(self):
+        pass
+
+
+class SQLiteChatTurnStore(ChatTurnStore):
+    """`chat_turns` and its per-user `chat_index` in a local SQLite database (WAL).
+
+    The chat index is updated in the same transaction as the turns it
+    summarizes, so listing a user's chats reads one row per chat instead of
+    scanning their history.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        # Writer flushes and endpoint reads arrive on different threads; one connection guarded by a lock
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def add_turns(self, turns: List[dict]) -> int:
+        rows = [(t["user_id"], t["chat_id"], t["role"], t["content"], t["timestamp"]) for t in turns]
+        index_rows = [(user_id, chat_id, *entry) for (user_id, chat_id), entry in summarize_chats(turns).items()]
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO chat_turns (user_id, chat_id, role, content, timestamp) VALUES (?, ?, ?, ?, ?)", rows)
+                self._conn.executemany(_UPSERT_CHAT, index_rows)
+        return len(rows)
+
+    def get_page(self, user_id: str, chat_id: str, limit: int,
+                 cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        # One extra row tells us whether an older page exists without a COUNT(*)
+        if cursor:
+            before_ts, before_id = decode_cursor(cursor, float, int)
+            sql = ("SELECT id, role, content, timestamp FROM chat_turns "
+                   "WHERE user_id = ? AND chat_id = ? AND (timestamp, id) < (?, ?) "
+                   "ORDER BY timestamp DESC, id DESC LIMIT ?")
+            params = (user_id, chat_id, before_ts, before_id, limit + 1)
+        else:
+            sql = ("SELECT id, role, content, timestamp FROM chat_turns "
+                   "WHERE user_id = ? AND chat_id = ? ORDER BY timestamp DESC, id DESC LIMIT ?")
+            params = (user_id, chat_id, limit + 1)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][3], rows[-1][0])
+        turns = [
+            {
+                "id": turn_id,
+                "role": role,
+                "content": content,
+                "timestamp": _iso(timestamp),
+            }
+            for turn_id, role, content, timestamp in rows
+        ]
+        return turns, next_cursor
+
+    def list_chats(self, user_id: str, limit: int, cursor: Optional[str] = None, sort: str = "last_active",
+                   descending: bool = True) -> Tuple[List[dict], Optional[str]]:
+        if sort not in CHAT_SORT_FIELDS:
+            raise ValueError(f"Unknown sort '{sort}'. Expected one of {', '.join(CHAT_SORT_FIELDS)}.")
+        # `sort` is whitelisted above, so it is safe to splice into the SQL
+        direction, compare = ("DESC", "<") if descending else ("ASC", ">")
+        sql = "SELECT chat_id, created_at, last_active, turn_count, title FROM chat_index WHERE user_id = ?"
+        params: list = [user_id]
+        if cursor:
+            sql += f" AND ({sort}, chat_id) {compare} (?, ?)"
+            params.extend(decode_cursor(cursor, float, str))
+        sql += f" ORDER BY {sort} {direction}, chat_id {direction} LIMIT ?"
+        params.append(limit + 1)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(last[2] if sort == "last_active" else last[1], last[0])
+        chats = [
+            {
+                "chat_id": chat_id,
+                "title": title,
+                "created_at": _iso(created_at),
+                "last_active": _iso(last_active),
+                "turn_count": turn_count,
+            }
+            for chat_id, created_at, last_active, turn_count, title in rows
+        ]
+        return chats, next_cursor
+
+    def rebuild_chat_index(self, user_id: Optional[str] = None) -> int:
+        where, params = ("WHERE user_id = ?", (user_id,)) if user_id else ("", ())
+        with self._lock:
+            with self._conn:
+                self._conn.execute(f"DELETE FROM chat_index {where}", params)
+                cursor = self._conn.execute(f"""
+                    INSERT INTO chat_index (user_id, chat_id, created_at, last_active, turn_count)
+                    SELECT user_id, chat_id, MIN(timestamp), MAX(timestamp), COUNT(*)
+                    FROM chat_turns {where} GROUP BY user_id, chat_id
+                """, params)
+                indexed = cursor.rowcount
+                # Title: the earliest user message of each chat
+                first_messages = self._conn.execute(f"""
+                    SELECT c.user_id, c.chat_id,
+                        (SELECT t.content FROM chat_turns t
+                         WHERE t.user_id = c.user_id AND t.chat_id = c.chat_id AND t.role = 'user'
+                         ORDER BY t.timestamp, t.id LIMIT 1)
+                    FROM chat_index c {where.replace("user_id", "c.user_id")}
+                """, params).fetchall()
+                self._conn.executemany(
+                    "UPDATE chat_index SET title = ? WHERE user_id = ? AND chat_id = ?",
+                    [(chat_title(content), user_id, chat_id) for user_id, chat_id, content in first_messages if content])
+                return indexed
+
+    def merge_chat_index(self, entries: Dict[Tuple[str, str], list]) -> int:
+        rows = [(user_id, chat_id, *entry) for (user_id, chat_id), entry in entries.items()]
+        with self._lock:
+            with self._conn:
+                # Widen the time range of chats we already know; their turn counts come from chat_turns
+                self._conn.executemany("""
+                    INSERT INTO chat_index (user_id, chat_id, created_at, last_active, turn_count, title)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (user_id, chat_id) DO UPDATE SET
+                        created_at = MIN(created_at, excluded.created_at),
+                        last_active = MAX(last_active, excluded.last_active),
+                        title = COALESCE(title, excluded.title)
+                """, rows)
+        return len(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_history_store() -> ChatTurnStore:
+    """Builds the chat history store selected by HISTORY_BACKEND."""
+    backend = settings.history_backend.lower()
+    if backend == "sqlite":
+        logger.info(f"Using SQLite chat history store at {settings.history_db_path}.")
+        return SQLiteChatTurnStore(settings.history_db_path)
+    raise ValueError(f"Unknown HISTORY_BACKEND '{settings.history_backend}'. Expected 'sqlite'.")
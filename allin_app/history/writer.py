@@ -0,0 +1,157 @@
+# Batched background writer for raw chat turns
+import asyncio
+import time
+from typing import List, Optional
+
+from ..core.logging_config import logger
+from .store import ChatTurnStore
+
+
+class ChatHistoryWriter:
+    """Accepts turns synchronously and inserts them into the store in batches.
+
+    `submit_turns` only appends to an in-memory list, so recording history
+    never adds a database round trip to the chat path. A background task
+    writes everything pending in one transaction when `batch_size` turns are
+    waiting or the oldest is `flush_interval` seconds old. Failed writes are
+    retried after `flush_interval`; beyond `max_pending` the oldest turns are
+    dropped.
+    """
+
+    def __init__(self, store: ChatTurnStore, batch_size: int = 128, flush_interval: float = 0.5,
+                 max_pending: int = 10000):
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._pending: List[dict] = []
+        self._oldest_ts: Optional[float] = None # monotonic time the oldest pending turn arrived
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        # --- Stats ---
+        self.submitted = 0
+        self.written = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    # --- Lifecycle ---
+
+    def _ensure_started(self):
+        """Starts the flush task on first use (needs a running loop)."""
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="chat-history-writer")
+
+    async def stop(self, timeout: float = 10.0):
+        """Writes pending turns (bounded by `timeout`) and stops the flush task."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Chat history writer did not drain within {timeout}s; {len(self._pending)} turn(s) lost.")
+            self._task.cancel()
+
+    # --- Producer side ---
+
+    def submit_turns(self, user_id: str, chat_id: str, messages: List[dict]) -> bool:
+        """Queues messages ({'role', 'content', optional 'timestamp'}) for writing. Never blocks.
+
+        Returns False if the writer is stopping and the messages were dropped.
+        """
+        if self._stopping:
+            logger.warning(f"Chat history writer is stopping; dropped {len(messages)} turn(s) for user {user_id}.")
+            self.dropped += len(messages)
+            return False
+        self._ensure_started()
+        now = time.time()
+        for message in messages:
+            self._pending.append({
+                "user_id": user_id,
+                "chat_id": chat_id,
+                "role": message["role"],
+                "content": message.get("content") or "",
+                "timestamp": message.get("timestamp") or now,
+            })
+        self.submitted += len(messages)
+        if self._oldest_ts is None:
+            self._oldest_ts = time.monotonic()
+        overflow = len(self._pending) - self.max_pending
+        if overflow > 0:
+            del self._pending[:overflow]
+            self.dropped += overflow
+            logger.warning(f"Chat history queue full ({self.max_pending}); dropped {overflow} oldest turn(s).")
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    async def flush(self):
+        """Writes everything pending now (e.g. before serving a history read)."""
+        if self._task is None or not self._pending:
+            return
+        await self._flush()
+
+    # --- Consumer side ---
+
+    async def _run(self):
+        while True:
+            timeout = None
+            if self._pending:
+                timeout = max(0.0, self.flush_interval - (time.monotonic() - self._oldest_ts))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._pending and not await self._flush():
+                if self._stopping:
+                    return
+                await asyncio.sleep(self.flush_interval)
+            if self._stopping and not self._pending:
+                return
+
+    async def _flush(self) -> bool:
+        async with self._flush_lock:
+            if not self._pending:
+                return True
+            batch, self._pending, self._oldest_ts = self._pending, [], None
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(self.store.add_turns, batch)
+            except Exception as e:
+                self.failed_flushes += 1
+                logger.error(f"Chat history write of {len(batch)} turn(s) failed: {e}")
+                # Put the batch back ahead of anything submitted meanwhile, keeping order
+                self._pending = batch + self._pending
+                self._oldest_ts = time.monotonic()
+                return False
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.flushes += 1
+            self.written += len(batch)
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            logger.debug(f"Chat history flush: {len(batch)} turn(s) in {elapsed_ms:.1f} ms.")
+            return True
+
+    def get_stats(self) -> dict:
+        return {
+            "queue_depth": len(self._pending),
+            "submitted": self.submitted,
+            "written": self.written,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "dropped": self.dropped,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+        }
@@ -0,0 +1,114 @@
+# Memory store backends: the mem0 cloud client or a local SQLite/NumPy store
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Optional
+
+from ..core.config import settings
+from ..core.logging_config import logger
+
+
+class MemoryBackend(ABC):
+    """Synchronous memory store interface, shaped after mem0's MemoryClient.
+
+    MemoryManager runs every call on its bounded executor, so implementations
+    may block. Return shapes follow the mem0 client so the REST endpoints work
+    unchanged against any backend:
+      - add(...)     -> list of {"id", "memory", "event"}
+      - search(...)  -> list of {"id", "memory", "score", "metadata", "created_at", ...}
+      - get_all(...) -> list of memory dicts
+      - iter_all(...) -> the same memories as successive lists (pages)
+      - users()      -> {"count": n, "results": [{"name": user_id, ...}]}
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def add(self, messages: List[dict], user_id: str, metadata: Optional[dict] = None) -> Any:
+        ...
+
+    @abstractmethod
+    def search(self, query: str, user_id: str, limit: int = 5) -> List[dict]:
+        ...
+
+    @abstractmethod
+    def get_all(self, user_id: str, filters: Optional[dict] = None) -> Any:
+        ...
+
+    @abstractmethod
+    def users(self) -> Dict[str, Any]:
+        ...
+
+    def iter_all(self, user_id: str, filters: Optional[dict] = None, page_size: int = 500) -> Iterator[List[dict]]:
+        """Yields a user's memories page by page, oldest first.
+
+        The default cannot page: it yields the whole `get_all` result at once.
+        Backends that can read incrementally override it.
+        """
+        response = self.get_all(user_id=user_id, filters=filters)
+        if isinstance(response, dict):
+            response = response.get("results", [])
+        yield response if isinstance(response, list) else []
+
+    def close(self):
+        pass
+
+
+class Mem0Backend(MemoryBackend):
+    """Thin adapter over mem0's cloud MemoryClient."""
+
+    name = "mem0"
+
+    def __init__(self, api_key: Optional[str] = None, client=None):
+        if client is None:
+            from mem0 import MemoryClient # Deferred: only needed for the cloud backend
+            client = MemoryClient(api_key=api_key)
+        self.client = client # or a stand-in with the same methods (core/fakes.FakeMemoryClient)
+
+    def add(self, messages, user_id, metadata=None):
+        return self.client.add(messages, user_id=user_id, metadata=metadata or {})
+
+    def search(self, query, user_id, limit=5):
+        return self.client.search(query=query, user_id=user_id, limit=limit)
+
+    def get_all(self, user_id, filters=None):
+        if filters:
+            return self.client.get_all(user_id=user_id, filters=filters)
+        return self.client.get_all(user_id=user_id)
+
+    def iter_all(self, user_id, filters=None, page_size=500):
+        """Pages through the v2 `get_all` API; stops at the first short (or last) page."""
+        conditions = [{"user_id": user_id}]
+        if filters:
+            conditions.extend(filters["AND"] if "AND" in filters else [filters])
+        page = 1
+        while True:
+            response = self.client.get_all(version="v2", filters={"AND": conditions}, page=page, page_size=page_size)
+            results = response.get("results", []) if isinstance(response, dict) else response or []
+            if results:
+                yield results
+            if len(results) < page_size or (isinstance(response, dict) and not response.get("next", True)):
+                return
+            page += 1
+
+    def users(self):
+        return self.client.users()
+
+
+def create_memory_backend() -> MemoryBackend:
+    """Builds the backend selected by MEMORY_BACKEND ('mem0', 'local' or 'fake')."""
+    backend = settings.memory_backend.lower()
+    if backend == "local":
+        from .local_backend import LocalMemoryBackend # Deferred: pulls in numpy
+        logger.info(f"Using local memory backend at {settings.local_memory_db_path}.")
+        return LocalMemoryBackend(db_path=settings.local_memory_db_path, embedding_dim=settings.local_embedding_dim)
+    if backend == "mem0":
+        if not settings.mem0_api_key:
+            # According to docs/errors, API key is required for MemoryClient, either via arg or env var.
+            # Throw an error if not provided, rather than letting it fail later.
+            raise ValueError("MEM0_API_KEY is required but not found in environment settings for MemoryClient.")
+        logger.info("Using MEM0_API_KEY from environment for MemoryClient.")
+        return Mem0Backend(api_key=settings.mem0_api_key)
+    if backend == "fake":
+        from ..core.fakes import FakeMemoryClient
+        logger.warning(f"Using the offline fake mem0 client ({settings.fake_memory_latency_ms:.0f} ms per call).")
+        return Mem0Backend(client=FakeMemoryClient(settings.fake_memory_latency_ms, settings.fake_memory_jitter_ms))
+    raise ValueError(f"Unknown MEMORY_BACKEND '{settings.memory_backend}'. Expected 'mem0', 'local' or 'fake'.")
@@ -0,0 +1,145 @@
+# In-process cache for memory search results (LRU + TTL, per-user invalidation, single-flight)
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Set, Tuple
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = " \t\n.,!?;:'\"`"
+
+
+def normalize_query(query: str) -> str:
+    """Normalizes a query so trivially different follow-ups share a cache entry."""
+    return _WHITESPACE_RE.sub(" ", query.lower()).strip(_EDGE_PUNCTUATION)
+
+
+def _approx_size(value: Any) -> int:
+    """Rough payload size in bytes of a cached search result (list of memory dicts)."""
+    if isinstance(value, list):
+        return sum(len(str(item.get("memory", ""))) if isinstance(item, dict) else len(str(item)) for item in value)
+    return len(str(value))
+
+
+class MemoryRetrievalCache:
+    """Bounded cache of search results keyed by (user_id, normalized query, limit).
+
+    - Entries expire `ttl` seconds after they were stored.
+    - When more than `max_entries` are stored the least recently used is evicted.
+    - `invalidate_user` drops every entry of a user; it also bumps a per-user
+      generation so that searches already in flight do not re-populate the
+      cache with results from before the write.
+    - Concurrent lookups for the same key share a single loader call.
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple, Tuple[float, Any, int]]" = OrderedDict() # key -> (expires_at, value, size)
+        self._user_keys: Dict[str, Set[Tuple]] = {}
+        self._generations: Dict[str, int] = {}
+        self._inflight: Dict[Tuple, Tuple[int, asyncio.Future]] = {} # key -> (generation, shared load)
+        self._bytes = 0
+
+        # --- Stats ---
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(user_id: str, query: str, limit: int) -> Tuple[str, str, int]:
+        return (user_id, normalize_query(query), limit)
+
+    def _remove(self, key: Tuple):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+        keys = self._user_keys.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[key[0]]
+
+    def get(self, key: Tuple) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def put(self, key: Tuple, value: Any):
+        if self.max_entries <= 0:
+            return
+        if key in self._entries:
+            self._remove(key)
+        size = _approx_size(value)
+        self._entries[key] = (time.monotonic() + self.ttl, value, size)
+        self._bytes += size
+        self._user_keys.setdefault(key[0], set()).add(key)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate_user(self, user_id: str):
+        """Drops all cached results for a user after a memory write."""
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        for key in list(self._user_keys.get(user_id, ())):
+            self._remove(key)
+        self.invalidations += 1
+
+    async def get_or_load(self, key: Tuple, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Returns the cached value for `key`, or runs `loader` once for all concurrent callers."""
+        hit, value = self.get(key)
+        if hit:
+            self.hits += 1
+            return value
+
+        user_id = key[0]
+        generation = self._generations.get(user_id, 0)
+        pending = self._inflight.get(key)
+        # Only join a load started after the user's latest write
+        if pending is not None and pending[0] == generation:
+            self.coalesced += 1
+            # shield: one caller being cancelled must not cancel the shared load
+            return await asyncio.shield(pending[1])
+
+        self.misses += 1
+        task = asyncio.ensure_future(loader())
+        self._inflight[key] = (generation, task)
+
+        def _on_done(fut: asyncio.Future):
+            if self._inflight.get(key, (None, None))[1] is fut:
+                del self._inflight[key]
+            if fut.cancelled() or fut.exception() is not None:
+                return
+            # Skip results that raced with a write for this user
+            if self._generations.get(user_id, 0) == generation:
+                self.put(key, fut.result())
+
+        task.add_done_callback(_on_done)
+        return await asyncio.shield(task)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "approx_bytes": self._bytes,
+            "users": len(self._user_keys),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
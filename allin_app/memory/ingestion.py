@@ -0,0 +1,296 @@
+# Write-behind ingestion pipeline: batches conversation turns into mem0 `add` calls
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from ..core.logging_config import logger
+
+
+class MemoryIngestionPipeline:
+    """Queues finished turns and writes them to the memory store in the background.
+
+    Turns are accepted synchronously by `submit_turn` (no awaits on the chat hot
+    path), appended to a local append-only spool file, and flushed either when
+    `batch_size` turns are pending or when the oldest pending turn is older than
+    `flush_interval` seconds. A flush combines all pending turns of the same
+    (user_id, chat_id) into a single `add_messages` call.
+
+    Spool format (JSON lines):
+        {"op": "turn", "id": ..., "user_id": ..., "chat_id": ..., "messages": [...], "ts": ...}
+        {"op": "ack", "ids": [...]}
+    `start()` (called at app startup) replays turns without a matching ack, so
+    nothing submitted before a crash or restart is lost. Once acknowledged
+    records take up `compact_bytes`, the spool is rewritten with only the
+    pending turns.
+    """
+
+    def __init__(
+        self,
+        memory_manager,
+        spool_path: Optional[str],
+        batch_size: int = 16,
+        flush_interval: float = 2.0,
+        max_pending: int = 1000,
+        max_retries: int = 5,
+        compact_bytes: int = 8 << 20,
+    ):
+        self.memory_manager = memory_manager
+        self.spool_path = spool_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.compact_bytes = compact_bytes
+
+        self._pending: List[dict] = []
+        self._attempts: Dict[str, int] = {} # turn id -> failed flush attempts
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._spool_file = None
+        self._record_bytes: Dict[str, int] = {} # turn id -> size of its spool line
+        self._acked_bytes = 0 # spool bytes that a compaction would drop
+        self._started = False
+        self._stopping = False
+
+        # --- Stats ---
+        self.submitted = 0
+        self.flushed_turns = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+        self.replayed = 0
+        self.compactions = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    # --- Lifecycle ---
+
+    def start(self):
+        """Replays the spool and starts the flush task (needs a running loop). Safe to call repeatedly."""
+        if self._started:
+            return
+        self._started = True
+        self._wakeup = asyncio.Event()
+        self._replay_spool()
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="memory-ingestion")
+        if self._pending:
+            self._wakeup.set()
+
+    def _replay_spool(self):
+        """Loads unacknowledged turns from the spool, then rewrites it compacted."""
+        if not self.spool_path:
+            return
+        turns: Dict[str, dict] = {}
+        try:
+            os.makedirs(os.path.dirname(self.spool_path) or ".", exist_ok=True)
+            if os.path.exists(self.spool_path):
+                with open(self.spool_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except json.JSONDecodeError:
+                            # A torn final line from a crash mid-write; everything before it is intact.
+                            logger.warning(f"Skipping corrupt line in memory spool {self.spool_path}.")
+                            continue
+                        if record.get("op") == "turn":
+                            turns[record["id"]] = record
+                        elif record.get("op") == "ack":
+                            for turn_id in record.get("ids", []):
+                                turns.pop(turn_id, None)
+            self._pending = list(turns.values())
+            self.replayed = len(self._pending)
+            self._rewrite_spool()
+            if self.replayed:
+                logger.info(f"Replayed {self.replayed} pending memory turn(s) from spool {self.spool_path}.")
+        except Exception as e:
+            logger.error(f"Memory spool unavailable ({self.spool_path}), continuing in-memory only: {e}", exc_info=True)
+            self._spool_file = None
+
+    def _rewrite_spool(self):
+        """Rewrites the spool with only the pending turns and reopens it for appending."""
+        if self._spool_file:
+            self._spool_file.close()
+            self._spool_file = None
+        self._record_bytes.clear()
+        self._acked_bytes = 0
+        tmp_path = f"{self.spool_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in self._pending:
+                line = json.dumps(record) + "\n"
+                f.write(line)
+                self._record_bytes[record["id"]] = len(line)
+        os.replace(tmp_path, self.spool_path)
+        self._spool_file = open(self.spool_path, "a", encoding="utf-8")
+
+    def _spool_append(self, record: dict):
+        if not self._spool_file:
+            return
+        try:
+            line = json.dumps(record) + "\n"
+            self._spool_file.write(line)
+            self._spool_file.flush()
+        except Exception as e:
+            logger.error(f"Failed to append to memory spool: {e}")
+            return
+        if record["op"] == "turn":
+            self._record_bytes[record["id"]] = len(line)
+        else:
+            self._acked_bytes += len(line) + sum(self._record_bytes.pop(turn_id, 0) for turn_id in record["ids"])
+
+    def _maybe_compact(self):
+        """Drops acknowledged records from the spool once they reach `compact_bytes`.
+
+        Called after a flush, when every unacknowledged turn is in `_pending`.
+        """
+        if not self._spool_file or self._acked_bytes < self.compact_bytes:
+            return
+        try:
+            self._rewrite_spool()
+            self.compactions += 1
+        except Exception as e:
+            logger.error(f"Failed to compact memory spool {self.spool_path}: {e}", exc_info=True)
+            if self._spool_file is None:
+                try:
+                    self._spool_file = open(self.spool_path, "a", encoding="utf-8")
+                except OSError:
+                    pass
+
+    async def stop(self, timeout: float = 10.0):
+        """Flushes pending turns, including any replayed from the spool (bounded by `timeout`), and stops the flush task."""
+        if not self._started:
+            self.start() # never started (e.g. shutdown during startup): still drain what the spool holds
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Memory ingestion did not drain within {timeout}s; {len(self._pending)} turn(s) remain in the spool.")
+            self._task.cancel()
+        if self._spool_file:
+            self._spool_file.close()
+            self._spool_file = None
+
+    # --- Producer side ---
+
+    def submit_turn(self, user_id: str, chat_id: Optional[str], messages: List[dict]) -> bool:
+        """Queues one turn (a list of {'role', 'content'} messages) for background ingestion.
+
+        Never blocks. Returns False if the turn was dropped.
+        """
+        if self._stopping:
+            logger.warning(f"Memory ingestion is stopping; dropped turn for user {user_id}.")
+            self.dropped += 1
+            return False
+        self.start()
+        record = {
+            "op": "turn",
+            "id": uuid.uuid4().hex,
+            "user_id": user_id,
+            "chat_id": chat_id,
+            "messages": messages,
+            "ts": time.time(),
+        }
+        if len(self._pending) >= self.max_pending:
+            # Shed the oldest turn rather than grow without bound behind a dead upstream
+            oldest = self._pending.pop(0)
+            self._attempts.pop(oldest["id"], None)
+            self._spool_append({"op": "ack", "ids": [oldest["id"]]})
+            self.dropped += 1
+            logger.warning(f"Memory ingestion queue full ({self.max_pending}); dropped oldest turn for user {oldest['user_id']}.")
+        self._spool_append(record)
+        self._pending.append(record)
+        self.submitted += 1
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    # --- Consumer side ---
+
+    async def _run(self):
+        while True:
+            timeout = None
+            if self._pending:
+                age = time.time() - self._pending[0]["ts"]
+                timeout = max(0.0, self.flush_interval - age)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._pending:
+                if not await self._flush():
+                    # Back off instead of hot-looping on a failing upstream
+                    await asyncio.sleep(self.flush_interval)
+            if self._stopping and not self._pending:
+                return
+
+    async def _flush(self) -> bool:
+        """Flushes everything pending. Returns False if some groups must be retried."""
+        batch, self._pending = self._pending, []
+        groups: Dict[Tuple[str, Optional[str]], List[dict]] = {}
+        for record in batch:
+            groups.setdefault((record["user_id"], record["chat_id"]), []).append(record)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(self._flush_group(user_id, chat_id, records) for (user_id, chat_id), records in groups.items())
+        )
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.flushes += 1
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+
+        acked: List[str] = []
+        retry: List[dict] = []
+        for records, ok in zip(groups.values(), results):
+            if ok:
+                acked.extend(r["id"] for r in records)
+                self.flushed_turns += len(records)
+                continue
+            for record in records:
+                attempts = self._attempts.get(record["id"], 0) + 1
+                if attempts >= self.max_retries:
+                    acked.append(record["id"])
+                    self._attempts.pop(record["id"], None)
+                    self.dropped += 1
+                    logger.error(f"Dropping memory turn for user {record['user_id']} after {attempts} failed attempts.")
+                else:
+                    self._attempts[record["id"]] = attempts
+                    retry.append(record)
+        for turn_id in acked:
+            self._attempts.pop(turn_id, None)
+        if acked:
+            self._spool_append({"op": "ack", "ids": acked})
+        if retry:
+            self.failed_flushes += 1
+            # Failed turns go back in front of anything submitted during the flush
+            self._pending = retry + self._pending
+        self._maybe_compact()
+        logger.debug(f"Memory ingestion flush: {len(batch)} turn(s) in {len(groups)} add call(s), {len(retry)} to retry, {elapsed_ms:.1f} ms.")
+        return not retry
+
+    async def _flush_group(self, user_id: str, chat_id: Optional[str], records: List[dict]) -> bool:
+        messages = [message for record in records for message in record["messages"]]
+        try:
+            await self.memory_manager.add_messages(user_id=user_id, messages=messages, chat_id=chat_id)
+            return True
+        except Exception as e:
+            logger.error(f"Batched memory add failed for user {user_id}, chat {chat_id}: {e}")
+            return False
+
+    def get_stats(self) -> dict:
+        return {
+            "queue_depth": len(self._pending),
+            "submitted": self.submitted,
+            "flushed_turns": self.flushed_turns,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "dropped": self.dropped,
+            "replayed": self.replayed,
+            "compactions": self.compactions,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+        }
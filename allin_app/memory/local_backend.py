@@ -0,0 +1,213 @@
+# Local memory backend: SQLite persistence + per-user NumPy embedding matrices
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from ..core.embeddings import HashingEmbedder
+from ..core.logging_config import logger
+from .backends import MemoryBackend
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memories (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    chat_id TEXT,
+    role TEXT,
+    memory TEXT NOT NULL,
+    metadata TEXT NOT NULL DEFAULT '{}',
+    created_at TEXT NOT NULL,
+    embedding BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_memories_user_chat ON memories (user_id, chat_id, created_at);
+"""
+
+
+def _metadata_conditions(filters: Optional[dict]) -> Dict[str, Any]:
+    """Flattens mem0-style filters ({"AND": [{"metadata": {...}}]}) into metadata equality checks."""
+    conditions: Dict[str, Any] = {}
+    if not filters:
+        return conditions
+    clauses = filters.get("AND", [filters]) if isinstance(filters, dict) else []
+    for clause in clauses:
+        if isinstance(clause, dict) and isinstance(clause.get("metadata"), dict):
+            conditions.update(clause["metadata"])
+    return conditions
+
+
+class _UserMatrix:
+    """Embedding matrix for one user, grown by doubling so appends are amortized O(1)."""
+
+    def __init__(self, dim: int, ids: List[str], vectors: np.ndarray):
+        capacity = max(16, len(ids))
+        self.ids = ids
+        self.size = len(ids)
+        self.data = np.zeros((capacity, dim), dtype=np.float32)
+        if self.size:
+            self.data[:self.size] = vectors
+
+    def append(self, ids: List[str], vectors: np.ndarray):
+        needed = self.size + len(ids)
+        if needed > self.data.shape[0]:
+            grown = np.zeros((max(needed, self.data.shape[0] * 2), self.data.shape[1]), dtype=np.float32)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        self.data[self.size:needed] = vectors
+        self.ids.extend(ids)
+        self.size = needed
+
+
+class LocalMemoryBackend(MemoryBackend):
+    """Stores raw messages as memories in SQLite and searches them by cosine similarity.
+
+    There is no LLM fact extraction as in mem0; each message is one memory.
+    Each user's embeddings are loaded from SQLite once into an in-memory
+    matrix, after which a search is a single matrix-vector product plus a
+    partial sort for the top k.
+    """
+
+    name = "local"
+
+    def __init__(self, db_path: str, embedding_dim: int = 384, embedder: Optional[HashingEmbedder] = None):
+        self.db_path = db_path
+        self.embedder = embedder or HashingEmbedder(dim=embedding_dim)
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        # Calls arrive on several executor threads; one connection guarded by a lock
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._matrices: Dict[str, _UserMatrix] = {}
+
+    def _load_matrix(self, user_id: str) -> _UserMatrix:
+        matrix = self._matrices.get(user_id)
+        if matrix is not None:
+            return matrix
+        rows = self._conn.execute(
+            "SELECT id, embedding FROM memories WHERE user_id = ? ORDER BY created_at", (user_id,)).fetchall()
+        ids = [row[0] for row in rows]
+        if rows:
+            vectors = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.float32).reshape(len(rows), -1)
+        else:
+            vectors = np.zeros((0, self.embedder.dim), dtype=np.float32)
+        matrix = self._matrices[user_id] = _UserMatrix(self.embedder.dim, ids, vectors)
+        return matrix
+
+    @staticmethod
+    def _row_to_memory(row: Tuple, score: Optional[float] = None) -> dict:
+        memory_id, user_id, memory, metadata, created_at = row
+        item = {
+            "id": memory_id,
+            "memory": memory,
+            "user_id": user_id,
+            "metadata": json.loads(metadata),
+            "created_at": created_at,
+        }
+        if score is not None:
+            item["score"] = score
+        return item
+
+    def add(self, messages: List[dict], user_id: str, metadata: Optional[dict] = None) -> List[dict]:
+        metadata = dict(metadata or {})
+        contents = [m.get("content", "") for m in messages if m.get("content")]
+        if not contents:
+            return []
+        vectors = self.embedder.embed(contents)
+        now = datetime.now(timezone.utc).isoformat()
+        rows, results = [], []
+        for message, vector in zip((m for m in messages if m.get("content")), vectors):
+            memory_id = uuid.uuid4().hex
+            item_metadata = {**metadata, "role": message.get("role")}
+            rows.append((memory_id, user_id, metadata.get("chat_id"), message.get("role"), message["content"],
+                         json.dumps(item_metadata), now, vector.tobytes()))
+            results.append({"id": memory_id, "memory": message["content"], "event": "ADD"})
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO memories (id, user_id, chat_id, role, memory, metadata, created_at, embedding) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            # Only extend matrices already resident; others load lazily on first search
+            matrix = self._matrices.get(user_id)
+            if matrix is not None:
+                matrix.append([r[0] for r in rows], vectors)
+        return results
+
+    def search(self, query: str, user_id: str, limit: int = 5) -> List[dict]:
+        query_vector = self.embedder.embed_one(query)
+        with self._lock:
+            matrix = self._load_matrix(user_id)
+            if matrix.size == 0:
+                return []
+            scores = matrix.data[:matrix.size] @ query_vector
+            k = min(limit, matrix.size)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            ids = [matrix.ids[i] for i in top]
+            top_scores = {matrix.ids[i]: float(scores[i]) for i in top}
+            placeholders = ",".join("?" * len(ids))
+            rows = self._conn.execute(
+                f"SELECT id, user_id, memory, metadata, created_at FROM memories WHERE id IN ({placeholders})",
+                ids).fetchall()
+        by_id = {row[0]: row for row in rows}
+        return [self._row_to_memory(by_id[i], top_scores[i]) for i in ids if i in by_id]
+
+    def get_all(self, user_id: str, filters: Optional[dict] = None) -> List[dict]:
+        conditions = _metadata_conditions(filters)
+        sql = "SELECT id, user_id, memory, metadata, created_at FROM memories WHERE user_id = ?"
+        params: List[Any] = [user_id]
+        if "chat_id" in conditions:
+            # chat_id has its own indexed column
+            sql += " AND chat_id = ?"
+            params.append(conditions.pop("chat_id"))
+        sql += " ORDER BY created_at"
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        memories = [self._row_to_memory(row) for row in rows]
+        if conditions:
+            memories = [m for m in memories if all(m["metadata"].get(k) == v for k, v in conditions.items())]
+        return memories
+
+    def iter_all(self, user_id: str, filters: Optional[dict] = None, page_size: int = 500) -> Iterator[List[dict]]:
+        """Keyset-paged `get_all`: the lock is held per page, never across a yield."""
+        conditions = _metadata_conditions(filters)
+        chat_id = conditions.pop("chat_id", None)
+        sql = "SELECT id, user_id, memory, metadata, created_at FROM memories WHERE user_id = ?"
+        if chat_id is not None:
+            sql += " AND chat_id = ?"
+        sql += " AND (created_at, id) > (?, ?) ORDER BY created_at, id LIMIT ?"
+        last = ("", "")
+        while True:
+            params: List[Any] = [user_id] + ([chat_id] if chat_id is not None else []) + [*last, page_size]
+            with self._lock:
+                rows = self._conn.execute(sql, params).fetchall()
+            if not rows:
+                return
+            last = (rows[-1][4], rows[-1][0])
+            memories = [self._row_to_memory(row) for row in rows]
+            if conditions:
+                memories = [m for m in memories if all(m["metadata"].get(k) == v for k, v in conditions.items())]
+            if memories:
+                yield memories
+            if len(rows) < page_size:
+                return
+
+    def users(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT user_id, COUNT(*), MIN(created_at), MAX(created_at) FROM memories GROUP BY user_id").fetchall()
+        results = [
+            {"name": user_id, "type": "user", "total_memories": count, "created_at": first, "updated_at": last}
+            for user_id, count, first, last in rows
+        ]
+        return {"count": len(results), "next": None, "previous": None, "results": results}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+        logger.info("Local memory backend closed.")
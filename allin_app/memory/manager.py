@@ -1,33 +1,53 @@
-# Manages long-term memory using mem0ai
+# Manages long-term memory using mem0ai (or the local backend)
 
-from mem0 import MemoryClient # Use MemoryClient for cloud service
-from ..core.logging_config import logger # Use relative import for logger
+import asyncio
+import time
+from ..core.logging_config import logger, truncate_payload # Use relative import for logger
 from ..core.config import settings # Import settings for API keys
+from ..core.executor import BoundedExecutor, ExecutorSaturatedError
+from ..core.metrics import EXECUTOR_IN_FLIGHT, EXECUTOR_QUEUE_DEPTH, WRITE_BEHIND_PENDING, observe_stage
+from .ingestion import MemoryIngestionPipeline
+from .cache import MemoryRetrievalCache
+from .backends import create_memory_backend
 
 class MemoryManager:
-    def __init__(self):
-        """Initializes the Memory Manager."""
-        logger.info("Initializing MemoryManager with MemoryClient...")
-        self.memory_client = None # Rename attribute for clarity
+    def __init__(self, backend=None):
+        """Initializes the Memory Manager. `backend` overrides the MEMORY_BACKEND selection (e.g. a fake in tests)."""
+        logger.info(f"Initializing MemoryManager with '{settings.memory_backend}' backend...")
+        # A MemoryBackend (see backends.py); kept under this name since the REST endpoints check it
+        self.memory_client = None
+        # Backends are synchronous (blocking HTTP / SQLite). Every call goes through this
+        # bounded pool so a slow mem0 round trip never stalls the event loop.
+        self.executor = BoundedExecutor(
+            name="memory",
+            max_workers=settings.memory_executor_workers,
+            max_queue=settings.memory_executor_max_queue,
+        )
+        # Search results per (user, normalized query); invalidated on writes
+        self.search_cache = MemoryRetrievalCache(
+            max_entries=settings.memory_cache_max_entries,
+            ttl=settings.memory_cache_ttl,
+        )
+        # Finished turns are written behind the chat loop, batched per chat
+        self.ingestion = MemoryIngestionPipeline(
+            memory_manager=self,
+            spool_path=settings.memory_ingest_spool_path,
+            batch_size=settings.memory_ingest_batch_size,
+            flush_interval=settings.memory_ingest_flush_interval,
+            max_pending=settings.memory_ingest_max_pending,
+            max_retries=settings.memory_ingest_max_retries,
+            compact_bytes=settings.memory_ingest_spool_compact_bytes,
+        )
+        EXECUTOR_QUEUE_DEPTH.labels("memory").set_function(lambda: self.executor.queue_depth)
+        EXECUTOR_IN_FLIGHT.labels("memory").set_function(lambda: self.executor.in_flight)
+        WRITE_BEHIND_PENDING.labels("memory_ingestion").set_function(lambda: self.ingestion.get_stats()["queue_depth"])
         try:
-            # Initialize the MemoryClient
-            # Pass MEM0_API_KEY if available, otherwise rely on OPENAI_API_KEY env var or defaults.
-            init_args = {}
-            # Access the correct snake_case attribute name from the Settings object
-            if settings.mem0_api_key:
-                init_args['api_key'] = settings.mem0_api_key
-                logger.info("Using MEM0_API_KEY from environment for MemoryClient.")
-            else:
-                # According to docs/errors, API key is required for MemoryClient, either via arg or env var.
-                # Throw an error if not provided, rather than letting it fail later.
-                raise ValueError("MEM0_API_KEY is required but not found in environment settings for MemoryClient.")
-
-            self.memory_client = MemoryClient(**init_args) # Instantiate MemoryClient
-            logger.info("MemoryClient initialized successfully.")
-            # Note: Underlying operations within Mem0 might still require OPENAI_API_KEY env var
+            self.memory_client = backend if backend is not None else create_memory_backend()
+            logger.info(f"Memory backend '{self.memory_client.name}' initialized successfully.")
+            # Note: with the mem0 backend, underlying operations might still require OPENAI_API_KEY env var
             # if using default OpenAI models for embedding/summarization.
         except Exception as e:
-            logger.error(f"Failed to initialize MemoryClient: {e}", exc_info=True)
+            logger.error(f"Failed to initialize memory backend: {e}", exc_info=True)
             # Keep self.memory_client as None if init fails
 
     async def add_memory(self, user_id: str, role: str, content: str, chat_id: str = None):
@@ -50,37 +70,162 @@ class MemoryManager:
                 "content": content
             }]
             # TODO: Determine if user_id should map to mem0's user_id or agent_id
-            logger.debug(f"Adding memory for user {user_id}: {content[:50]}...")
-            # Prepare metadata, including chat_id if provided
-            metadata = {}
-            if chat_id:
-                metadata['chat_id'] = chat_id
-                logger.debug(f"Including metadata for chat_id: {chat_id}")
-            # Pass the formatted message list
-            response = self.memory_client.add(message_to_add, user_id=user_id, metadata=metadata)
-            logger.info(f"Memory added for user {user_id}. Response: {response}")
+            logger.opt(lazy=True).debug("Adding memory for user {}: {}", lambda: user_id, lambda: truncate_payload(content))
+            await self.add_messages(user_id=user_id, messages=message_to_add, chat_id=chat_id)
+        except asyncio.TimeoutError:
+            logger.error(f"Timed out adding memory for user {user_id} after {settings.memory_add_timeout}s.")
+        except ExecutorSaturatedError as e:
+            logger.error(f"Dropped memory write for user {user_id}: {e}")
         except Exception as e:
             logger.error(f"Failed to add memory for user {user_id}: {e}", exc_info=True)
 
+    async def add_messages(self, user_id: str, messages: list[dict], chat_id: str = None):
+        """Adds a list of {'role', 'content'} messages to memory in a single mem0 `add` call.
+
+        Errors propagate to the caller (the ingestion pipeline retries on failure).
+        """
+        if not self.memory_client:
+            raise RuntimeError("Mem0 client not available. Cannot add memory.")
+        # Prepare metadata, including chat_id if provided
+        metadata = {}
+        if chat_id:
+            metadata['chat_id'] = chat_id
+        started = time.perf_counter()
+        response = await self.executor.run(
+            self.memory_client.add, messages, user_id=user_id, metadata=metadata,
+            timeout=settings.memory_add_timeout, op_name="add",
+        )
+        observe_stage("memory_write", time.perf_counter() - started)
+        logger.info(f"Memory added for user {user_id} ({len(messages)} message(s)).")
+        logger.opt(lazy=True).debug("Memory add response for user {}: {}", lambda: user_id, lambda: truncate_payload(response))
+        self.search_cache.invalidate_user(user_id)
+        return response
+
+    def submit_turn(self, user_id: str, user_message: str, assistant_message: str, chat_id: str = None) -> bool:
+        """Queues a finished user/assistant turn for write-behind ingestion. Never blocks."""
+        if not self.memory_client:
+            logger.error("Mem0 client not available. Cannot add memory.")
+            return False
+        messages = [
+            {"role": "user", "content": user_message},
+            {"role": "assistant", "content": assistant_message},
+        ]
+        return self.ingestion.submit_turn(user_id=user_id, chat_id=chat_id, messages=messages)
+
     async def get_relevant_memory(self, user_id: str, query: str, limit: int = 5) -> list[str]:
         """Retrieves relevant memories for a user based on a query."""
+        memories = await self.search_memories(user_id=user_id, query=query, limit=limit)
+        # Extract just the text content from the memory objects
+        # Corrected: Use the 'memory' key as identified in logs
+        return [memory.get('memory', '') for memory in memories if 'memory' in memory]
+
+    async def search_memories(self, user_id: str, query: str, limit: int = 5) -> list[dict]:
+        """Like get_relevant_memory, but returns the memory objects (id, memory, score, created_at, ...)."""
         if not self.memory_client:
             logger.error("Mem0 client not available. Cannot retrieve memory.")
             return []
         
         try:
-            logger.debug(f"Searching memory for user {user_id} with query: {query[:50]}...")
-            # Use the renamed client attribute
-            memories = self.memory_client.search(query=query, user_id=user_id, limit=limit)
+            logger.opt(lazy=True).debug("Searching memory for user {} with query: {}",
+                                        lambda: user_id, lambda: truncate_payload(query))
+            memories = await self.search_cache.get_or_load(
+                MemoryRetrievalCache.make_key(user_id, query, limit),
+                lambda: self._search(user_id=user_id, query=query, limit=limit),
+            )
+            if isinstance(memories, dict): # newer mem0 responses wrap results
+                memories = memories.get("results", [])
             logger.info(f"Found {len(memories)} relevant memories for user {user_id}.")
-            # Extract just the text content from the memory objects
-            # Corrected: Use the 'memory' key as identified in logs
-            return [memory.get('memory', '') for memory in memories if 'memory' in memory]
+            return [memory for memory in memories if isinstance(memory, dict) and memory.get('memory')]
+        except asyncio.TimeoutError:
+            logger.warning(f"Memory search for user {user_id} timed out after {settings.memory_search_timeout}s; continuing without memory.")
+            return []
+        except ExecutorSaturatedError as e:
+            logger.warning(f"Skipped memory search for user {user_id}: {e}")
+            return []
         except Exception as e:
             logger.error(f"Failed to search memory for user {user_id}: {e}", exc_info=True)
             return [] # Return empty list on error
 
-    # TODO: Add other methods as needed (e.g., get_all_memory, delete_memory)
+    async def _search(self, user_id: str, query: str, limit: int) -> list[dict]:
+        """Runs the remote search on the memory executor (cache misses only)."""
+        started = time.perf_counter()
+        memories = await self.executor.run(
+            self.memory_client.search, query=query, user_id=user_id, limit=limit,
+            timeout=settings.memory_search_timeout, op_name="search",
+        )
+        observe_stage("memory_search", time.perf_counter() - started)
+        return memories
+
+    async def check_health(self):
+        """Readiness probe: a minimal search through the executor. Raises if the backend is unavailable."""
+        if not self.memory_client:
+            raise RuntimeError("Memory backend not initialized.")
+        await self.executor.run(
+            self.memory_client.search, query="health check", user_id="__health_check__", limit=1,
+            timeout=settings.memory_search_timeout, op_name="health",
+        )
+
+    async def get_all(self, user_id: str, filters: dict = None):
+        """Returns all memories for a user (optionally filtered), offloaded to the memory executor.
+
+        Unlike add/search, errors propagate (including asyncio.TimeoutError and
+        ExecutorSaturatedError) so REST endpoints can map them to HTTP status codes.
+        """
+        kwargs = {"user_id": user_id}
+        if filters:
+            kwargs["filters"] = filters
+        return await self.executor.run(
+            self.memory_client.get_all, **kwargs,
+            timeout=settings.memory_list_timeout, op_name="get_all",
+        )
+
+    async def iter_all(self, user_id: str, filters: dict = None, page_size: int = None):
+        """Async generator over a user's memories, one page (list) at a time.
+
+        Each page is read on the memory executor with the list timeout, so a
+        caller streaming a long history holds one page in memory at a time.
+        """
+        pages = self.memory_client.iter_all(
+            user_id=user_id, filters=filters, page_size=page_size or settings.memory_list_page_size)
+        while True:
+            page = await self.executor.run(
+                next, pages, None,
+                timeout=settings.memory_list_timeout, op_name="get_all_page",
+            )
+            if page is None:
+                return
+            yield page
+
+    async def list_users(self):
+        """Returns the raw `users()` response from the memory client, offloaded to the memory executor."""
+        return await self.executor.run(
+            self.memory_client.users,
+            timeout=settings.memory_list_timeout, op_name="users",
+        )
+
+    def get_stats(self) -> dict:
+        """Returns executor queue depth, per-operation latency and ingestion stats."""
+        return {
+            "executor": self.executor.get_stats(),
+            "search_cache": self.search_cache.get_stats(),
+            "ingestion": self.ingestion.get_stats(),
+        }
+
+    def start(self):
+        """Starts write-behind ingestion (replaying turns spooled before a crash or restart). Needs a running loop."""
+        self.ingestion.start()
+
+    async def drain(self, timeout: float = 10.0):
+        """Flushes pending write-behind turns, bounded by `timeout` seconds."""
+        await self.ingestion.stop(timeout=timeout)
+
+    def shutdown(self):
+        """Releases the memory executor threads and closes the backend."""
+        self.executor.shutdown(wait=False)
+        if self.memory_client:
+            self.memory_client.close()
+
+    # TODO: Add other methods as needed (e.g., delete_memory)
 
 # Example usage (for testing purposes)
 # async def main():
@@ -0,0 +1,179 @@
+# Approximate nearest-neighbour search for the knowledge index (IVF with spherical k-means)
+import json
+import os
+import threading
+from array import array
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from ..core.logging_config import logger
+
+
+def spherical_kmeans(data: np.ndarray, k: int, iterations: int = 10, sample_size: int = 65536, seed: int = 0) -> np.ndarray:
+    """Trains k unit-norm centroids on (a sample of) unit-norm vectors."""
+    rng = np.random.default_rng(seed)
+    if len(data) > sample_size:
+        data = data[np.sort(rng.choice(len(data), sample_size, replace=False))]
+    data = np.ascontiguousarray(data, dtype=np.float32)
+    k = min(k, len(data))
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(data @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, data)
+        counts = np.bincount(assign, minlength=k)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty clusters with random points
+            sums[empty] = data[rng.choice(len(data), int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = sums / norms
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """Inverted-file index over rows of an external vector matrix.
+
+    The index stores only the coarse centroids and each row's list assignment;
+    candidate vectors are read from the shared memory-mapped store at query
+    time, so no vector is duplicated. A query scores the `nprobe` nearest
+    lists exactly.
+
+    - `add` assigns new rows to their nearest centroid (incremental insertion).
+    - `needs_retrain` turns true once the corpus has grown well past the
+      training set, since the centroids then stop reflecting the data.
+    - State is persisted under `index_dir` (ivf_centroids.npy, ivf_assign.npy,
+      ivf.json) and loaded on first use.
+    """
+
+    CENTROIDS_FILE = "ivf_centroids.npy"
+    ASSIGN_FILE = "ivf_assign.npy"
+    META_FILE = "ivf.json"
+
+    def __init__(self, index_dir: Optional[str], dim: int, nlist: int = 1024, nprobe: int = 16, retrain_growth: float = 4.0):
+        self.index_dir = index_dir
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.retrain_growth = retrain_growth
+        self.centroids: Optional[np.ndarray] = None
+        self.assign = np.zeros(0, dtype=np.int32) # row -> list id
+        self.trained_rows = 0
+        self._lists: List[array] = []
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    # --- Persistence ---
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_dir, name)
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if self.index_dir and os.path.exists(self._path(self.META_FILE)):
+                with open(self._path(self.META_FILE), "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                self.trained_rows = meta["trained_rows"]
+                self.nlist = meta["nlist"]
+                self.centroids = np.load(self._path(self.CENTROIDS_FILE))
+                self.assign = np.load(self._path(self.ASSIGN_FILE))
+                self._rebuild_lists()
+                logger.info(f"Loaded IVF index ({len(self.centroids)} lists, {len(self.assign)} rows) from {self.index_dir}.")
+            self._loaded = True
+
+    def save(self):
+        if not self.index_dir or self.centroids is None:
+            return
+        with self._lock:
+            os.makedirs(self.index_dir, exist_ok=True)
+            np.save(self._path(self.CENTROIDS_FILE), self.centroids)
+            np.save(self._path(self.ASSIGN_FILE), self.assign)
+            tmp = self._path(self.META_FILE + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"trained_rows": self.trained_rows, "nlist": self.nlist, "dim": self.dim}, f)
+            os.replace(tmp, self._path(self.META_FILE)) # meta last: it marks the files as complete
+
+    def _rebuild_lists(self):
+        order = np.argsort(self.assign, kind="stable")
+        bounds = np.searchsorted(self.assign[order], np.arange(len(self.centroids) + 1))
+        self._lists = []
+        for i in range(len(self.centroids)):
+            rows = array("q")
+            rows.frombytes(order[bounds[i]:bounds[i + 1]].astype(np.int64).tobytes())
+            self._lists.append(rows)
+
+    # --- Build / insert ---
+
+    @property
+    def is_trained(self) -> bool:
+        self._ensure_loaded()
+        return self.centroids is not None
+
+    @property
+    def size(self) -> int:
+        self._ensure_loaded()
+        return len(self.assign)
+
+    @property
+    def needs_retrain(self) -> bool:
+        return self.is_trained and self.size > self.trained_rows * self.retrain_growth
+
+    def train(self, vectors: np.ndarray):
+        """(Re)builds the index over all rows of `vectors`."""
+        with self._lock:
+            self._loaded = True
+            nlist = max(1, min(self.nlist, len(vectors) // 39 or 1)) # ~39+ points per centroid
+            self.centroids = spherical_kmeans(vectors, nlist)
+            self.assign = self._assign(vectors)
+            self.trained_rows = len(vectors)
+            self._rebuild_lists()
+
+    def _assign(self, vectors: np.ndarray, block: int = 65536) -> np.ndarray:
+        out = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), block):
+            out[start:start + block] = np.argmax(np.asarray(vectors[start:start + block]) @ self.centroids.T, axis=1)
+        return out
+
+    def add(self, vectors: np.ndarray, first_row: int):
+        """Assigns rows [first_row, first_row + len(vectors)) to their nearest lists."""
+        self._ensure_loaded()
+        with self._lock:
+            if first_row > len(self.assign):
+                raise ValueError(f"IVF index covers {len(self.assign)} rows; cannot add starting at row {first_row}.")
+            # Another thread may have caught up already: skip rows that are covered
+            vectors = vectors[len(self.assign) - first_row:]
+            first_row = len(self.assign)
+            if not len(vectors):
+                return
+            assign = self._assign(vectors)
+            self.assign = np.concatenate([self.assign, assign])
+            for offset, list_id in enumerate(assign):
+                self._lists[list_id].append(first_row + offset)
+
+    # --- Query ---
+
+    def search(self, vectors: np.ndarray, query: np.ndarray, k: int, mask: Optional[np.ndarray] = None,
+               nprobe: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Returns up to k (row, score) pairs from the `nprobe` closest lists."""
+        self._ensure_loaded()
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        centroid_scores = self.centroids @ query
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        with self._lock:
+            candidates = np.concatenate([np.frombuffer(self._lists[i], dtype=np.int64) for i in probe if len(self._lists[i])] or [np.empty(0, dtype=np.int64)])
+        if mask is not None and len(candidates):
+            candidates = candidates[mask[candidates]]
+        if not len(candidates):
+            return []
+        candidates.sort() # sequential-ish reads from the memory map
+        scores = np.asarray(vectors[candidates]) @ query
+        take = min(k, len(scores))
+        top = np.argpartition(-scores, take - 1)[:take]
+        top = top[np.argsort(-scores[top])]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
@@ -0,0 +1,181 @@
+# Semantic answer cache for RAG: near-identical questions reuse an answer until its sources change
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+
+class _Entry:
+    __slots__ = ("query", "scope", "answer", "rows", "doc_ids", "created_at")
+
+    def __init__(self, query: str, scope: Tuple[str, ...], answer: str, rows: Tuple[int, ...], doc_ids: Set[str]):
+        self.query = query
+        self.scope = scope
+        self.answer = answer
+        self.rows = rows # chunk rows the answer was generated from (rows are immutable; edits add new rows)
+        self.doc_ids = doc_ids
+        self.created_at = time.monotonic()
+
+
+class SemanticAnswerCache:
+    """Answers keyed by query embedding, scoped by the `file_ids` filter and tied to their source chunks.
+
+    - Lookup: cosine similarity of the query against every cached query (one
+      matrix-vector product over a preallocated (max_entries, dim) matrix);
+      the best match at or above `threshold` in the same scope is a hit.
+    - Eviction: least recently used beyond `max_entries`; entries older than
+      `ttl_seconds` are dropped (bounds how long a newly added document can be
+      missed by an answer that predates it).
+    - Invalidation: `invalidate_documents` drops every entry that used a chunk
+      of a changed or deleted document (called by knowledge sync). A hit is
+      also checked against the index with `is_valid(rows)`, which catches
+      chunks tombstoned by another process.
+    Thread-safe.
+    """
+
+    def __init__(self, dim: int, max_entries: int = 1024, threshold: float = 0.92, ttl_seconds: float = 3600.0):
+        self.dim = dim
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self._matrix = np.zeros((max_entries, dim), dtype=np.float32)
+        self._active = np.zeros(max_entries, dtype=bool)
+        self._entries: Dict[int, _Entry] = {}
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+        self._free: List[int] = list(range(max_entries - 1, -1, -1))
+        self._by_doc: Dict[str, Set[int]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+        # --- Stats ---
+        self.lookups = 0
+        self.hits = 0
+        self.stale = 0 # matched, but a source chunk had changed
+        self.expired = 0
+        self.evicted = 0
+        self.invalidated = 0
+        self._hit_ms: Deque[float] = deque(maxlen=1024)
+        self._hit_age_s: Deque[float] = deque(maxlen=1024)
+
+    @staticmethod
+    def scope_key(file_ids: Optional[Iterable[str]]) -> Tuple[str, ...]:
+        return tuple(sorted(set(file_ids))) if file_ids else ()
+
+    def _remove(self, slot: int):
+        entry = self._entries.pop(slot)
+        self._active[slot] = False
+        self._lru.pop(slot, None)
+        for doc_id in entry.doc_ids:
+            slots = self._by_doc.get(doc_id)
+            if slots is not None:
+                slots.discard(slot)
+                if not slots:
+                    del self._by_doc[doc_id]
+        self._free.append(slot)
+
+    def _best_match(self, query_vector: np.ndarray, scope: Tuple[str, ...]) -> Optional[Tuple[int, _Entry]]:
+        """Most similar unexpired entry in `scope` at or above the threshold. Call with the lock held."""
+        if not self._entries:
+            return None
+        similarities = self._matrix @ query_vector
+        similarities[~self._active] = -1.0
+        candidates = np.flatnonzero(similarities >= self.threshold)
+        now = time.monotonic()
+        for slot in candidates[np.argsort(-similarities[candidates])]:
+            slot = int(slot)
+            entry = self._entries[slot]
+            if entry.scope != scope:
+                continue
+            if now - entry.created_at > self.ttl_seconds:
+                self.expired += 1
+                self._remove(slot)
+                continue
+            return slot, entry
+        return None
+
+    def lookup(self, query_vector: np.ndarray, file_ids: Optional[Iterable[str]] = None,
+               is_valid=None) -> Optional[str]:
+        """Returns a cached answer for a semantically equivalent query, or None.
+
+        `is_valid(rows)` (optional) confirms the entry's source chunks are still
+        live. It may block (it reads the index), so it runs outside the lock; a
+        stale match is removed and the next best one is tried.
+        """
+        started = time.perf_counter()
+        scope = self.scope_key(file_ids)
+        with self._lock:
+            self.lookups += 1
+        while True:
+            with self._lock:
+                match = self._best_match(query_vector, scope)
+            if match is None:
+                return None
+            slot, entry = match
+            valid = is_valid is None or is_valid(entry.rows)
+            with self._lock:
+                current = self._entries.get(slot) is entry # not evicted or invalidated meanwhile
+                if not valid:
+                    self.stale += 1
+                    if current:
+                        self._remove(slot)
+                    continue
+                if current:
+                    self._lru.move_to_end(slot)
+                self.hits += 1
+                self._hit_ms.append((time.perf_counter() - started) * 1000)
+                self._hit_age_s.append(time.monotonic() - entry.created_at)
+                return entry.answer
+
+    def put(self, query: str, query_vector: np.ndarray, answer: str, chunks: List[Dict],
+            file_ids: Optional[Iterable[str]] = None):
+        """Caches an answer generated from `chunks` (each with `row` and `doc_id`)."""
+        entry = _Entry(query, self.scope_key(file_ids), answer,
+                       tuple(int(chunk["row"]) for chunk in chunks), {chunk["doc_id"] for chunk in chunks})
+        with self._lock:
+            if not self._free:
+                self._remove(next(iter(self._lru))) # least recently used
+                self.evicted += 1
+            slot = self._free.pop()
+            self._matrix[slot] = query_vector
+            self._active[slot] = True
+            self._entries[slot] = entry
+            self._lru[slot] = None
+            for doc_id in entry.doc_ids:
+                self._by_doc[doc_id].add(slot)
+
+    def invalidate_documents(self, doc_ids: Iterable[str]) -> int:
+        """Drops every answer that used a chunk of these documents. Returns how many were dropped."""
+        with self._lock:
+            slots = set()
+            for doc_id in doc_ids:
+                slots |= self._by_doc.get(doc_id, set())
+            for slot in slots:
+                self._remove(slot)
+            self.invalidated += len(slots)
+            return len(slots)
+
+    def clear(self):
+        with self._lock:
+            for slot in list(self._entries):
+                self._remove(slot)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            hit_ms = sorted(self._hit_ms)
+            ages = sorted(self._hit_age_s)
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+                "stale_rejected": self.stale,
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "invalidated": self.invalidated,
+                "hit_latency_ms_p50": round(hit_ms[len(hit_ms) // 2], 3) if hit_ms else None,
+                "hit_age_seconds_p50": round(ages[len(ages) // 2], 1) if ages else None,
+                "hit_age_seconds_max": round(ages[-1], 1) if ages else None,
+            }
@@ -0,0 +1,84 @@
+# Streaming document parsing and overlapping chunking for the knowledge base
+import os
+from typing import Iterable, Iterator, Tuple
+
+TEXT_EXTENSIONS = {".txt", ".md", ".markdown", ".rst"}
+PDF_EXTENSIONS = {".pdf"}
+SUPPORTED_EXTENSIONS = TEXT_EXTENSIONS | PDF_EXTENSIONS
+
+
+def iter_text_blocks(path: str, block_size: int = 64 * 1024) -> Iterator[str]:
+    """Yields the text of a document in blocks without loading the whole file.
+
+    Text/markdown files are read `block_size` characters at a time; PDFs are
+    read page by page (requires the optional `pypdf` package).
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in PDF_EXTENSIONS:
+        try:
+            from pypdf import PdfReader # Optional dependency, only needed for PDFs
+        except ImportError as e:
+            raise RuntimeError("Parsing PDFs requires the 'pypdf' package (pip install pypdf).") from e
+        reader = PdfReader(path)
+        for page in reader.pages:
+            text = page.extract_text() or ""
+            if text:
+                yield text + "\n"
+        return
+    if ext not in TEXT_EXTENSIONS:
+        raise ValueError(f"Unsupported document type '{ext}' for {path}.")
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                return
+            yield block
+
+
+def chunk_blocks(blocks: Iterable[str], chunk_size: int = 1000, overlap: int = 200) -> Iterator[Tuple[int, str]]:
+    """Splits a stream of text blocks into overlapping chunks of about `chunk_size` characters.
+
+    Chunks prefer to end on a paragraph, line or sentence boundary found in the
+    last quarter of the window. Only the current window is held in memory.
+    Yields (start_offset, chunk_text).
+    """
+    if overlap >= chunk_size:
+        raise ValueError("overlap must be smaller than chunk_size")
+    buffer = ""
+    base = 0 # document offset of buffer[0]
+    pos = 0 # start of the next chunk within buffer
+    for block in blocks:
+        # Drop consumed text once per block (not once per chunk) to avoid re-copying the buffer
+        buffer = buffer[pos:] + block
+        base += pos
+        pos = 0
+        while len(buffer) - pos >= chunk_size + overlap:
+            end = pos + _boundary(buffer, pos, chunk_size)
+            chunk = buffer[pos:end].strip()
+            if chunk:
+                yield base + pos, chunk
+            pos = max(pos + 1, end - overlap)
+    while buffer[pos:].strip():
+        remaining = len(buffer) - pos
+        end = pos + (_boundary(buffer, pos, chunk_size) if remaining > chunk_size else remaining)
+        chunk = buffer[pos:end].strip()
+        if chunk:
+            yield base + pos, chunk
+        if end >= len(buffer):
+            break
+        pos = max(pos + 1, end - overlap)
+
+
+def _boundary(text: str, start: int, chunk_size: int) -> int:
+    """Returns a chunk length <= chunk_size from `start`, preferring natural boundaries."""
+    floor = start + chunk_size * 3 // 4
+    for separator in ("\n\n", "\n", ". "):
+        cut = text.rfind(separator, floor, start + chunk_size)
+        if cut != -1:
+            return cut + len(separator) - start
+    return chunk_size
+
+
+def chunk_file(path: str, chunk_size: int = 1000, overlap: int = 200) -> Iterator[Tuple[int, str]]:
+    """Streams (start_offset, chunk_text) pairs for a document on disk."""
+    return chunk_blocks(iter_text_blocks(path), chunk_size=chunk_size, overlap=overlap)
@@ -0,0 +1,141 @@
+# Lexical (BM25) retrieval over knowledge chunks with an array-backed inverted index
+import math
+import re
+import threading
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Identifiers keep their inner separators (DATABASE_URL, os.path.join, E-1234)
+_TOKEN_RE = re.compile(r"[A-Za-z0-9_]+(?:[.\-][A-Za-z0-9_]+)*")
+_SPLIT_RE = re.compile(r"[._\-]")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased tokens; compound identifiers also contribute their parts."""
+    tokens = []
+    for match in _TOKEN_RE.findall(text):
+        token = match.lower()
+        tokens.append(token)
+        if _SPLIT_RE.search(token):
+            tokens.extend(part for part in _SPLIT_RE.split(token) if part)
+    return tokens
+
+
+class BM25Index:
+    """Incremental BM25 index keyed by vector-store row.
+
+    Term dictionary: term -> term id. Postings per term are two parallel
+    compact arrays (rows as uint32, term frequencies as uint16) that only ever
+    grow by appending, since rows arrive in increasing order. Document lengths
+    are a uint32 array indexed by row.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._terms: Dict[str, int] = {}
+        self._post_rows: List[array] = []
+        self._post_tfs: List[array] = []
+        self._doc_len = array("I")
+        self._total_len = 0
+        self._lock = threading.RLock()
+
+    @property
+    def size(self) -> int:
+        """Number of rows covered (rows are 0..size-1)."""
+        return len(self._doc_len)
+
+    def add(self, row: int, text: str):
+        """Indexes one chunk. Rows must be added in increasing order without gaps."""
+        with self._lock:
+            if row != len(self._doc_len):
+                raise ValueError(f"BM25 index covers {len(self._doc_len)} rows; cannot add row {row}.")
+            counts = Counter(tokenize(text))
+            length = sum(counts.values())
+            for term, tf in counts.items():
+                term_id = self._terms.get(term)
+                if term_id is None:
+                    term_id = self._terms[term] = len(self._post_rows)
+                    self._post_rows.append(array("I"))
+                    self._post_tfs.append(array("H"))
+                self._post_rows[term_id].append(row)
+                self._post_tfs[term_id].append(min(tf, 65535))
+            self._doc_len.append(length)
+            self._total_len += length
+
+    def add_many(self, rows_and_texts: Iterable[Tuple[int, str]]):
+        for row, text in rows_and_texts:
+            self.add(row, text)
+
+    def extend_from(self, rows_and_texts: Iterable[Tuple[int, str]]):
+        """Like `add_many`, but skips rows already covered, under one lock.
+
+        Concurrent callers may read the same rows from the store; the first one
+        indexes them and the others pass over them.
+        """
+        with self._lock:
+            for row, text in rows_and_texts:
+                if row >= len(self._doc_len):
+                    self.add(row, text)
+
+    def search(self, query: str, k: int = 10, mask: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Returns up to k (row, bm25_score) pairs, skipping rows where `mask` is False."""
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._doc_len)
+            if not n_docs or not terms:
+                return []
+            avg_len = self._total_len / n_docs
+            # Zero-copy views of the arrays; they must be released before the lock is,
+            # because array.append() refuses to resize while a buffer is exported.
+            doc_len = np.frombuffer(self._doc_len, dtype=np.uint32)
+            all_rows, all_weights = [], []
+            for term in terms:
+                term_id = self._terms.get(term)
+                if term_id is None:
+                    continue
+                rows = np.array(self._post_rows[term_id], dtype=np.int64)
+                tfs = np.array(self._post_tfs[term_id], dtype=np.float32)
+                df = len(rows)
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * doc_len[rows].astype(np.float32) / avg_len)
+                all_rows.append(rows)
+                all_weights.append(idf * tfs * (self.k1 + 1) / (tfs + norm))
+            del doc_len
+        if not all_rows:
+            return []
+        rows = np.concatenate(all_rows)
+        weights = np.concatenate(all_weights)
+        unique_rows, inverse = np.unique(rows, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights).astype(np.float32)
+        if mask is not None:
+            keep = mask[unique_rows]
+            unique_rows, scores = unique_rows[keep], scores[keep]
+        if not len(scores):
+            return []
+        take = min(k, len(scores))
+        top = np.argpartition(-scores, take - 1)[:take]
+        top = top[np.argsort(-scores[top])]
+        return [(int(unique_rows[i]), float(scores[i])) for i in top]
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            postings = sum(len(p) for p in self._post_rows)
+            return {
+                "rows": len(self._doc_len),
+                "terms": len(self._terms),
+                "postings": postings,
+                "approx_bytes": postings * 6 + len(self._doc_len) * 4,
+            }
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[Tuple[int, float]]], k: int = 60) -> List[Tuple[int, float]]:
+    """Merges ranked (row, score) lists by sum of 1 / (k + rank)."""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, (row, _) in enumerate(ranking, start=1):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
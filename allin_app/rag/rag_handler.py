@@ -1,43 +1,279 @@
-# Placeholder for RAG Handler Logic (Phase 3)
+# RAG Handler: local knowledge base ingestion and retrieval-augmented answers
+import asyncio
+import hashlib
+import os
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
 from allin_app.core.config import settings
-from allin_app.core.logging_config import logger
-# Import google.generativeai when implementing
-# import google.generativeai as genai
+from allin_app.core.embeddings import HashingEmbedder
+from allin_app.core.logging_config import logger, truncate_payload
+from allin_app.rag.ann import IVFIndex
+from allin_app.rag.answer_cache import SemanticAnswerCache
+from allin_app.rag.chunker import chunk_file
+from allin_app.rag.lexical import BM25Index, reciprocal_rank_fusion
+from allin_app.rag.vector_store import MmapVectorStore
+
+
+def content_hash(text: str) -> str:
+    """Stable fingerprint of a chunk's text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def upload_doc_id(file_path: str) -> str:
+    """Document ID for an uploaded file: its name, qualified by a hash of its absolute path.
+
+    Re-uploading the same file replaces its chunks; different files that share a name stay separate.
+    """
+    path_hash = hashlib.sha256(os.path.abspath(file_path).encode("utf-8")).hexdigest()[:12]
+    return f"upload/{path_hash}/{os.path.basename(file_path)}"
+
 
 class RAGHandler:
-    def __init__(self):
+    def __init__(self, genai_client=None, index_dir: Optional[str] = None):
+        """Initializes the embedder and opens (or creates) the shared on-disk index.
+
+        `genai_client` is an optional google.genai Client used to write the final
+        answer; without it `generate_response` returns the retrieved excerpts.
+        """
         logger.info("Initializing RAGHandler...")
-        # TODO: Initialize Google AI client for RAG model (gemini-2.0-flash)
-        # genai.configure(api_key=settings.google_api_key)
-        # self.model = genai.GenerativeModel('gemini-2.0-flash')
-        # self.file_client = genai.FileClient() # If using separate client
-        pass
+        self.client = genai_client
+        self.model_name = settings.rag_model_name
+        self.embedder = HashingEmbedder(dim=settings.local_embedding_dim)
+        self.store = MmapVectorStore(index_dir or settings.rag_index_dir, dim=self.embedder.dim)
+        self.ann = None
+        if settings.rag_index_type.lower() == "ivf":
+            # Loaded lazily on first use; falls back to exact search until trained
+            self.ann = IVFIndex(self.store.index_dir, dim=self.embedder.dim,
+                                nlist=settings.rag_ivf_nlist, nprobe=settings.rag_ivf_nprobe)
+        # Built from the chunk table on first use, then extended as chunks are appended
+        self.lexical = BM25Index()
+        self.retrieval_mode = settings.rag_retrieval_mode.lower()
+        # Repeated (near-identical) questions skip retrieval and generation until their sources change
+        self.answer_cache = None
+        if settings.rag_answer_cache_size > 0:
+            self.answer_cache = SemanticAnswerCache(
+                self.embedder.dim, max_entries=settings.rag_answer_cache_size,
+                threshold=settings.rag_answer_cache_threshold, ttl_seconds=settings.rag_answer_cache_ttl)
+        logger.info(f"Knowledge index opened at {self.store.index_dir} with {self.store.count} chunk(s).")
+
+    # --- Ingestion ---
+
+    def ingest_file_sync(self, file_path: str, doc_id: Optional[str] = None) -> int:
+        """Streams a document into the index: chunk -> diff -> batch embed -> append. Returns chunks added.
+
+        Re-ingesting a document only embeds chunks whose text changed and
+        tombstones the ones that disappeared. Blocking; call through
+        `ingest_file` from async code.
+        """
+        doc_id = doc_id or upload_doc_id(file_path)
+        chunks = chunk_file(file_path, chunk_size=settings.rag_chunk_size, overlap=settings.rag_chunk_overlap)
+        added, reused, tombstoned = self.apply_document(
+            doc_id, ((start_offset, text, content_hash(text)) for start_offset, text in chunks))
+        if added or tombstoned:
+            self.update_ann_index()
+            self.update_lexical_index()
+        logger.info(f"Ingested {file_path} as '{doc_id}': {added} chunk(s) added, {reused} reused, "
+                    f"{tombstoned} tombstoned.")
+        return added
+
+    def apply_document(self, doc_id: str, chunks: Iterable[Tuple[int, str, str]],
+                       batch_size: Optional[int] = None) -> Tuple[int, int, int]:
+        """Diffs a document's (start_offset, text, content_hash) chunks against its live chunks.
+
+        Chunks whose text is already indexed for the document keep their row and
+        vector; new ones are embedded and appended `batch_size` at a time; live
+        chunks that no longer appear are tombstoned. Returns (added, reused, tombstoned).
+        """
+        batch_size = max(1, batch_size or settings.rag_embed_batch_size)
+        live_rows: Dict[str, List[int]] = defaultdict(list)
+        for row, chunk_hash in self.store.live_chunk_hashes(doc_id):
+            live_rows[chunk_hash].append(row)
+
+        pending: List[Dict] = []
+        added = reused = 0
+        for chunk_no, (start_offset, text, chunk_hash) in enumerate(chunks):
+            if live_rows.get(chunk_hash):
+                # Same text already indexed for this document: keep its row and vector
+                live_rows[chunk_hash].pop()
+                reused += 1
+                continue
+            pending.append({"doc_id": doc_id, "chunk_no": chunk_no, "start_offset": start_offset,
+                            "text": text, "content_hash": chunk_hash})
+            if len(pending) >= batch_size:
+                added += self._embed_and_store(pending)
+                pending = []
+        if pending:
+            added += self._embed_and_store(pending)
+        tombstoned = self.store.tombstone_rows(row for rows in live_rows.values() for row in rows)
+        if added or tombstoned:
+            # Answers generated from this document's old chunks are out of date
+            self.invalidate_documents([doc_id])
+        return added, reused, tombstoned
+
+    def _embed_and_store(self, records: List[Dict]) -> int:
+        vectors = self.embedder.embed(r["text"] for r in records)
+        self.store.append(vectors, records)
+        return len(records)
+
+    def invalidate_documents(self, doc_ids: List[str]):
+        """Drops cached answers built from these documents (call when their chunks change)."""
+        if self.answer_cache is not None:
+            dropped = self.answer_cache.invalidate_documents(doc_ids)
+            if dropped:
+                logger.info(f"Invalidated {dropped} cached answer(s) for {len(doc_ids)} changed document(s).")
+
+    def _chunks_live(self, rows) -> bool:
+        self.store.refresh() # picks up tombstones written by other processes
+        return self.store.rows_live(rows)
+
+    def update_ann_index(self):
+        """Trains, extends or retrains the ANN index to cover every row in the store."""
+        if self.ann is None:
+            return
+        self.store.refresh()
+        vectors = self.store.vectors()
+        if not self.ann.is_trained:
+            if len(vectors) < settings.rag_ivf_min_rows:
+                return
+            logger.info(f"Training IVF index over {len(vectors)} chunk(s)...")
+            self.ann.train(vectors)
+        elif self.ann.needs_retrain:
+            logger.info(f"Retraining IVF index: corpus grew from {self.ann.trained_rows} to {len(vectors)} chunk(s).")
+            self.ann.train(vectors)
+        elif self.ann.size < len(vectors):
+            self.ann.add(vectors[self.ann.size:], first_row=self.ann.size)
+        else:
+            return
+        self.ann.save()
+
+    def update_lexical_index(self):
+        """Adds chunks appended since the last call (by any process) to the BM25 index."""
+        self.store.refresh()
+        if self.lexical.size < self.store.count:
+            # Hybrid searches run on several threads; extend_from skips rows another one indexed
+            self.lexical.extend_from(self.store.iter_chunk_texts(self.lexical.size))
+
+    async def ingest_file(self, file_path: str, doc_id: Optional[str] = None) -> int:
+        """Async wrapper: parsing and embedding run on a worker thread."""
+        return await asyncio.to_thread(self.ingest_file_sync, file_path, doc_id)
+
+    # --- Retrieval ---
+
+    def _vector_search(self, query: str, k: int, file_ids: list = None) -> List[Tuple[int, float]]:
+        query_vector = self.embedder.embed_one(query)
+        if self.ann is not None and self.ann.is_trained:
+            self.store.refresh()
+            vectors = self.store.vectors()
+            if self.ann.size < len(vectors):
+                # Rows appended by another process since we loaded the index
+                self.ann.add(vectors[self.ann.size:], first_row=self.ann.size)
+            return self.ann.search(vectors, query_vector, k=k, mask=self.store.live_mask(file_ids))
+        return self.store.search(query_vector, k=k, doc_ids=file_ids)
+
+    def _lexical_search(self, query: str, k: int, file_ids: list = None) -> List[Tuple[int, float]]:
+        self.update_lexical_index()
+        return self.lexical.search(query, k=k, mask=self.store.live_mask(file_ids))
+
+    @staticmethod
+    def _timed(func, *args) -> Tuple[List[Tuple[int, float]], float]:
+        started = time.perf_counter()
+        result = func(*args)
+        return result, (time.perf_counter() - started) * 1000
+
+    def _fetch(self, hits: List[Tuple[int, float]], k: int) -> List[Dict]:
+        hits = hits[:k]
+        chunks = self.store.get_chunks([row for row, _ in hits])
+        scores = dict(hits)
+        for chunk in chunks:
+            chunk["score"] = scores[chunk["row"]]
+        return chunks
+
+    def retrieve_sync(self, query: str, k: Optional[int] = None, file_ids: list = None) -> List[Dict]:
+        """Returns the top-k chunks for a query, each with a `score` (cosine, or RRF in hybrid mode)."""
+        k = k or settings.rag_top_k
+        if self.retrieval_mode != "hybrid":
+            return self._fetch(self._vector_search(query, k, file_ids), k)
+        depth = max(k, settings.rag_candidate_k)
+        fused = reciprocal_rank_fusion(
+            [self._vector_search(query, depth, file_ids), self._lexical_search(query, depth, file_ids)],
+            k=settings.rag_rrf_k)
+        return self._fetch(fused, k)
+
+    async def retrieve_with_timings(self, query: str, k: Optional[int] = None,
+                                    file_ids: list = None) -> Tuple[List[Dict], Dict[str, float]]:
+        """Like `retrieve`, plus per-stage latency in ms (vector, bm25, fuse, fetch, total).
+
+        In hybrid mode the vector and BM25 searches run concurrently on worker threads.
+        """
+        k = k or settings.rag_top_k
+        started = time.perf_counter()
+        timings: Dict[str, float] = {}
+        if self.retrieval_mode == "hybrid":
+            depth = max(k, settings.rag_candidate_k)
+            (vector_hits, timings["vector_ms"]), (lexical_hits, timings["bm25_ms"]) = await asyncio.gather(
+                asyncio.to_thread(self._timed, self._vector_search, query, depth, file_ids),
+                asyncio.to_thread(self._timed, self._lexical_search, query, depth, file_ids),
+            )
+            fuse_started = time.perf_counter()
+            hits = reciprocal_rank_fusion([vector_hits, lexical_hits], k=settings.rag_rrf_k)
+            timings["fuse_ms"] = (time.perf_counter() - fuse_started) * 1000
+        else:
+            hits, timings["vector_ms"] = await asyncio.to_thread(self._timed, self._vector_search, query, k, file_ids)
+        chunks, timings["fetch_ms"] = await asyncio.to_thread(self._timed, self._fetch, hits, k)
+        timings["total_ms"] = (time.perf_counter() - started) * 1000
+        logger.debug(f"RAG retrieval timings for '{query[:50]}': " + ", ".join(f"{name}={ms:.2f}" for name, ms in timings.items()))
+        return chunks, timings
+
+    async def retrieve(self, query: str, k: Optional[int] = None, file_ids: list = None) -> List[Dict]:
+        chunks, _ = await self.retrieve_with_timings(query, k=k, file_ids=file_ids)
+        return chunks
 
     async def generate_response(self, query: str, file_ids: list = None):
         """Generates a response using RAG based on the query and optional file IDs."""
-        logger.info(f"RAG Handler received query: '{query}' with file IDs: {file_ids}")
-
-        # TODO: Implement:
-        # 1. Logic to select relevant files if not provided explicitly.
-        # 2. Construct prompt including query and file references (using file_ids).
-        #    Example content list: [query, file_client.get(file_id) for file_id in file_ids]
-        # 3. Call the Gemini model (self.model.generate_content).
-        # 4. Process and return the response.
-
-        # Placeholder response
-        if file_ids:
-            return f"(Placeholder RAG response for '{query}' using files: {file_ids})"
-        else:
-            return f"(Placeholder RAG response for '{query}' - no files provided)"
+        logger.info(f"RAG Handler received query: {truncate_payload(query)} with file IDs: {truncate_payload(file_ids)}")
+        query_vector = None
+        if self.answer_cache is not None:
+            started = time.perf_counter()
+            # Embedding and the liveness check are blocking; keep them off the event loop
+            query_vector = await asyncio.to_thread(self.embedder.embed_one, query)
+            cached = await asyncio.to_thread(self.answer_cache.lookup, query_vector, file_ids, self._chunks_live)
+            if cached is not None:
+                logger.info(f"RAG answer cache hit for '{query[:50]}' in {(time.perf_counter() - started) * 1000:.2f} ms.")
+                return cached
+        chunks = await self.retrieve(query, file_ids=file_ids)
+        if not chunks:
+            return "I couldn't find anything about that in the knowledge base."
+
+        context = "\n\n".join(f"[{c['doc_id']} #{c['chunk_no']}]\n{c['text']}" for c in chunks)
+        if not self.client:
+            # No model configured: return the retrieved excerpts directly
+            answer = f"Relevant excerpts from the knowledge base:\n\n{context}"
+            if query_vector is not None:
+                self.answer_cache.put(query, query_vector, answer, chunks, file_ids)
+            return answer
+
+        prompt = (
+            "Answer the question using only the knowledge base excerpts below. "
+            "Cite the excerpt labels you used. If the excerpts do not contain the answer, say so.\n\n"
+            f"EXCERPTS:\n{context}\n\nQUESTION: {query}"
+        )
+        try:
+            response = await self.client.aio.models.generate_content(model=self.model_name, contents=prompt)
+            if query_vector is not None and response.text:
+                self.answer_cache.put(query, query_vector, response.text, chunks, file_ids)
+            return response.text
+        except Exception as e:
+            logger.error(f"RAG generation failed for query '{query[:50]}': {e}", exc_info=True)
+            return f"Relevant excerpts from the knowledge base:\n\n{context}"
 
-    async def upload_file(self, file_path: str):
-        """Uploads a file to the Google AI Files API."""
+    async def upload_file(self, file_path: str, doc_id: Optional[str] = None):
+        """Ingests (or re-ingests) a file into the local knowledge index and returns its document ID."""
         logger.info(f"Uploading file: {file_path}")
-        # TODO: Implement file upload using google.generativeai
-        # myfile = genai.upload_file(path=file_path)
-        # return myfile.name # Return the file ID
-        # Placeholder
-        return f"uploaded_{os.path.basename(file_path).replace('.', '_')}"
+        doc_id = doc_id or upload_doc_id(file_path)
+        await self.ingest_file(file_path, doc_id=doc_id)
+        return doc_id
 
 # Consider using FastAPI's dependency injection
 # rag_handler = RAGHandler()
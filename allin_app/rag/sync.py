@@ -0,0 +1,314 @@
+# Incremental knowledge-base sync: hash-based change detection, process-pool parsing, tombstones
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import sqlite3
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Deque, Dict, List, Optional, Tuple
+
+from ..core.file_lock import FileLock
+from ..core.logging_config import logger
+from .chunker import SUPPORTED_EXTENSIONS, chunk_file
+
+_STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS source_files (
+    doc_id TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    file_hash TEXT NOT NULL,
+    chunks INTEGER NOT NULL,
+    synced_at REAL NOT NULL
+);
+"""
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                return digest.hexdigest()
+            digest.update(block)
+
+
+def parse_document(path: str, chunk_size: int, overlap: int) -> List[Tuple[int, str, str]]:
+    """Process-pool worker: returns (start_offset, text, content_hash) for each chunk of a file."""
+    return [
+        (start_offset, text, hashlib.sha256(text.encode("utf-8")).hexdigest())
+        for start_offset, text in chunk_file(path, chunk_size=chunk_size, overlap=overlap)
+    ]
+
+
+class SyncJob:
+    """Progress and control state for one sync run."""
+
+    def __init__(self, source_dir: str):
+        self.id = uuid.uuid4().hex
+        self.source_dir = source_dir
+        self.status = "pending" # pending -> running -> completed | failed | cancelled
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.files_total = 0
+        self.files_processed = 0
+        self.files_unchanged = 0
+        self.files_changed = 0
+        self.files_deleted = 0
+        self.chunks_added = 0
+        self.chunks_reused = 0
+        self.chunks_tombstoned = 0
+        self.current_file: Optional[str] = None
+        self.doc_prefix = "" # doc_ids of this job's files start with it (the directory relative to the sync root)
+        self._cancel_requested = False
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel_requested
+
+    def as_dict(self) -> dict:
+        elapsed = None
+        if self.started_at:
+            elapsed = round((self.finished_at or time.time()) - self.started_at, 3)
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "source_dir": self.source_dir,
+            "error": self.error,
+            "elapsed_seconds": elapsed,
+            "current_file": self.current_file,
+            "files_total": self.files_total,
+            "files_processed": self.files_processed,
+            "files_unchanged": self.files_unchanged,
+            "files_changed": self.files_changed,
+            "files_deleted": self.files_deleted,
+            "chunks_added": self.chunks_added,
+            "chunks_reused": self.chunks_reused,
+            "chunks_tombstoned": self.chunks_tombstoned,
+        }
+
+
+class KnowledgeSync:
+    """Runs incremental sync jobs of a source directory into a RAGHandler's index.
+
+    - Files whose (size, mtime) match the recorded state are skipped without
+      reading them; otherwise the content hash decides whether they changed.
+    - Changed files are parsed and chunked in a process pool, at most
+      `2 * workers` files ahead of the one being embedded.
+    - Chunks are diffed by content hash against the document's live chunks:
+      unchanged chunks keep their rows (no re-embedding), new ones are embedded
+      and appended, vanished ones are tombstoned.
+    - Each file's state is committed as soon as it is done, so an interrupted
+      job resumes where it stopped: finished files are skipped, and a
+      half-ingested file reuses whatever chunks already reached the index.
+    - With `root` set, only `root` and directories inside it (after resolving
+      symlinks) can be synced, and doc_ids are relative to `root`, so syncing a
+      subdirectory only adds or removes documents under it.
+    - One job at a time per index, across processes (flock on `sync.lock` in
+      the index directory), since every uvicorn worker has its own KnowledgeSync.
+    """
+
+    def __init__(self, rag_handler, chunk_size: int, overlap: int, embed_batch_size: int = 64, workers: int = 2,
+                 root: Optional[str] = None):
+        self.rag = rag_handler
+        self.root = os.path.realpath(root) if root else None
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.embed_batch_size = embed_batch_size
+        self.workers = workers
+        self._conn = sqlite3.connect(os.path.join(rag_handler.store.index_dir, "sync.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_STATE_SCHEMA)
+        self.jobs: Dict[str, SyncJob] = {}
+        self._active: Optional[SyncJob] = None
+        self._job_lock = FileLock(os.path.join(rag_handler.store.index_dir, "sync.lock"))
+
+    # --- Job control ---
+
+    @property
+    def active_job(self) -> Optional[SyncJob]:
+        return self._active
+
+    def _doc_prefix(self, source_dir: str) -> str:
+        """doc_id prefix for files under `source_dir`. Raises ValueError if it is outside `root`."""
+        if self.root is None:
+            return ""
+        resolved = os.path.realpath(source_dir)
+        if os.path.commonpath([resolved, self.root]) != self.root:
+            raise ValueError(f"Knowledge source directory must be inside {self.root}: {source_dir}")
+        relative = os.path.relpath(resolved, self.root)
+        return "" if relative == "." else relative.replace(os.sep, "/") + "/"
+
+    def start(self, source_dir: str) -> SyncJob:
+        """Starts a background sync job.
+
+        Raises RuntimeError if one is already running (in any process), ValueError
+        if `source_dir` is outside `root` and FileNotFoundError if it does not exist.
+        """
+        if self._active is not None:
+            raise RuntimeError(f"Sync job {self._active.id} is already running.")
+        prefix = self._doc_prefix(source_dir)
+        if not os.path.isdir(source_dir):
+            raise FileNotFoundError(f"Knowledge source directory not found: {source_dir}")
+        if not self._job_lock.acquire(blocking=False):
+            raise RuntimeError("A knowledge sync is already running in another worker.")
+        job = SyncJob(source_dir)
+        job.doc_prefix = prefix
+        self.jobs[job.id] = job
+        self._active = job
+        job._task = asyncio.create_task(self._run(job), name=f"knowledge-sync-{job.id}")
+        return job
+
+    def cancel(self, job_id: str) -> Optional[SyncJob]:
+        """Requests cancellation; the job stops after the file it is processing."""
+        job = self.jobs.get(job_id)
+        if job and job.status in ("pending", "running"):
+            job._cancel_requested = True
+        return job
+
+    async def wait(self, job_id: str):
+        job = self.jobs[job_id]
+        if job._task:
+            await asyncio.shield(job._task)
+
+    # --- Job body ---
+
+    async def _run(self, job: SyncJob):
+        job.status = "running"
+        job.started_at = time.time()
+        logger.info(f"Knowledge sync {job.id} started for {job.source_dir}.")
+        # spawn: forking a process that runs an event loop and worker threads is unsafe
+        pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            await self._sync(job, pool)
+            job.status = "cancelled" if job.cancel_requested else "completed"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            raise
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            logger.error(f"Knowledge sync {job.id} failed: {e}", exc_info=True)
+        finally:
+            # Never block the event loop waiting for workers
+            pool.shutdown(wait=False, cancel_futures=True)
+            job.finished_at = time.time()
+            job.current_file = None
+            self._active = None
+            self._job_lock.release()
+            logger.info(f"Knowledge sync {job.id} {job.status}: {job.as_dict()}")
+
+    def _scan(self, source_dir: str, prefix: str = "") -> Dict[str, str]:
+        """Returns doc_id (`prefix` + posix path relative to source_dir) -> absolute path."""
+        found = {}
+        for root, _, files in os.walk(source_dir):
+            for name in files:
+                if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                    path = os.path.join(root, name)
+                    found[prefix + os.path.relpath(path, source_dir).replace(os.sep, "/")] = path
+        return found
+
+    def _recorded(self) -> Dict[str, Tuple[int, int, str]]:
+        return {doc_id: (size, mtime_ns, file_hash) for doc_id, size, mtime_ns, file_hash in
+                self._conn.execute("SELECT doc_id, size, mtime_ns, file_hash FROM source_files")}
+
+    # Blocking (SQLite and embedding); run through asyncio.to_thread
+
+    def _forget_document(self, doc_id: str) -> int:
+        tombstoned = self.rag.store.tombstone_document(doc_id)
+        with self._conn:
+            self._conn.execute("DELETE FROM source_files WHERE doc_id = ?", (doc_id,))
+        return tombstoned
+
+    def _touch_document(self, doc_id: str, stat: os.stat_result):
+        with self._conn:
+            self._conn.execute("UPDATE source_files SET size = ?, mtime_ns = ? WHERE doc_id = ?",
+                               (stat.st_size, stat.st_mtime_ns, doc_id))
+
+    def _sync_document(self, job: SyncJob, doc_id: str, chunks: List[Tuple[int, str, str]],
+                       stat: os.stat_result, file_hash: str):
+        self._apply_document(job, doc_id, chunks)
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO source_files (doc_id, size, mtime_ns, file_hash, chunks, synced_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (doc_id, stat.st_size, stat.st_mtime_ns, file_hash, len(chunks), time.time()))
+
+    async def _sync(self, job: SyncJob, pool: ProcessPoolExecutor):
+        loop = asyncio.get_running_loop()
+        found = await asyncio.to_thread(self._scan, job.source_dir, job.doc_prefix)
+        recorded = await asyncio.to_thread(self._recorded)
+        job.files_total = len(found)
+
+        # Deleted files (under the synced directory): tombstone all their chunks
+        for doc_id in sorted(d for d in set(recorded) - set(found) if d.startswith(job.doc_prefix)):
+            if job.cancel_requested:
+                return
+            job.chunks_tombstoned += await asyncio.to_thread(self._forget_document, doc_id)
+            self.rag.invalidate_documents([doc_id])
+            job.files_deleted += 1
+
+        # Detect changes cheaply first (stat, then hash only when stat differs)
+        changed: Deque[Tuple[str, str, os.stat_result, str]] = deque()
+        for doc_id, path in sorted(found.items()):
+            if job.cancel_requested:
+                return
+            stat = os.stat(path)
+            previous = recorded.get(doc_id)
+            if previous and previous[0] == stat.st_size and previous[1] == stat.st_mtime_ns:
+                job.files_unchanged += 1
+                job.files_processed += 1
+                continue
+            file_hash = await asyncio.to_thread(file_sha256, path)
+            if previous and previous[2] == file_hash:
+                # Touched but identical: just refresh the stat fingerprint
+                await asyncio.to_thread(self._touch_document, doc_id, stat)
+                job.files_unchanged += 1
+                job.files_processed += 1
+                continue
+            changed.append((doc_id, path, stat, file_hash))
+
+        # Parse changed files in the process pool, at most `2 * workers` ahead of the file being
+        # embedded, so finished-but-unapplied chunk lists never pile up; apply them in order
+        window = max(1, 2 * self.workers)
+        in_flight: Deque[Tuple[str, os.stat_result, str, asyncio.Future]] = deque()
+
+        def submit():
+            while changed and len(in_flight) < window:
+                doc_id, path, stat, file_hash = changed.popleft()
+                parse = loop.run_in_executor(pool, parse_document, path, self.chunk_size, self.overlap)
+                in_flight.append((doc_id, stat, file_hash, parse))
+
+        try:
+            submit()
+            while in_flight:
+                if job.cancel_requested:
+                    return
+                doc_id, stat, file_hash, parse = in_flight.popleft()
+                job.current_file = doc_id
+                chunks = await parse
+                submit() # the next parse overlaps with embedding this file
+                await asyncio.to_thread(self._sync_document, job, doc_id, chunks, stat, file_hash)
+                job.files_changed += 1
+                job.files_processed += 1
+        finally:
+            for *_, parse in in_flight:
+                parse.cancel()
+            if job.chunks_added or job.chunks_tombstoned:
+                await asyncio.to_thread(self._refresh_indexes)
+
+    def _apply_document(self, job: SyncJob, doc_id: str, chunks: List[Tuple[int, str, str]]):
+        """Diffs a document's new chunks against its live chunks by content hash."""
+        added, reused, tombstoned = self.rag.apply_document(doc_id, chunks, batch_size=self.embed_batch_size)
+        job.chunks_added += added
+        job.chunks_reused += reused
+        job.chunks_tombstoned += tombstoned
+
+    def _refresh_indexes(self):
+        self.rag.update_ann_index()
+        self.rag.update_lexical_index()
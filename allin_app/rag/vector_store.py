@@ -0,0 +1,288 @@
+# Memory-mapped float32 vector store with a SQLite sidecar for chunk metadata
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..core.file_lock import FileLock
+from ..core.logging_config import logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    row INTEGER PRIMARY KEY,          -- row in vectors.f32
+    doc_id TEXT NOT NULL,             -- source document (path relative to the knowledge root)
+    chunk_no INTEGER NOT NULL,
+    start_offset INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_doc ON chunks (doc_id, deleted);
+CREATE INDEX IF NOT EXISTS idx_chunks_hash ON chunks (content_hash);
+"""
+
+
+class MmapVectorStore:
+    """Append-only vector store shared between processes through the OS page cache.
+
+    Vectors live in `vectors.f32`, a raw row-major float32 file mapped with
+    numpy.memmap; every worker process maps the same file read-only, so the
+    index is never copied per process. Chunk text and bookkeeping live in
+    `chunks.db` (SQLite, WAL mode). The row count is published in the `meta`
+    table only after the vectors are flushed, so readers never see a row whose
+    vector is not on disk. Deletions are tombstones (`deleted = 1`), masked out
+    at query time. Writers in any process serialize on `write.lock` (flock):
+    rows are reserved from the published count under it, and the vectors file
+    only ever grows, so no process's mapping is truncated.
+    """
+
+    VECTORS_FILE = "vectors.f32"
+    META_FILE = "chunks.db"
+    LOCK_FILE = "write.lock"
+
+    def __init__(self, index_dir: str, dim: int, search_block_rows: int = 65536):
+        self.index_dir = index_dir
+        self.dim = dim
+        self.search_block_rows = search_block_rows
+        os.makedirs(index_dir, exist_ok=True)
+        self.vectors_path = os.path.join(index_dir, self.VECTORS_FILE)
+        self._conn = sqlite3.connect(os.path.join(index_dir, self.META_FILE), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.RLock()
+        self._write_lock = FileLock(os.path.join(index_dir, self.LOCK_FILE)) # taken inside _lock
+        self._mm: Optional[np.memmap] = None
+        self._mapped_rows = 0
+        self._count = 0
+        self._version = -1
+        self._tombstones = -1
+        self._deleted_mask = np.zeros(0, dtype=bool)
+
+        with self._conn:
+            stored_dim = self._get_meta("dim")
+            if stored_dim is None:
+                self._set_meta("dim", dim)
+                self._set_meta("count", 0)
+                self._set_meta("version", 0)
+                self._set_meta("tombstones", 0)
+            elif int(stored_dim) != dim:
+                raise ValueError(f"Index at {index_dir} has dim {stored_dim}, but the embedder produces {dim}.")
+        if not os.path.exists(self.vectors_path):
+            open(self.vectors_path, "wb").close()
+        self.refresh()
+
+    # --- Metadata helpers ---
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def _bump(self, key: str):
+        self._conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = ?", (key,))
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def version(self) -> int:
+        """Incremented on every write; lets dependants (e.g. caches) detect changes cheaply."""
+        return self._version
+
+    # --- Mapping ---
+
+    def _map(self, rows: int, writable: bool = False):
+        if self._mm is not None:
+            if writable:
+                self._mm.flush()
+            del self._mm
+            self._mm = None
+        if rows:
+            self._mm = np.memmap(self.vectors_path, dtype=np.float32, mode="r+" if writable else "r", shape=(rows, self.dim))
+        self._mapped_rows = rows
+
+    def refresh(self):
+        """Picks up rows and tombstones published by other processes."""
+        with self._lock:
+            count = int(self._get_meta("count"))
+            version = int(self._get_meta("version"))
+            tombstones = int(self._get_meta("tombstones"))
+            capacity = os.path.getsize(self.vectors_path) // (4 * self.dim)
+            if count > self._mapped_rows or (self._mm is None and capacity):
+                self._map(capacity)
+            if tombstones != self._tombstones:
+                # Tombstones changed: reload the deleted mask
+                mask = np.zeros(count, dtype=bool)
+                deleted = [row for (row,) in self._conn.execute("SELECT row FROM chunks WHERE deleted = 1")]
+                if deleted:
+                    mask[np.asarray(deleted, dtype=np.int64)] = True
+                self._deleted_mask = mask
+            elif count > len(self._deleted_mask):
+                # Appends only: new rows are live
+                self._deleted_mask = np.concatenate([self._deleted_mask, np.zeros(count - len(self._deleted_mask), dtype=bool)])
+            self._count = count
+            self._version = version
+            self._tombstones = tombstones
+
+    # --- Writes ---
+
+    def append(self, vectors: np.ndarray, records: Sequence[Dict]) -> List[int]:
+        """Appends vectors with their chunk records; returns the assigned rows.
+
+        Each record needs doc_id, chunk_no, start_offset, text and content_hash.
+        """
+        if len(vectors) != len(records):
+            raise ValueError("vectors and records must have the same length")
+        if not len(records):
+            return []
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock, self._write_lock:
+            self.refresh() # the count other processes published is current while we hold the write lock
+            start = self._count
+            needed = start + len(records)
+            capacity = os.path.getsize(self.vectors_path) // (4 * self.dim)
+            if needed > self._mapped_rows or self._mm is None or self._mm.mode != "r+":
+                new_capacity = max(needed, capacity * 2, 1024) if needed > capacity else capacity
+                if new_capacity > capacity:
+                    # Grow the file (sparse on most filesystems), then remap writable
+                    with open(self.vectors_path, "r+b") as f:
+                        f.truncate(new_capacity * 4 * self.dim)
+                self._map(new_capacity, writable=True)
+            self._mm[start:needed] = vectors
+            self._mm.flush() # vectors must be durable before the count is published
+            rows = list(range(start, needed))
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO chunks (row, doc_id, chunk_no, start_offset, text, content_hash) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(row, r["doc_id"], r["chunk_no"], r["start_offset"], r["text"], r["content_hash"])
+                     for row, r in zip(rows, records)],
+                )
+                self._set_meta("count", needed)
+                self._bump("version")
+            self.refresh()
+            return rows
+
+    def tombstone_rows(self, rows: Iterable[int]) -> int:
+        """Marks chunks as deleted; their vectors stay on disk but are never returned."""
+        rows = list(rows)
+        if not rows:
+            return 0
+        with self._lock, self._write_lock:
+            with self._conn:
+                self._conn.executemany("UPDATE chunks SET deleted = 1 WHERE row = ?", [(r,) for r in rows])
+                self._bump("version")
+                self._bump("tombstones")
+            self.refresh()
+        return len(rows)
+
+    def tombstone_document(self, doc_id: str) -> int:
+        rows = [row for (row,) in self._conn.execute(
+            "SELECT row FROM chunks WHERE doc_id = ? AND deleted = 0", (doc_id,))]
+        return self.tombstone_rows(rows)
+
+    # --- Reads ---
+
+    def vectors(self) -> np.ndarray:
+        """Returns a read-only view of all published vectors (including tombstoned rows)."""
+        with self._lock:
+            if self._mm is None or not self._count:
+                return np.zeros((0, self.dim), dtype=np.float32)
+            return self._mm[:self._count]
+
+    def live_mask(self, doc_ids: Optional[Iterable[str]] = None) -> np.ndarray:
+        """Boolean mask of rows that are not tombstoned (and belong to `doc_ids`, if given)."""
+        with self._lock:
+            mask = ~self._deleted_mask[:self._count]
+            if doc_ids is not None:
+                doc_ids = list(doc_ids)
+                allowed = np.zeros(self._count, dtype=bool)
+                placeholders = ",".join("?" * len(doc_ids))
+                if doc_ids:
+                    rows = [row for (row,) in self._conn.execute(
+                        f"SELECT row FROM chunks WHERE doc_id IN ({placeholders})", doc_ids)]
+                    if rows:
+                        allowed[np.asarray(rows, dtype=np.int64)] = True
+                mask &= allowed
+            return mask
+
+    def rows_live(self, rows: Iterable[int]) -> bool:
+        """True if every row is published and not tombstoned (as of the last refresh)."""
+        with self._lock:
+            return all(0 <= row < self._count and not self._deleted_mask[row] for row in rows)
+
+    def search(self, query: np.ndarray, k: int = 5, doc_ids: Optional[Iterable[str]] = None) -> List[Tuple[int, float]]:
+        """Exact cosine top-k over live rows, scanning the map block by block."""
+        self.refresh()
+        vectors = self.vectors()
+        if not len(vectors):
+            return []
+        mask = self.live_mask(doc_ids)
+        query = np.asarray(query, dtype=np.float32)
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for start in range(0, len(vectors), self.search_block_rows):
+            block = vectors[start:start + self.search_block_rows]
+            scores = block @ query
+            scores[~mask[start:start + len(block)]] = -np.inf
+            take = min(k, len(scores))
+            top = np.argpartition(-scores, take - 1)[:take]
+            best_rows = np.concatenate([best_rows, top + start])
+            best_scores = np.concatenate([best_scores, scores[top]])
+            if len(best_rows) > k:
+                keep = np.argpartition(-best_scores, k - 1)[:k]
+                best_rows, best_scores = best_rows[keep], best_scores[keep]
+        order = np.argsort(-best_scores)
+        return [(int(best_rows[i]), float(best_scores[i])) for i in order if np.isfinite(best_scores[i])]
+
+    def get_chunks(self, rows: Sequence[int]) -> List[Dict]:
+        """Returns chunk records for rows, in the given order."""
+        if not rows:
+            return []
+        placeholders = ",".join("?" * len(rows))
+        with self._lock:
+            fetched = self._conn.execute(
+                f"SELECT row, doc_id, chunk_no, start_offset, text, content_hash, deleted FROM chunks WHERE row IN ({placeholders})",
+                list(rows)).fetchall()
+        by_row = {
+            r[0]: {"row": r[0], "doc_id": r[1], "chunk_no": r[2], "start_offset": r[3], "text": r[4],
+                   "content_hash": r[5], "deleted": bool(r[6])}
+            for r in fetched
+        }
+        return [by_row[row] for row in rows if row in by_row]
+
+    def live_chunk_hashes(self, doc_id: str) -> List[Tuple[int, str]]:
+        """Returns (row, content_hash) for a document's non-tombstoned chunks."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT row, content_hash FROM chunks WHERE doc_id = ? AND deleted = 0 ORDER BY row", (doc_id,)).fetchall()
+
+    def iter_chunk_texts(self, start_row: int = 0, batch: int = 1000) -> Iterable[Tuple[int, str]]:
+        """Yields (row, text) for every published row >= start_row, tombstoned or not, in row order."""
+        row = start_row
+        while row < self._count:
+            with self._lock:
+                fetched = self._conn.execute(
+                    "SELECT row, text FROM chunks WHERE row >= ? AND row < ? ORDER BY row LIMIT ?",
+                    (row, self._count, batch)).fetchall()
+            if not fetched:
+                return
+            yield from fetched
+            row = fetched[-1][0] + 1
+
+    def documents(self) -> List[str]:
+        return [doc for (doc,) in self._conn.execute("SELECT DISTINCT doc_id FROM chunks WHERE deleted = 0 ORDER BY doc_id")]
+
+    def close(self):
+        with self._lock:
+            self._map(0, writable=self._mm is not None and self._mm.mode == "r+")
+            self._conn.close()
+        logger.info(f"Vector store at {self.index_dir} closed.")
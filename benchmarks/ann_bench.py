@@ -0,0 +1,93 @@
+# Benchmark: IVF approximate search vs. exact search on synthetic corpora
+#
+# Reports build time, recall@k against exact search, queries per second and
+# resident memory for each corpus size.
+#
+# Usage (from the project root):
+#   python -m benchmarks.ann_bench --sizes 10000,100000 --dim 128
+#   python -m benchmarks.ann_bench --sizes 1000000 --dim 128 --nlist 4096 --nprobe 32
+import argparse
+import os
+import time
+
+import numpy as np
+
+from allin_app.rag.ann import IVFIndex
+
+
+def _rss_mb() -> float:
+    """Current resident set size in MiB (Linux /proc; falls back to peak RSS elsewhere)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _synthetic_corpus(n: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """Unit vectors drawn around random cluster centres (closer to real embeddings than pure noise)."""
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    data = np.empty((n, dim), dtype=np.float32)
+    block = 100_000
+    for start in range(0, n, block):
+        size = min(block, n - start)
+        labels = rng.integers(0, clusters, size)
+        data[start:start + size] = centres[labels] + 0.6 * rng.standard_normal((size, dim)).astype(np.float32)
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    return data
+
+
+def _exact_topk(data: np.ndarray, query: np.ndarray, k: int) -> np.ndarray:
+    scores = data @ query
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def run(n: int, dim: int, k: int, queries: int, nlist: int, nprobe: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    rss_before = _rss_mb()
+    data = _synthetic_corpus(n, dim, clusters=max(16, n // 2000), rng=rng)
+    query_set = data[rng.choice(n, queries, replace=False)] + 0.05 * rng.standard_normal((queries, dim)).astype(np.float32)
+    query_set /= np.linalg.norm(query_set, axis=1, keepdims=True)
+    rss_data = _rss_mb()
+
+    started = time.perf_counter()
+    exact = [_exact_topk(data, q, k) for q in query_set]
+    exact_qps = queries / (time.perf_counter() - started)
+
+    index = IVFIndex(index_dir=None, dim=dim, nlist=nlist, nprobe=nprobe)
+    started = time.perf_counter()
+    index.train(data)
+    build_s = time.perf_counter() - started
+    rss_index = _rss_mb()
+
+    started = time.perf_counter()
+    results = [index.search(data, q, k) for q in query_set]
+    ivf_qps = queries / (time.perf_counter() - started)
+
+    recall = np.mean([len(set(r for r, _ in res) & set(ex.tolist())) / k for res, ex in zip(results, exact)])
+    print(
+        f"n={n:>9,} dim={dim} nlist={len(index.centroids)} nprobe={nprobe} | "
+        f"build {build_s:7.2f}s | recall@{k} {recall:.3f} | "
+        f"QPS exact {exact_qps:9.1f} ivf {ivf_qps:9.1f} | "
+        f"RSS data {rss_data - rss_before:7.1f} MiB, index +{rss_index - rss_data:6.1f} MiB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nlist", type=int, default=0, help="0 = sqrt(n)")
+    parser.add_argument("--nprobe", type=int, default=16)
+    args = parser.parse_args()
+    for n in (int(s) for s in args.sizes.split(",")):
+        nlist = args.nlist or max(16, int(np.sqrt(n)))
+        run(n, args.dim, args.k, args.queries, nlist, args.nprobe)
+
+
+if __name__ == "__main__":
+    main()
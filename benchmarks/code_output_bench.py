@@ -0,0 +1,121 @@
+# Peak memory per connection with large code-execution outputs: inline frames vs the blob spool
+#
+# Runs --connections concurrent turns through InteractionManager.process_live_message
+# against the offline Live API fake, each returning one code output of --output-mb,
+# encodes every event with the WebSocket codec (as the /ws writer does), then stops
+# the manager so memory ingestion and chat history writes are flushed. Reports the
+# tracemalloc peak per connection, frames and largest frame per turn, and the
+# characters handed to memory / chat history per turn.
+#
+# "inline (before)" sends each output as one frame and records it in full, as
+# before; "spool" uses the defaults (bounded chunks, spooled blob + reference,
+# truncated digest). "upstream only" just reads the fake's messages, for the cost
+# of the upstream message itself (part of every peak). Each mode runs in its own process.
+#
+# Usage (from the project root):
+#   python -m benchmarks.code_output_bench --output-mb 10 --connections 8
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+
+def _configure_env(data_dir: str):
+    os.environ.update(
+        LIVE_API_BACKEND="fake", MEMORY_BACKEND="fake", FAKE_MEMORY_LATENCY_MS="0", FAKE_MEMORY_JITTER_MS="0",
+        LOG_LEVEL="WARNING", LOG_FILE_ENABLED="false",
+        HISTORY_DB_PATH=os.path.join(data_dir, "history.db"),
+        SESSION_HANDLE_DB_PATH=os.path.join(data_dir, "session_handles.db"),
+        MEMORY_INGEST_SPOOL_PATH=os.path.join(data_dir, "spool.jsonl"),
+        CODE_OUTPUT_SPOOL_DIR=os.path.join(data_dir, "code_outputs"))
+
+
+async def _connection(manager, codec, index: int, stats: dict, upstream_only: bool):
+    async with manager.open_live_session() as session:
+        if upstream_only:
+            await session.send_client_content(turns=[], turn_complete=True)
+            async for message in session.receive():
+                stats["frames"] += 1
+            return
+        async for event in manager.process_live_message(session, f"user{index}", f"chat{index}",
+                                                        "Run the report script.", None):
+            frame = codec.encode(event) # what the /ws writer sends; dropped once "sent"
+            stats["frames"] += 1
+            stats["max_frame"] = max(stats["max_frame"], len(frame))
+            del frame
+
+
+async def run_mode(args, mode: str) -> dict:
+    from allin_app.api.protocol import available_codecs
+    from allin_app.core.config import settings
+    from allin_app.core.fakes import FakeGenAIClient
+    from allin_app.core.interaction import InteractionManager
+
+    if mode == "inline":
+        settings.code_output_inline_max_chars = sys.maxsize
+        settings.code_output_memory_chars = sys.maxsize
+    codec = available_codecs()[0]
+    # Paced so the turns overlap, as concurrent connections do
+    client = FakeGenAIClient(connect_ms=0, first_token_ms=50, token_rate=100, jitter_ms=0, response_tokens=20,
+                             code_probability=1.0, code_error_probability=0.0,
+                             code_output_bytes=int(args.output_mb * 1024 * 1024))
+    manager = InteractionManager(client=client)
+    await manager.initialize()
+    recorded = []
+    record_turn = manager._record_turn
+
+    def _record_turn(user_id, chat_id, message, user_message_ts, response_text, interrupted):
+        recorded.append(len(response_text))
+        record_turn(user_id, chat_id, message, user_message_ts, response_text, interrupted)
+
+    manager._record_turn = _record_turn
+    stats = {"frames": 0, "max_frame": 0}
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    await asyncio.gather(*(_connection(manager, codec, i, stats, mode == "upstream")
+                           for i in range(args.connections)))
+    await manager.stop()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return {
+        "peak_mib_per_connection": peak / args.connections / 2**20,
+        "frames_per_turn": stats["frames"] / args.connections,
+        "max_frame_kib": stats["max_frame"] / 1024,
+        "recorded_chars_per_turn": sum(recorded) / max(1, len(recorded)),
+        "seconds": elapsed,
+        "codec": codec.name,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--output-mb", type=float, default=10.0)
+    parser.add_argument("--connections", type=int, default=8)
+    parser.add_argument("--mode", choices=("all", "upstream", "inline", "spool"), default="all")
+    args = parser.parse_args()
+
+    if args.mode == "all":
+        for mode in ("upstream", "inline", "spool"):
+            subprocess.run([sys.executable, "-m", "benchmarks.code_output_bench", "--mode", mode,
+                            "--output-mb", str(args.output_mb), "--connections", str(args.connections)], check=True)
+        return
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        _configure_env(data_dir)
+        result = asyncio.run(run_mode(args, args.mode))
+    label = {"upstream": "upstream only", "inline": "inline (before)", "spool": "spool"}[args.mode]
+    print(f"{label:<16} | {args.output_mb:g} MB x {args.connections} | peak {result['peak_mib_per_connection']:7.1f} MiB/conn | "
+          f"{result['frames_per_turn']:6.1f} frames/turn, largest {result['max_frame_kib']:8.1f} KiB | "
+          f"memory/history {result['recorded_chars_per_turn']:10.0f} chars/turn | {result['seconds']:.2f} s "
+          f"({result['codec']})")
+
+
+if __name__ == "__main__":
+    main()
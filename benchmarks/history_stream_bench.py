@@ -0,0 +1,132 @@
+# Benchmark: buffered JSON vs. streamed NDJSON for large chat histories
+#
+# Seeds a local memory store and a chat_turns store with N items for one chat,
+# then, for each endpoint and mode, starts a fresh server process and reports
+# time to first byte, total latency, response size and the server's peak RSS
+# growth while answering (Linux /proc).
+#
+#   memories buffered: the original path (whole get_all result validated into one response)
+#   history  buffered: the whole transcript as a single page (HISTORY_MAX_PAGE_SIZE=N)
+#   *        stream:   ?stream=true, read and emitted page by page
+#
+# Usage (from the project root):
+#   python -m benchmarks.history_stream_bench --items 50000
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from allin_app.history.store import SQLiteChatTurnStore
+from allin_app.memory.local_backend import LocalMemoryBackend
+
+USER_ID = "bench-user"
+CHAT_ID = "bench-chat"
+EMBEDDING_DIM = 64
+
+
+def _seed(data_dir: str, items: int):
+    text = "We discussed the deployment checklist, the staging database and the on-call rota. "
+    memories = LocalMemoryBackend(os.path.join(data_dir, "memory.db"), embedding_dim=EMBEDDING_DIM)
+    turns = SQLiteChatTurnStore(os.path.join(data_dir, "history.db"))
+    batch = 1000
+    started = time.time()
+    for start in range(0, items, batch):
+        size = min(batch, items - start)
+        memories.add([{"role": "user", "content": f"{text}#{start + i}"} for i in range(size)],
+                     user_id=USER_ID, metadata={"chat_id": CHAT_ID})
+        turns.add_turns([{"user_id": USER_ID, "chat_id": CHAT_ID, "role": "user" if i % 2 else "assistant",
+                          "content": f"{text}#{start + i}", "timestamp": started + start + i} for i in range(size)])
+    memories.close()
+    turns.close()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _proc_kib(pid: int, field: str) -> int:
+    with open(f"/proc/{pid}/status", "r") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def _get(port: int, path: str):
+    """Returns (status, ttfb_ms, total_ms, body_bytes), reading the body in 64 KiB chunks."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+    started = time.perf_counter()
+    conn.request("GET", path)
+    response = conn.getresponse()
+    first = response.read1(65536) if hasattr(response, "read1") else response.read(65536)
+    ttfb = (time.perf_counter() - started) * 1000
+    size = len(first)
+    while True:
+        chunk = response.read(65536)
+        if not chunk:
+            break
+        size += len(chunk)
+    total = (time.perf_counter() - started) * 1000
+    conn.close()
+    return response.status, ttfb, total, size
+
+
+def _measure(data_dir: str, items: int, path: str) -> dict:
+    port = _free_port()
+    env = dict(os.environ,
+               LOG_LEVEL="WARNING", GOOGLE_API_KEY="", MEMORY_BACKEND="local",
+               LOCAL_MEMORY_DB_PATH=os.path.join(data_dir, "memory.db"), LOCAL_EMBEDDING_DIM=str(EMBEDDING_DIM),
+               HISTORY_DB_PATH=os.path.join(data_dir, "history.db"), HISTORY_MAX_PAGE_SIZE=str(max(500, items)),
+               MEMORY_INGEST_SPOOL_PATH=os.path.join(data_dir, "spool.jsonl"), MEMORY_LIST_TIMEOUT="300")
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.time() + 60
+        while True:
+            try:
+                _get(port, "/health")
+                break
+            except OSError:
+                if time.time() > deadline or server.poll() is not None:
+                    raise RuntimeError("Server did not start.")
+                time.sleep(0.2)
+        rss_before = _proc_kib(server.pid, "VmRSS")
+        status, ttfb, total, size = _get(port, path)
+        peak = _proc_kib(server.pid, "VmHWM")
+        return {"status": status, "ttfb_ms": ttfb, "total_ms": total, "bytes": size,
+                "peak_rss_growth_mib": max(0, peak - rss_before) / 1024}
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=50_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        started = time.perf_counter()
+        _seed(data_dir, args.items)
+        print(f"Seeded {args.items:,} memories and turns in {time.perf_counter() - started:.1f}s")
+        cases = [
+            ("memories", "buffered", f"/api/v1/chat/memories/{USER_ID}/{CHAT_ID}"),
+            ("memories", "stream", f"/api/v1/chat/memories/{USER_ID}/{CHAT_ID}?stream=true"),
+            ("history", "buffered", f"/api/v1/chat/history/{USER_ID}/{CHAT_ID}?limit={args.items}"),
+            ("history", "stream", f"/api/v1/chat/history/{USER_ID}/{CHAT_ID}?stream=true"),
+        ]
+        for endpoint, mode, path in cases:
+            result = _measure(data_dir, args.items, path)
+            print(f"{endpoint:<8} {mode:<8} | HTTP {result['status']} | TTFB {result['ttfb_ms']:8.1f} ms | "
+                  f"total {result['total_ms']:8.1f} ms | {result['bytes'] / 2**20:6.1f} MiB body | "
+                  f"peak RSS +{result['peak_rss_growth_mib']:6.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# Benchmark: per-turn logging overhead, eager f-string logging vs. lazy/truncated/sampled logging
+#
+# Replays the log calls one /ws turn makes (message received, turns sent upstream
+# with memory context, per-frame debug, turn latency, memory write-behind and the
+# memory add response) with realistic payloads, and reports the time the caller
+# (i.e. the event loop) spends per turn and the total time until the records are
+# written, for each level (INFO, DEBUG), format (text, json) and style:
+#   eager (before): payloads formatted in f-strings whether or not the level is enabled
+#   lazy:           lazy arguments, byte-truncated payloads, sampled per-frame debug
+# Records go to a file in a temporary directory through the background writer, as in production
+# (--no-enqueue writes on the calling thread instead).
+#
+# Usage (from the project root):
+#   python -m benchmarks.logging_bench --turns 2000 --frames 40 --response-kb 8
+import argparse
+import os
+import tempfile
+import time
+
+from google.genai import types
+
+from allin_app.core import logging_config
+from allin_app.core.logging_config import configure_logging, debug_sampled, logger, truncate_payload
+
+
+def _payloads(response_kb: int, frames: int) -> dict:
+    memory_context = "Relevant information from past conversations:\n" + "\n".join(
+        f"- The user works on the billing service and prefers pytest fixtures (#{i})." for i in range(12))
+    message = "How do I run the integration tests for the billing service against the staging database?"
+    response = ("Run `make test-integration` with STAGING_DB_URL set. " * (response_kb * 1024 // 52))[:response_kb * 1024]
+    return {
+        "message": message,
+        "turns": [types.Content(role="user", parts=[types.Part(text=memory_context)]),
+                  types.Content(role="user", parts=[types.Part(text=message)])],
+        "response": response,
+        "frames": [response[i::frames][:200] for i in range(frames)],
+        "add_response": [{"id": f"mem-{i}", "memory": response[:400], "event": "ADD"} for i in range(6)],
+        "summary": {"ttft_ms": 412.3, "upstream_ttft_ms": 301.2, "total_ms": 1520.4, "events": frames,
+                    "text_chars": len(response), "inter_chunk_p50_ms": 31.2, "inter_chunk_max_ms": 88.0},
+    }
+
+
+def turn_eager(p: dict, user_id: str = "user-1"):
+    message, turns, response = p["message"], p["turns"], p["response"]
+    logger.info(f"Processing live message for user_id '{user_id}': {message[:50]}...")
+    logger.debug(f"Sending {len(turns)} turn(s) to live session for user {user_id}: {str(turns)[:150]}...")
+    for frame in p["frames"]:
+        logger.debug(f"Received {len(frame)} byte frame via WebSocket for user {user_id}")
+    logger.info(f"Turn latency for user {user_id}: {p['summary']}")
+    logger.debug(f"Queueing turn for memory ingestion for user {user_id}: '{response}'")
+    logger.info(f"Memory added for user {user_id} (2 message(s)). Response: {p['add_response']}")
+
+
+def turn_lazy(p: dict, user_id: str = "user-1"):
+    message, turns, response = p["message"], p["turns"], p["response"]
+    logger.info(f"Processing live message for user_id '{user_id}' ({len(message)} chars).")
+    logger.opt(lazy=True).debug("Message from user {}: {}", lambda: user_id, lambda: truncate_payload(message))
+    logger.opt(lazy=True).debug("Sending {} turn(s) to live session for user {}: {}", lambda: len(turns),
+                                lambda: user_id, lambda: truncate_payload(turns))
+    for frame in p["frames"]:
+        if debug_sampled():
+            logger.debug(f"Received {len(frame)} byte frame via WebSocket for user {user_id}")
+    logger.info(f"Turn latency for user {user_id}: {p['summary']}")
+    logger.opt(lazy=True).debug("Queueing turn for memory ingestion for user {}: {}",
+                                lambda: user_id, lambda: truncate_payload(response))
+    logger.info(f"Memory added for user {user_id} (2 message(s)).")
+    logger.opt(lazy=True).debug("Memory add response for user {}: {}", lambda: user_id,
+                                lambda: truncate_payload(p["add_response"]))
+
+
+def run(label: str, turn, payloads: dict, turns: int, level: str, log_format: str, log_dir: str, enqueue: bool):
+    path = os.path.join(log_dir, f"{label}-{level}-{log_format}.log")
+    with open(path, "w", encoding="utf-8") as stream:
+        configure_logging(level=level, log_format=log_format, file_enabled=False, enqueue=enqueue, stream=stream)
+        started = time.perf_counter()
+        for _ in range(turns):
+            turn(payloads)
+        caller = time.perf_counter() - started
+        logger.remove() # waits for the writer thread to write everything
+        total = time.perf_counter() - started
+        size = stream.tell()
+    print(f"{level:<5} {log_format:<4} {label:<15} | caller {caller / turns * 1e6:8.1f} us/turn | "
+          f"until written {total / turns * 1e6:8.1f} us/turn | {size / turns / 1024:6.2f} KiB/turn")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--frames", type=int, default=40, help="text frames per turn")
+    parser.add_argument("--response-kb", type=int, default=8)
+    parser.add_argument("--no-enqueue", action="store_true", help="write on the calling thread (LOG_ENQUEUE=false)")
+    parser.add_argument("--sample-rate", type=float, default=None, help="LOG_DEBUG_SAMPLE_RATE override")
+    args = parser.parse_args()
+    if args.sample_rate is not None:
+        logging_config.settings.log_debug_sample_rate = args.sample_rate
+
+    payloads = _payloads(args.response_kb, args.frames)
+    with tempfile.TemporaryDirectory() as log_dir:
+        for level in ("INFO", "DEBUG"):
+            for log_format in ("text", "json"):
+                for label, turn in (("eager (before)", turn_eager), ("lazy", turn_lazy)):
+                    run(label, turn, payloads, args.turns, level, log_format, log_dir, not args.no_enqueue)
+    configure_logging() # restore the default handlers
+
+
+if __name__ == "__main__":
+    main()
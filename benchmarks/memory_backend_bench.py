@@ -0,0 +1,80 @@
+# Benchmark: memory search latency, local backend vs. the mem0 cloud client
+#
+# Usage (from the project root):
+#   python -m benchmarks.memory_backend_bench --memories 10000 --queries 200
+#   python -m benchmarks.memory_backend_bench --remote   # also times mem0 (needs MEM0_API_KEY)
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from allin_app.memory.local_backend import LocalMemoryBackend
+
+_WORDS = (
+    "python fastapi websocket docker kubernetes deploy test pytest debug error config env "
+    "database postgres index query cache latency memory onboarding git branch merge review "
+    "service api token auth logging metrics team project sprint ticket build pipeline"
+).split()
+
+
+def _sentence(rng: random.Random, n: int = 12) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(n))
+
+
+def _percentiles(samples_ms):
+    samples = sorted(samples_ms)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "mean": statistics.fmean(samples)}
+
+
+def _time_searches(backend, user_id, queries, limit):
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        backend.search(query=query, user_id=user_id, limit=limit)
+        samples.append((time.perf_counter() - started) * 1000)
+    return _percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--memories", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--remote", action="store_true", help="Also time the mem0 cloud client.")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    queries = [_sentence(rng, 6) for _ in range(args.queries)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = LocalMemoryBackend(os.path.join(tmp, "bench.db"))
+        started = time.perf_counter()
+        batch = 500
+        for offset in range(0, args.memories, batch):
+            messages = [{"role": "user", "content": _sentence(rng)} for _ in range(min(batch, args.memories - offset))]
+            backend.add(messages, user_id="bench_user", metadata={"chat_id": "bench_chat"})
+        print(f"local: inserted {args.memories} memories in {time.perf_counter() - started:.2f}s")
+
+        started = time.perf_counter()
+        backend.search(query="warmup", user_id="bench_user", limit=args.limit) # loads the user matrix
+        print(f"local: cold matrix load {(time.perf_counter() - started) * 1000:.1f} ms")
+        stats = _time_searches(backend, "bench_user", queries, args.limit)
+        print("local search ms: " + ", ".join(f"{k}={v:.3f}" for k, v in stats.items()))
+        backend.close()
+
+    if args.remote:
+        from allin_app.core.config import settings
+        from allin_app.memory.backends import Mem0Backend
+        if not settings.mem0_api_key:
+            print("remote: MEM0_API_KEY not set, skipping.")
+            return
+        remote = Mem0Backend(api_key=settings.mem0_api_key)
+        stats = _time_searches(remote, "bench_user", queries[:20], args.limit)
+        print("mem0 search ms:  " + ", ".join(f"{k}={v:.3f}" for k, v in stats.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# Startup and shutdown timing: import time, time to accept, time to ready, and drain on SIGTERM
+#
+# Import: `import main` in a fresh interpreter, repeated --runs times (the cost every
+# uvicorn worker pays before it can listen).
+# Startup: launches uvicorn with the offline fakes (LIVE_API_BACKEND=fake,
+# MEMORY_BACKEND=fake) and polls until
+#   accepting: GET /health answers (liveness; the lifespan does not block on initialization)
+#   ready:     GET /health/ready returns 200 (clients, memory and stores initialized)
+# and prints the per-component times from GET /admin/startup. Components start
+# concurrently, so "ready" tracks the slowest one rather than their sum.
+# Shutdown: sends SIGTERM and measures the time until the process exits.
+#
+# Usage (from the project root):
+#   python -m benchmarks.startup_bench --runs 5
+#   python -m benchmarks.startup_bench --memory-latency-ms 400 --runs 3
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+_IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _get(port: int, path: str):
+    """(status, parsed JSON body) or None when the server does not answer yet."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        conn.request("GET", path)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read() or b"null")
+    except (OSError, ValueError):
+        return None
+    finally:
+        conn.close()
+
+
+def _env(args, data_dir: str) -> dict:
+    return dict(os.environ,
+                LIVE_API_BACKEND="fake", MEMORY_BACKEND="fake", LOG_LEVEL="WARNING", LOG_FILE_ENABLED="false",
+                FAKE_MEMORY_LATENCY_MS=str(args.memory_latency_ms), FAKE_LIVE_CONNECT_MS=str(args.connect_ms),
+                HISTORY_DB_PATH=os.path.join(data_dir, "history.db"),
+                SESSION_HANDLE_DB_PATH=os.path.join(data_dir, "session_handles.db"),
+                MEMORY_INGEST_SPOOL_PATH=os.path.join(data_dir, "spool.jsonl"),
+                RAG_INDEX_DIR=os.path.join(data_dir, "knowledge_index"))
+
+
+def measure_import(args, env: dict) -> list:
+    samples = []
+    for _ in range(args.runs):
+        out = subprocess.run([sys.executable, "-c", _IMPORT_SNIPPET], env=env, capture_output=True, text=True,
+                             check=True)
+        samples.append(float(out.stdout.strip().splitlines()[-1]) * 1000)
+    return samples
+
+
+def measure_server(args, env: dict) -> dict:
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+                               "--log-level", "warning"], env=env, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL)
+    result = {"accepting_ms": None, "ready_ms": None, "shutdown_ms": None, "startup": {}}
+    try:
+        deadline = started + args.timeout
+        while time.perf_counter() < deadline and server.poll() is None:
+            if result["accepting_ms"] is None:
+                if _get(port, "/health"):
+                    result["accepting_ms"] = (time.perf_counter() - started) * 1000
+            else:
+                ready = _get(port, "/health/ready")
+                if ready and ready[0] == 200:
+                    result["ready_ms"] = (time.perf_counter() - started) * 1000
+                    break
+            time.sleep(0.005)
+        startup = _get(port, "/admin/startup")
+        result["startup"] = startup[1].get("startup_ms", {}) if startup else {}
+    finally:
+        stopping = time.perf_counter()
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=args.timeout)
+            result["shutdown_ms"] = (time.perf_counter() - stopping) * 1000
+        except subprocess.TimeoutExpired:
+            server.kill()
+    return result
+
+
+def _summary(samples: list) -> str:
+    samples = [s for s in samples if s is not None]
+    if not samples:
+        return "n/a"
+    return f"median {statistics.median(samples):7.1f} ms (min {min(samples):7.1f}, max {max(samples):7.1f})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--memory-latency-ms", type=float, default=80.0, help="fake mem0 latency per call")
+    parser.add_argument("--connect-ms", type=float, default=150.0, help="fake Live API handshake")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for ready / exit")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        env = _env(args, data_dir)
+        print(f"import main           | {_summary(measure_import(args, env))}")
+        runs = [measure_server(args, env) for _ in range(args.runs)]
+
+    print(f"accepting (/health)   | {_summary([r['accepting_ms'] for r in runs])}")
+    print(f"ready (/health/ready) | {_summary([r['ready_ms'] for r in runs])}")
+    print(f"shutdown (SIGTERM)    | {_summary([r['shutdown_ms'] for r in runs])}")
+    components = sorted({name for r in runs for name in r["startup"]} - {"total"})
+    for name in components:
+        print(f"  init {name:<16} | {_summary([r['startup'].get(name) for r in runs])}")
+    print(f"  init total (wall)     | {_summary([r['startup'].get('total') for r in runs])}")
+
+
+if __name__ == "__main__":
+    main()
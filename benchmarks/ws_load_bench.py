@@ -0,0 +1,246 @@
+# Load test: concurrent WebSocket clients against /ws with the offline Live API and mem0 fakes
+#
+# Starts the app in a subprocess with LIVE_API_BACKEND=fake and MEMORY_BACKEND=fake
+# (core/fakes.py), so the numbers measure this server's own overhead at a fixed,
+# configurable upstream latency and spend no quota. For each concurrency level,
+# N clients connect (one user and chat each), send --turns messages one after
+# another and report:
+#   TTFT p50/p95/p99 (message sent -> first text event), turn latency p50/p95/p99
+#   (message sent -> end_of_response), completed turns (messages) per second,
+#   busy/error/failed counts, and the server's event-loop lag (GET /admin/event_loop).
+# Clients can be spread over several processes (--client-procs) so the load
+# generator is not the bottleneck; the client-side loop lag is printed as a check.
+#
+# Usage (from the project root):
+#   python -m benchmarks.ws_load_bench --concurrency 100,500,1000 --turns 5
+#   python -m benchmarks.ws_load_bench --concurrency 2000,5000 --client-procs 4 --first-token-ms 300 --token-rate 50
+#   python -m benchmarks.ws_load_bench --url ws://127.0.0.1:8000 --concurrency 200   # an already running server
+import argparse
+import asyncio
+import http.client
+import json
+import multiprocessing
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlparse
+
+import websockets
+
+
+def _raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _get_json(base_url: str, path: str):
+    parsed = urlparse(base_url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=30)
+    try:
+        conn.request("GET", path)
+        response = conn.getresponse()
+        body = response.read()
+        return json.loads(body) if response.status == 200 else None
+    finally:
+        conn.close()
+
+
+def _percentile(samples: list, q: float) -> float:
+    if not samples:
+        return float("nan")
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+# --- Client side ---
+
+async def _client(url: str, user: str, turns: int, think: float, results: dict, start: asyncio.Event):
+    try:
+        async with websockets.connect(f"{url}/ws/{user}/{user}-chat", max_size=None, open_timeout=60) as ws:
+            results["connected"] += 1
+            await start.wait()
+            for turn in range(turns):
+                sent = time.perf_counter()
+                results["first_send"] = min(results["first_send"], time.time())
+                await ws.send(json.dumps({"message": f"How do I deploy the service? ({turn})"}))
+                first = None
+                while True:
+                    event = json.loads(await ws.recv())
+                    kind = event.get("type")
+                    if kind in ("text", "code", "code_result", "code_error") and first is None:
+                        first = time.perf_counter()
+                        results["ttft_ms"].append((first - sent) * 1000)
+                    elif kind == "busy":
+                        results["busy"] += 1
+                    elif kind in ("error", "api_error"):
+                        results["errors"] += 1
+                    elif kind == "end_of_response":
+                        break
+                results["turn_ms"].append((time.perf_counter() - sent) * 1000)
+                results["turns"] += 1
+                results["last_end"] = max(results["last_end"], time.time())
+                if think:
+                    await asyncio.sleep(think)
+    except Exception as e:
+        results["failed"] += 1
+        results["last_error"] = repr(e)
+
+
+async def _loop_lag(samples: list, stop: asyncio.Event, interval: float = 0.05):
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, (time.perf_counter() - expected) * 1000))
+
+
+async def _run_clients(url: str, first_user: int, clients: int, turns: int, think: float, connect_rate: int) -> dict:
+    results = {"connected": 0, "turns": 0, "busy": 0, "errors": 0, "failed": 0, "last_error": None,
+               "ttft_ms": [], "turn_ms": [], "client_lag_ms": [], "first_send": float("inf"), "last_end": 0.0}
+    start, stop = asyncio.Event(), asyncio.Event()
+    lag_task = asyncio.create_task(_loop_lag(results["client_lag_ms"], stop))
+    tasks = []
+    for i in range(clients):
+        tasks.append(asyncio.create_task(_client(url, f"load-{first_user + i}", turns, think, results, start)))
+        if connect_rate and (i + 1) % connect_rate == 0:
+            await asyncio.sleep(1) # ramp: at most `connect_rate` handshakes per second
+    while results["connected"] + results["failed"] < clients:
+        await asyncio.sleep(0.05)
+    start.set()
+    await asyncio.gather(*tasks)
+    stop.set()
+    await lag_task
+    return results
+
+
+def _client_process(args: tuple) -> dict:
+    _raise_fd_limit()
+    return asyncio.run(_run_clients(*args))
+
+
+# --- Server side ---
+
+def _start_server(args, data_dir: str):
+    port = _free_port()
+    env = dict(os.environ,
+               LIVE_API_BACKEND="fake", MEMORY_BACKEND="fake", LOG_LEVEL=args.server_log_level,
+               FAKE_LIVE_CONNECT_MS=str(args.connect_ms), FAKE_LIVE_FIRST_TOKEN_MS=str(args.first_token_ms),
+               FAKE_LIVE_TOKEN_RATE=str(args.token_rate), FAKE_LIVE_JITTER_MS=str(args.jitter_ms),
+               FAKE_LIVE_RESPONSE_TOKENS=str(args.response_tokens),
+               FAKE_LIVE_CODE_PROBABILITY=str(args.code_probability),
+               FAKE_MEMORY_LATENCY_MS=str(args.memory_latency_ms),
+               # Admission limits far above the load, so the numbers show serving cost rather than rejections
+               ADMISSION_MAX_SESSIONS="1000000", ADMISSION_MAX_SESSIONS_PER_USER="1000",
+               ADMISSION_MAX_CONCURRENT_TURNS="1000000", ADMISSION_USER_RATE="1000", ADMISSION_USER_BURST="1000",
+               HISTORY_DB_PATH=os.path.join(data_dir, "history.db"),
+               SESSION_HANDLE_DB_PATH=os.path.join(data_dir, "session_handles.db"),
+               MEMORY_INGEST_SPOOL_PATH=os.path.join(data_dir, "spool.jsonl"),
+               RAG_INDEX_DIR=os.path.join(data_dir, "knowledge_index"))
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+                               "--log-level", "warning", "--backlog", "4096"],
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while True:
+        try:
+            _get_json(base_url, "/health")
+            return server, base_url
+        except OSError:
+            if time.time() > deadline or server.poll() is not None:
+                server.kill()
+                raise RuntimeError("Server did not start.")
+            time.sleep(0.2)
+
+
+def _run_level(args, base_url: str, level: int, first_user: int):
+    ws_url = base_url.replace("http", "ws", 1)
+    procs = max(1, min(args.client_procs, level))
+    shares = [level // procs + (1 if i < level % procs else 0) for i in range(procs)]
+    connect_rate = max(1, args.connect_rate // procs) if args.connect_rate else 0
+    jobs, offset = [], first_user
+    for share in shares:
+        jobs.append((ws_url, offset, share, args.turns, args.think_ms / 1000, connect_rate))
+        offset += share
+
+    _get_json(base_url, "/admin/event_loop?reset=true")
+    if procs == 1:
+        parts = [asyncio.run(_run_clients(*jobs[0]))]
+    else:
+        with multiprocessing.get_context("spawn").Pool(procs) as pool:
+            parts = pool.map(_client_process, jobs)
+    server_loop = _get_json(base_url, "/admin/event_loop")
+
+    merged = {key: [] for key in ("ttft_ms", "turn_ms", "client_lag_ms")}
+    counts = {key: 0 for key in ("connected", "turns", "busy", "errors", "failed")}
+    errors = [part["last_error"] for part in parts if part["last_error"]]
+    for part in parts:
+        for key in merged:
+            merged[key].extend(part[key])
+        for key in counts:
+            counts[key] += part[key]
+    elapsed = max(part["last_end"] for part in parts) - min(part["first_send"] for part in parts)
+    rate = counts["turns"] / elapsed if elapsed > 0 else 0.0
+    lag = (server_loop or {}).get("lag_ms", {})
+    print(f"{level:>6} clients | TTFT p50 {_percentile(merged['ttft_ms'], 0.5):7.1f} p95 {_percentile(merged['ttft_ms'], 0.95):7.1f} "
+          f"p99 {_percentile(merged['ttft_ms'], 0.99):7.1f} ms | turn p50 {_percentile(merged['turn_ms'], 0.5):7.1f} "
+          f"p95 {_percentile(merged['turn_ms'], 0.95):7.1f} p99 {_percentile(merged['turn_ms'], 0.99):7.1f} ms | "
+          f"{rate:7.1f} msg/s | server loop lag p50 {lag.get('p50', float('nan')):6.1f} "
+          f"p99 {lag.get('p99', float('nan')):6.1f} max {lag.get('max', float('nan')):6.1f} ms | "
+          f"client lag p99 {_percentile(merged['client_lag_ms'], 0.99):6.1f} ms | "
+          f"turns {counts['turns']} busy {counts['busy']} errors {counts['errors']} failed {counts['failed']}")
+    if errors:
+        print(f"         last client error: {errors[-1]}")
+    return offset
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", default="50,200,1000", help="comma-separated client counts")
+    parser.add_argument("--turns", type=int, default=3, help="messages per client")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="pause between a client's turns")
+    parser.add_argument("--client-procs", type=int, default=1, help="processes generating load")
+    parser.add_argument("--connect-rate", type=int, default=500, help="new connections per second (0: unthrottled)")
+    parser.add_argument("--url", help="target an already running server (ws://host:port) instead of starting one")
+    # Fake upstream behaviour (ignored with --url; set FAKE_* on that server instead)
+    parser.add_argument("--connect-ms", type=float, default=150.0)
+    parser.add_argument("--first-token-ms", type=float, default=300.0)
+    parser.add_argument("--token-rate", type=float, default=50.0, help="tokens per second")
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--response-tokens", type=int, default=60)
+    parser.add_argument("--code-probability", type=float, default=0.0)
+    parser.add_argument("--memory-latency-ms", type=float, default=80.0)
+    parser.add_argument("--server-log-level", default="WARNING")
+    args = parser.parse_args()
+    _raise_fd_limit() # inherited by the server process
+
+    levels = [int(level) for level in args.concurrency.split(",") if level]
+    with tempfile.TemporaryDirectory() as data_dir:
+        server = None
+        if args.url:
+            base_url = args.url.replace("ws", "http", 1)
+        else:
+            server, base_url = _start_server(args, data_dir)
+            print(f"Fake upstream: connect {args.connect_ms:.0f} ms, first token {args.first_token_ms:.0f} ms, "
+                  f"{args.token_rate:.0f} tokens/s x {args.response_tokens}, memory {args.memory_latency_ms:.0f} ms")
+        try:
+            first_user = 0
+            for level in levels:
+                first_user = _run_level(args, base_url, level, first_user) # fresh users per level
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
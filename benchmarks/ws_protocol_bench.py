@@ -0,0 +1,95 @@
+# Benchmark: /ws wire encodings — frames and bytes per turn, encode/decode throughput
+#
+# Replays synthetic assistant turns (streamed text deltas, a code block and a
+# large code output) through each codec and reports:
+#   frames/turn, payload bytes/turn, bytes/turn after transport-level
+#   permessage-deflate (emulated with a shared zlib stream, as negotiated by
+#   uvicorn/websockets), and encode+decode throughput in frames and turns per second.
+#
+# "v1 json (before)" is the original behaviour: an end_of_response frame after
+# every part.
+#
+# Usage (from the project root):
+#   python -m benchmarks.ws_protocol_bench --turns 200 --code-output-kb 20
+import argparse
+import random
+import time
+import zlib
+
+from allin_app.api.protocol import END_OF_TURN, CompactJsonCodec, LegacyJsonCodec, MsgpackCodec, msgpack
+
+_WORDS = ("the", "deploy", "service", "config", "returns", "error", "python", "function", "request",
+          "database", "token", "cache", "worker", "handler", "timeout", "retry", "value", "list")
+
+
+def _synthetic_turn(rng: random.Random, deltas: int, code_output_kb: int) -> list:
+    events = [{"type": "text", "content": " ".join(rng.choice(_WORDS) for _ in range(rng.randint(6, 14))) + " "}
+              for _ in range(deltas)]
+    code = "\n".join(f"result_{i} = compute({i}, retries={i % 3})" for i in range(30))
+    output = "\n".join(f"row {i}: status=ok latency_ms={rng.randint(1, 500)} user=user{rng.randint(1, 50)}"
+                       for i in range(code_output_kb * 1024 // 48))
+    events.insert(deltas // 2, {"type": "code", "content": code})
+    events.insert(deltas // 2 + 1, {"type": "code_result", "content": output})
+    return events
+
+
+def _frames(codec, turn: list, legacy_per_part_end: bool) -> list:
+    frames = []
+    for event in turn:
+        frames.append(codec.encode(event))
+        if legacy_per_part_end:
+            frames.append(codec.encode(END_OF_TURN))
+    if not legacy_per_part_end:
+        frames.append(codec.encode(END_OF_TURN))
+    return frames
+
+
+def _deflated_size(frames: list) -> int:
+    """Bytes on the wire with permessage-deflate (context takeover, sync flush minus the 4-byte tail)."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    total = 0
+    for frame in frames:
+        data = frame if isinstance(frame, bytes) else frame.encode("utf-8")
+        total += len(compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)) - 4
+    return total
+
+
+def run(label: str, codec, turns: list, legacy_per_part_end: bool = False):
+    all_frames = [_frames(codec, turn, legacy_per_part_end) for turn in turns]
+    frame_count = sum(len(frames) for frames in all_frames)
+    payload = sum(len(f if isinstance(f, bytes) else f.encode("utf-8")) for frames in all_frames for f in frames)
+    deflated = sum(_deflated_size(frames) for frames in all_frames)
+
+    started = time.perf_counter()
+    for turn in turns:
+        for frame in _frames(codec, turn, legacy_per_part_end):
+            codec.decode(frame)
+    elapsed = time.perf_counter() - started
+
+    print(f"{label:<22} | frames/turn {frame_count / len(turns):6.1f} | bytes/turn {payload / len(turns):9.0f} | "
+          f"deflated {deflated / len(turns):8.0f} | encode+decode {frame_count / elapsed:9.0f} frames/s, "
+          f"{len(turns) / elapsed:7.0f} turns/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--deltas", type=int, default=40, help="streamed text parts per turn")
+    parser.add_argument("--code-output-kb", type=int, default=20)
+    parser.add_argument("--compress-threshold", type=int, default=4096)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    turns = [_synthetic_turn(rng, args.deltas, args.code_output_kb) for _ in range(args.turns)]
+    run("v1 json (before)", LegacyJsonCodec(), turns, legacy_per_part_end=True)
+    run("v1 json", LegacyJsonCodec(), turns)
+    run("v2 json", CompactJsonCodec(), turns)
+    if msgpack is None:
+        print("msgpack not installed; skipping the binary encoding.")
+        return
+    run("v2 msgpack", MsgpackCodec(compress_threshold=0), turns)
+    run(f"v2 msgpack+zlib>={args.compress_threshold}", MsgpackCodec(compress_threshold=args.compress_threshold), turns)
+
+
+if __name__ == "__main__":
+    main()
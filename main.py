@@ -1,16 +1,42 @@
+from contextlib import asynccontextmanager
+import os
+
 from fastapi import FastAPI
 # Import logger first to ensure it's configured
 from allin_app.core.logging_config import logger
 # Import routers
-from allin_app.api.endpoints import websocket, root, chat #, admin, health
+from allin_app.api.endpoints import websocket, root, chat, admin, health
+from allin_app.api.middleware import CorrelationIdMiddleware
+from allin_app.core import dependencies
+from allin_app.core.interaction import cleanup_interaction
 
 logger.info("Starting Allin AI Assistant application...")
 
+# --- Lifespan ---
+# Startup: the InteractionManager builds its clients concurrently in the background, so the
+# server accepts right away; /health/ready reports 503 and /ws connections wait until it is ready.
+# Shutdown: new sessions and turns are refused, in-flight turns and pending memory / chat
+# history writes drain (SHUTDOWN_DRAIN_SECONDS), then the clients close.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    manager = dependencies.get_interaction_manager()
+    monitor = dependencies.get_loop_monitor()
+    monitor.start()
+    manager.start()
+    try:
+        yield
+    finally:
+        await cleanup_interaction(manager)
+        await monitor.stop()
+
 app = FastAPI(
     title="Allin AI Assistant", 
     version="0.1.0",
-    description="AI assistant for new software engineers by Team 8."
+    description="AI assistant for new software engineers by Team 8.",
+    lifespan=lifespan,
 )
+# Every log record of a request / WebSocket connection carries its request_id
+app.add_middleware(CorrelationIdMiddleware)
 
 @app.get("/", tags=["Root"])
 async def read_root():
@@ -21,14 +47,15 @@ async def read_root():
 @app.get("/health", tags=["Health"])
 async def health_check():
     logger.debug("Health check endpoint '/health' accessed.")
-    # TODO: Add more comprehensive health checks later
+    # Liveness only; dependency checks are in /health/ready (api/endpoints/health.py)
     return {"status": "ok"}
 
 # Include routers
 app.include_router(websocket.router)
 app.include_router(root.router)
 app.include_router(chat.router, prefix="/api/v1/chat", tags=["Chat"]) # Added prefix and tag
-# app.include_router(admin.router)   # To be added in Phase 4
+app.include_router(admin.router)
+app.include_router(health.router)
 
 logger.info("FastAPI application configured and routers included.")
 
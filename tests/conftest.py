@@ -0,0 +1,34 @@
+# Test settings: no log files, offline fakes for the Live API and mem0, data files in a temporary directory
+import os
+import tempfile
+
+import pytest
+
+_DATA_DIR = tempfile.mkdtemp(prefix="allin-tests-")
+
+os.environ.setdefault("LOG_FILE_ENABLED", "false")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("LIVE_API_BACKEND", "fake")
+os.environ.setdefault("MEMORY_BACKEND", "fake")
+os.environ.setdefault("FAKE_LIVE_CONNECT_MS", "0")
+os.environ.setdefault("FAKE_LIVE_FIRST_TOKEN_MS", "0")
+os.environ.setdefault("FAKE_LIVE_TOKEN_RATE", "0")
+os.environ.setdefault("FAKE_LIVE_JITTER_MS", "0")
+os.environ.setdefault("FAKE_MEMORY_LATENCY_MS", "0")
+os.environ.setdefault("FAKE_MEMORY_JITTER_MS", "0")
+os.environ.setdefault("LIVE_POOL_SIZE", "0")
+for _name, _file in (("HISTORY_DB_PATH", "history.db"), ("SESSION_HANDLE_DB_PATH", "session_handles.db"),
+                     ("MEMORY_INGEST_SPOOL_PATH", "memory_spool.jsonl"), ("RAG_INDEX_DIR", "knowledge_index"),
+                     ("LOCAL_MEMORY_DB_PATH", "memory.db"), ("CODE_OUTPUT_SPOOL_DIR", "code_outputs")):
+    os.environ.setdefault(_name, os.path.join(_DATA_DIR, _file))
+
+
+@pytest.fixture(scope="session")
+def client():
+    """The app with its lifespan running (started once: the interaction manager is a process-wide singleton)."""
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
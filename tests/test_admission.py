@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from allin_app.core.admission import AdmissionController, AdmissionRejected
+
+
+def _controller(**kwargs):
+    options = dict(max_concurrent_turns=1, user_rate=0.0, user_burst=100.0, queue_slo_seconds=5.0)
+    options.update(kwargs)
+    return AdmissionController(**options)
+
+
+async def _grant_order(admission, users):
+    """Queues one turn per entry of `users` (in order) behind a held slot; returns the order they ran in."""
+    order = []
+    release = asyncio.Event()
+
+    async def holder():
+        async with admission.turn("holder"):
+            await release.wait()
+
+    async def turn(user_id):
+        async with admission.turn(user_id):
+            order.append(user_id)
+
+    tasks = [asyncio.create_task(holder())]
+    await asyncio.sleep(0)
+    for user_id in users:
+        tasks.append(asyncio.create_task(turn(user_id)))
+        await asyncio.sleep(0)
+    assert admission.queued_turns == len(users)
+    release.set()
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_fair_queue_interleaves_users():
+    order = asyncio.run(_grant_order(_controller(), ["a", "a", "a", "b"]))
+    assert order == ["a", "b", "a", "a"]
+
+
+def test_weighted_fair_queue_uses_configured_weights():
+    admission = _controller(user_weights={"a": 2.0})
+    assert admission.weight_for("a") == 2.0 and admission.weight_for("b") == 1.0
+    order = asyncio.run(_grant_order(admission, ["a"] * 4 + ["b"] * 4))
+    assert order[:6].count("a") == 4 # twice b's share while both are backlogged
+    assert order == ["a", "a", "b", "a", "a", "b", "b", "b"]
+
+
+def test_non_positive_weights_are_rejected():
+    with pytest.raises(ValueError):
+        _controller(user_weights={"a": 0})
+
+
+def test_queue_wait_over_slo_is_rejected_as_busy():
+    admission = _controller(queue_slo_seconds=0.05)
+
+    async def run():
+        release = asyncio.Event()
+
+        async def holder():
+            async with admission.turn("holder"):
+                await release.wait()
+
+        task = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with admission.turn("late"):
+                pass
+        release.set()
+        await task
+        return rejected.value
+
+    assert asyncio.run(run()).reason == "busy"
+    assert admission.queued_turns == 0 and admission.active_turns == 0
+
+
+def test_rate_limit_and_session_caps():
+    admission = AdmissionController(max_sessions=2, max_sessions_per_user=1, user_rate=0.0, user_burst=1.0)
+    admission.open_session("a")
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.open_session("a")
+    assert rejected.value.reason == "user_sessions"
+    admission.open_session("b")
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.open_session("c")
+    assert rejected.value.reason == "sessions"
+    admission.close_session("b")
+    assert admission.session_count == 1
+
+    async def two_turns():
+        async with admission.turn("a"):
+            pass
+        async with admission.turn("a"):
+            pass
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        asyncio.run(two_turns())
+    assert rejected.value.reason == "rate_limited"
+
+
+def test_closed_controller_rejects_new_work():
+    admission = _controller()
+    admission.close()
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.open_session("a")
+    assert rejected.value.reason == "shutting_down"
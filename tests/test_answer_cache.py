@@ -0,0 +1,65 @@
+import asyncio
+import threading
+
+import numpy as np
+
+from allin_app.rag.answer_cache import SemanticAnswerCache
+from allin_app.rag.rag_handler import RAGHandler
+
+DIM = 8
+
+
+def _unit(*values):
+    vector = np.array(values + (0.0,) * (DIM - len(values)), dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def _chunks(*rows):
+    return [{"row": row, "doc_id": f"doc{row}"} for row in rows]
+
+
+def test_validation_runs_outside_the_lock_and_falls_back_to_the_next_match():
+    cache = SemanticAnswerCache(DIM, max_entries=4, threshold=0.9)
+    cache.put("q1", _unit(1.0), "stale answer", _chunks(1))
+    cache.put("q2", _unit(1.0, 0.1), "live answer", _chunks(2))
+    checked = []
+
+    def is_valid(rows):
+        assert not cache._lock.locked()
+        checked.append(rows)
+        return rows != (1,)
+
+    assert cache.lookup(_unit(1.0), is_valid=is_valid) == "live answer"
+    assert checked == [(1,), (2,)]
+    stats = cache.get_stats()
+    assert (stats["entries"], stats["stale_rejected"], stats["hits"], stats["lookups"]) == (1, 1, 1, 1)
+
+
+def test_entry_invalidated_during_validation_is_not_removed_twice():
+    cache = SemanticAnswerCache(DIM, max_entries=4, threshold=0.9)
+    cache.put("q1", _unit(1.0), "answer", _chunks(1))
+
+    def is_valid(rows):
+        cache.invalidate_documents(["doc1"]) # e.g. knowledge sync on another thread
+        cache.put("q3", _unit(0.0, 1.0), "other", _chunks(3)) # reuses the freed slot
+        return False
+
+    assert cache.lookup(_unit(1.0), is_valid=is_valid) is None
+    assert cache.lookup(_unit(0.0, 1.0)) == "other"
+
+
+def test_cached_answer_lookup_runs_off_the_event_loop(tmp_path):
+    handler = RAGHandler(index_dir=str(tmp_path / "index"))
+    assert handler.answer_cache is not None
+    query_vector = handler.embedder.embed_one("what is alpha")
+    handler.answer_cache.put("what is alpha", query_vector, "alpha answer", [])
+    threads = []
+    lookup = handler.answer_cache.lookup
+
+    def _lookup(*args, **kwargs):
+        threads.append(threading.get_ident())
+        return lookup(*args, **kwargs)
+
+    handler.answer_cache.lookup = _lookup
+    assert asyncio.run(handler.generate_response("what is alpha")) == "alpha answer"
+    assert threads and threads[0] != threading.get_ident()
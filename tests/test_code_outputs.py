@@ -0,0 +1,28 @@
+import os
+
+from allin_app.core.dependencies import get_interaction_manager
+
+
+def test_spooled_output_is_served_with_validators(client):
+    spool = get_interaction_manager().blob_spool
+    ref = spool.put_text("line\n" * 50000)
+    response = client.get(f"/api/v1/chat/code_outputs/{ref.digest}")
+    assert response.status_code == 200
+    assert response.text == "line\n" * 50000
+    assert response.headers["content-length"] == str(ref.size)
+    assert response.headers["etag"] == f'"{ref.digest}"'
+    assert "immutable" not in response.headers["cache-control"]
+
+
+def test_unknown_or_malformed_digest_is_404(client):
+    assert client.get("/api/v1/chat/code_outputs/" + "0" * 64).status_code == 404
+    assert client.get("/api/v1/chat/code_outputs/not-a-digest").status_code == 404
+
+
+def test_blob_pruned_after_lookup_is_404(client, monkeypatch):
+    spool = get_interaction_manager().blob_spool
+    ref = spool.put_text("short lived")
+    path = spool.path(ref.digest)
+    os.remove(path) # pruned between path() and opening the file
+    monkeypatch.setattr(spool, "path", lambda digest: path)
+    assert client.get(f"/api/v1/chat/code_outputs/{ref.digest}").status_code == 404
@@ -0,0 +1,65 @@
+from allin_app.core.context import MemoryContextBuilder
+
+
+class Session:
+    pass
+
+
+def _memories(*texts):
+    return [{"id": str(i), "memory": text, "score": 1.0 - i / 10} for i, text in enumerate(texts)]
+
+
+MEMORIES = _memories("The user prefers dark roast coffee in the morning",
+                     "The user is training for a marathon in April",
+                     "The user has a cat called Miso")
+
+
+def test_memories_are_suppressed_only_after_mark_sent():
+    builder = MemoryContextBuilder(token_budget=400)
+    session = Session()
+
+    text, report, selected = builder.build(MEMORIES, live_session=session)
+    assert report["sent"] == 3 and len(selected) == 3
+    # The send failed: nothing was marked, so the next turn sends the same context
+    text_again, report, selected = builder.build(MEMORIES, live_session=session)
+    assert text_again == text and report["sent"] == 3
+
+    builder.mark_sent(session, selected)
+    text, report, selected = builder.build(MEMORIES, live_session=session)
+    assert text is None and report["sent"] == 0 and selected == {}
+
+
+def test_sent_memories_are_per_session():
+    builder = MemoryContextBuilder(token_budget=400)
+    first, second = Session(), Session()
+    _, _, selected = builder.build(MEMORIES, live_session=first)
+    builder.mark_sent(first, selected)
+    _, report, _ = builder.build(MEMORIES, live_session=second)
+    assert report["sent"] == 3
+
+
+def test_near_duplicates_and_budget():
+    builder = MemoryContextBuilder(token_budget=30, duplicate_threshold=0.6)
+    memories = _memories("The user prefers dark roast coffee in the morning",
+                         "The user prefers dark roast coffee in the mornings",
+                         "The user is training for a marathon in April")
+    text, report, _ = builder.build(memories)
+    assert builder.dropped_duplicates == 1
+    assert report["tokens"] <= 30
+    assert "mornings" not in text
+
+
+def test_sent_memories_are_resent_after_the_turn_limit():
+    builder = MemoryContextBuilder(token_budget=400, resend_after_turns=2)
+    session = Session()
+    _, _, selected = builder.build(MEMORIES[:1], live_session=session)
+    builder.mark_sent(session, selected) # turn 1
+
+    for turn in (2, 3): # still within the session's recent context
+        text, report, selected = builder.build(MEMORIES[:1], live_session=session)
+        assert text is None and report["sent"] == 0
+        builder.mark_sent(session, selected)
+
+    # Sent more than two turns ago: the sliding window may have dropped it
+    _, report, selected = builder.build(MEMORIES[:1], live_session=session)
+    assert report["sent"] == 1 and list(selected) == ["0"]
@@ -0,0 +1,159 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from allin_app.rag.rag_handler import RAGHandler
+from allin_app.rag.sync import KnowledgeSync, SyncJob
+
+
+def _paragraphs(*words):
+    return "\n\n".join(f"{word} " * 150 for word in words)
+
+
+def _write(path, text, mtime_ns=None):
+    path.write_text(text, encoding="utf-8")
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(max_workers=2)
+        self.submitted = 0
+
+    def submit(self, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(*args, **kwargs)
+
+
+def _run_sync(sync, source_dir):
+    """Runs one sync pass on a thread pool (the job runner uses a process pool) and returns the job."""
+    job = SyncJob(str(source_dir))
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        asyncio.run(sync._sync(job, pool))
+    return job
+
+
+def test_sync_diffs_changed_added_and_deleted_files(tmp_path):
+    source = tmp_path / "knowledge"
+    (source / "guides").mkdir(parents=True)
+    _write(source / "a.md", _paragraphs("alpha", "bravo", "charlie"))
+    _write(source / "guides" / "b.txt", _paragraphs("delta"))
+    _write(source / "ignored.bin", "not a document")
+    handler = RAGHandler(index_dir=str(tmp_path / "index"))
+    sync = KnowledgeSync(handler, chunk_size=1000, overlap=200)
+
+    first = _run_sync(sync, source)
+    assert (first.files_total, first.files_changed, first.files_unchanged) == (2, 2, 0)
+    assert first.chunks_added > 0 and first.chunks_reused == 0
+    assert sorted(handler.store.documents()) == ["a.md", "guides/b.txt"]
+
+    # Unchanged tree: skipped on (size, mtime) without reading the files
+    again = _run_sync(sync, source)
+    assert (again.files_unchanged, again.files_changed, again.chunks_added) == (2, 0, 0)
+
+    # Touched but identical content: still no re-embedding
+    stat = os.stat(source / "a.md")
+    _write(source / "a.md", _paragraphs("alpha", "bravo", "charlie"), mtime_ns=stat.st_mtime_ns + 10**9)
+    touched = _run_sync(sync, source)
+    assert (touched.files_unchanged, touched.files_changed) == (2, 0)
+
+    # One paragraph edited, one file deleted, one added
+    _write(source / "a.md", _paragraphs("alpha", "bravo", "echo"), mtime_ns=stat.st_mtime_ns + 2 * 10**9)
+    os.remove(source / "guides" / "b.txt")
+    _write(source / "c.txt", _paragraphs("foxtrot"))
+    changed = _run_sync(sync, source)
+    assert changed.files_deleted == 1 and changed.files_changed == 2
+    assert changed.chunks_reused > 0 # the unchanged paragraphs of a.md kept their rows
+    assert changed.chunks_tombstoned > 0
+    assert sorted(handler.store.documents()) == ["a.md", "c.txt"]
+    texts = [c["text"] for c in handler.store.get_chunks([row for row, _ in handler.store.live_chunk_hashes("a.md")])]
+    assert any("echo" in text for text in texts)
+    assert not any("charlie" in text for text in texts)
+
+
+def test_sync_bounds_parses_ahead_of_embedding(tmp_path):
+    source = tmp_path / "knowledge"
+    source.mkdir()
+    for i in range(12):
+        _write(source / f"doc{i:02}.txt", _paragraphs(f"word{i}"))
+    handler = RAGHandler(index_dir=str(tmp_path / "index"))
+    sync = KnowledgeSync(handler, chunk_size=1000, overlap=200, workers=2)
+    pool = CountingExecutor()
+    ahead = []
+    sync_document = sync._sync_document
+
+    def _sync_document(job, *args):
+        ahead.append(pool.submitted - job.files_changed - 1) # parses besides the file being applied
+        sync_document(job, *args)
+
+    sync._sync_document = _sync_document
+    job = SyncJob(str(source))
+    with pool:
+        asyncio.run(sync._sync(job, pool))
+    assert job.files_changed == 12
+    assert max(ahead) <= 2 * sync.workers
+
+
+def test_sync_is_confined_to_root_and_prefixes_subdirectories(tmp_path):
+    root = tmp_path / "knowledge"
+    (root / "team").mkdir(parents=True)
+    _write(root / "top.txt", _paragraphs("alpha"))
+    _write(root / "team" / "notes.txt", _paragraphs("bravo"))
+    outside = tmp_path / "private"
+    outside.mkdir()
+    (root / "link").symlink_to(outside)
+    handler = RAGHandler(index_dir=str(tmp_path / "index"))
+    sync = KnowledgeSync(handler, chunk_size=1000, overlap=200, root=str(root))
+
+    for path in (outside, root / "link", root / ".." / "private"):
+        try:
+            sync.start(str(path))
+        except ValueError:
+            continue
+        raise AssertionError(f"{path} was accepted")
+
+    async def run(source_dir):
+        job = sync.start(str(source_dir))
+        await sync.wait(job.id)
+        return job
+
+    assert asyncio.run(run(root)).status == "completed"
+    assert sorted(handler.store.documents()) == ["team/notes.txt", "top.txt"]
+    # A subdirectory sync keeps root-relative doc_ids and leaves documents outside it alone
+    os.remove(root / "team" / "notes.txt")
+    job = asyncio.run(run(root / "team"))
+    assert job.status == "completed" and job.files_deleted == 1
+    assert handler.store.documents() == ["top.txt"]
+
+
+def test_one_sync_job_per_index_across_instances(tmp_path):
+    source = tmp_path / "knowledge"
+    source.mkdir()
+    _write(source / "a.txt", _paragraphs("alpha"))
+    handler = RAGHandler(index_dir=str(tmp_path / "index"))
+    first = KnowledgeSync(handler, chunk_size=1000, overlap=200)
+    second = KnowledgeSync(handler, chunk_size=1000, overlap=200) # as in another uvicorn worker
+
+    async def run():
+        job = first.start(str(source))
+        try:
+            second.start(str(source))
+        except RuntimeError:
+            rejected = True
+        else:
+            rejected = False
+        await first.wait(job.id)
+        retry = second.start(str(source)) # the lock is released when the job ends
+        await second.wait(retry.id)
+        return rejected, job, retry
+
+    rejected, job, retry = asyncio.run(run())
+    assert rejected
+    assert job.status == retry.status == "completed"
+
+
+def test_admin_sync_rejects_directories_outside_the_knowledge_root(client, tmp_path):
+    response = client.post("/admin/sync_knowledge", json={"source_dir": str(tmp_path)})
+    assert response.status_code == 400
+    assert "must be inside" in response.json()["detail"]
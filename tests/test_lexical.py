@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from allin_app.rag.lexical import BM25Index, reciprocal_rank_fusion, tokenize
+
+DOCS = [
+    "Set DATABASE_URL before starting the worker.",
+    "The worker retries failed jobs three times.",
+    "Call os.path.join to build paths; never concatenate strings.",
+    "Error E-1234 means the worker lost its database connection.",
+]
+
+
+def _index(docs=DOCS):
+    index = BM25Index()
+    index.add_many(enumerate(docs))
+    return index
+
+
+def test_tokenize_keeps_identifiers_and_their_parts():
+    assert tokenize("Set DATABASE_URL via os.path.join, E-1234!") == [
+        "set", "database_url", "database", "url", "via", "os.path.join", "os", "path", "join", "e-1234", "e", "1234"]
+
+
+def test_exact_identifier_ranks_first():
+    index = _index()
+    assert index.search("DATABASE_URL", k=1)[0][0] == 0
+    assert index.search("E-1234", k=1)[0][0] == 3
+    assert index.search("os.path.join", k=1)[0][0] == 2
+
+
+def test_rare_terms_outweigh_common_ones():
+    index = _index()
+    hits = index.search("worker retries", k=4)
+    assert hits[0][0] == 1 # "retries" occurs once; "worker" in three chunks
+    assert [score for _, score in hits] == sorted((score for _, score in hits), reverse=True)
+    assert {row for row, _ in hits} == {0, 1, 3}
+
+
+def test_shorter_chunk_wins_on_equal_term_frequency():
+    index = _index(["alpha beta", "alpha beta gamma delta epsilon zeta eta theta"])
+    assert [row for row, _ in index.search("alpha", k=2)] == [0, 1]
+
+
+def test_mask_and_unknown_terms():
+    index = _index()
+    mask = np.array([False, True, True, True])
+    # Row 3 still matches the "database" part of the identifier
+    assert [row for row, _ in index.search("DATABASE_URL", mask=mask)] == [3]
+    assert index.search("nonexistent") == []
+    assert index.search("") == []
+
+
+def test_rows_must_be_added_in_order():
+    index = _index()
+    with pytest.raises(ValueError):
+        index.add(10, "gap")
+    assert index.size == len(DOCS)
+
+
+def test_rrf_rewards_agreement_between_rankings():
+    vector = [(1, 0.9), (2, 0.8), (3, 0.7)]
+    lexical = [(3, 12.0), (4, 9.0), (1, 4.0)]
+    fused = reciprocal_rank_fusion([vector, lexical], k=60)
+    assert {row for row, _ in fused[:2]} == {1, 3} # found by both retrievers
+    assert {row for row, _ in fused[2:]} == {2, 4} # both ranked second once
+    assert fused[0][1] == pytest.approx(1 / 61 + 1 / 63)
+
+
+def test_rrf_ignores_raw_scores():
+    a = reciprocal_rank_fusion([[(1, 1000.0), (2, 0.001)]])
+    b = reciprocal_rank_fusion([[(1, 0.2), (2, 0.1)]])
+    assert a == b
+
+
+def test_concurrent_retrieves_extend_the_index_once(tmp_path):
+    import asyncio
+
+    from allin_app.rag.rag_handler import RAGHandler
+
+    source = tmp_path / "notes.txt"
+    source.write_text("\n\n".join(f"paragraph {i} about topic{i % 7} " * 40 for i in range(200)), encoding="utf-8")
+    RAGHandler(index_dir=str(tmp_path / "index")).ingest_file_sync(str(source))
+    handler = RAGHandler(index_dir=str(tmp_path / "index")) # fresh: its BM25 index starts empty
+    handler.retrieval_mode = "hybrid"
+
+    async def run():
+        return await asyncio.gather(*(handler.retrieve(f"topic{i}") for i in range(8)))
+
+    results = asyncio.run(run())
+    assert all(results)
+    assert handler.lexical.size == handler.store.count
@@ -0,0 +1,91 @@
+import asyncio
+
+from allin_app.core.live_pool import LiveSessionPool
+
+
+class FakeConnect:
+    """Records the handle of every connect; sessions are plain objects."""
+
+    def __init__(self):
+        self.handles = []
+        self.closed = 0
+
+    def __call__(self, handle):
+        connect = self
+
+        class _Session:
+            async def __aenter__(self):
+                connect.handles.append(handle)
+                return object()
+
+            async def __aexit__(self, *exc):
+                connect.closed += 1
+
+        return _Session()
+
+
+async def _warm_pool(connect, **kwargs):
+    pool = LiveSessionPool(connect, maintenance_interval=60.0, **kwargs)
+    pool.start()
+    for _ in range(100):
+        if pool.get_stats()["idle"] == pool.size:
+            break
+        await asyncio.sleep(0.001)
+    return pool
+
+
+def test_new_chats_use_prewarmed_sessions_and_reopened_chats_resume():
+    connect = FakeConnect()
+
+    async def run():
+        pool = await _warm_pool(connect, size=1)
+        fresh = await pool.acquire("u1", "new-chat")
+        resumed = await pool.acquire("u1", "old-chat", handle="h1")
+        stats = pool.get_stats()
+        await pool.stop()
+        return fresh, resumed, stats
+
+    fresh, resumed, stats = asyncio.run(run())
+    assert fresh.source == "prewarmed"
+    assert resumed.source == "new" and resumed.handle == "h1"
+    assert stats["without_handle"]["hits"] == 1 and stats["without_handle"]["misses"] == 0
+    assert stats["with_handle"]["hits"] == 0 and stats["with_handle"]["misses"] == 1
+    assert "h1" in connect.handles
+
+
+def test_reconnect_policy_prefers_prewarmed_unless_reconnecting():
+    connect = FakeConnect()
+
+    async def run():
+        pool = await _warm_pool(connect, size=1, resume_policy="reconnect")
+        reopened = await pool.acquire("u1", "old-chat", handle="h1")
+        for _ in range(100): # refilled in the background
+            if pool.get_stats()["idle"]:
+                break
+            await asyncio.sleep(0.001)
+        reconnected = await pool.acquire("u1", "other-chat", handle="h2", reconnect=True)
+        stats = pool.get_stats()
+        await pool.stop()
+        return reopened, reconnected, stats
+
+    reopened, reconnected, stats = asyncio.run(run())
+    assert reopened.source == "prewarmed"
+    assert reconnected.source == "new" and reconnected.handle == "h2"
+    assert stats["with_handle"]["prewarmed"] == 1 and stats["with_handle"]["connected"] == 1
+
+
+def test_released_session_is_reattached_within_grace():
+    connect = FakeConnect()
+
+    async def run():
+        pool = await _warm_pool(connect, size=0, grace_seconds=30.0)
+        lease = await pool.acquire("u1", "c1", handle="h1")
+        await pool.release(lease, "u1", "c1")
+        again = await pool.acquire("u1", "c1", handle="h1")
+        stats = pool.get_stats()
+        await pool.stop()
+        return lease, again, stats
+
+    lease, again, stats = asyncio.run(run())
+    assert again is lease and again.source == "reattached"
+    assert stats["with_handle"]["reattached"] == 1 and stats["with_handle"]["hit_rate"] == 0.5
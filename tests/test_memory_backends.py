@@ -0,0 +1,34 @@
+from allin_app.core.fakes import FakeMemoryClient
+from allin_app.memory.backends import Mem0Backend
+
+
+def _backend(memories_per_chat):
+    client = FakeMemoryClient(latency_ms=0, jitter_ms=0)
+    for chat_id, count in memories_per_chat.items():
+        for i in range(count):
+            client.add([{"role": "user", "content": f"{chat_id} memory {i}"}], user_id="u1",
+                       metadata={"chat_id": chat_id})
+    client.add([{"role": "user", "content": "someone else"}], user_id="u2", metadata={"chat_id": "c1"})
+    client.calls = 0
+    return Mem0Backend(client=client), client
+
+
+def test_mem0_iter_all_pages_through_v2_get_all():
+    backend, client = _backend({"c1": 7})
+    pages = list(backend.iter_all("u1", page_size=3))
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert [m["memory"] for page in pages for m in page] == [f"c1 memory {i}" for i in range(7)]
+    assert client.calls == 3
+
+
+def test_mem0_iter_all_applies_chat_filter():
+    backend, _ = _backend({"c1": 2, "c2": 3})
+    filters = {"AND": [{"metadata": {"chat_id": "c2"}}]}
+    memories = [m for page in backend.iter_all("u1", filters=filters, page_size=2) for m in page]
+    assert [m["memory"] for m in memories] == ["c2 memory 0", "c2 memory 1", "c2 memory 2"]
+
+
+def test_mem0_iter_all_stops_after_last_full_page():
+    backend, client = _backend({"c1": 4})
+    assert [len(page) for page in backend.iter_all("u1", page_size=2)] == [2, 2]
+    assert client.calls == 2 # the response said there is no next page
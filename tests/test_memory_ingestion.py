@@ -0,0 +1,119 @@
+import asyncio
+import json
+
+from allin_app.memory.ingestion import MemoryIngestionPipeline
+
+
+class RecordingMemoryManager:
+    def __init__(self, fail: bool = False):
+        self.calls = []
+        self.fail = fail
+
+    async def add_messages(self, user_id, messages, chat_id=None):
+        if self.fail:
+            raise ConnectionError("mem0 unavailable")
+        self.calls.append((user_id, chat_id, [m["content"] for m in messages]))
+
+
+def _turn(turn_id, user_id="u1", chat_id="c1", content="hello"):
+    return {"op": "turn", "id": turn_id, "user_id": user_id, "chat_id": chat_id,
+            "messages": [{"role": "user", "content": content}], "ts": 0.0}
+
+
+def _write_spool(path, records):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records), encoding="utf-8")
+
+
+def _spool_records(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_start_replays_unacknowledged_turns(tmp_path):
+    spool = tmp_path / "spool.jsonl"
+    _write_spool(spool, [_turn("a", content="one"), _turn("b", content="two"), {"op": "ack", "ids": ["a"]}])
+    manager = RecordingMemoryManager()
+
+    async def run():
+        pipeline = MemoryIngestionPipeline(manager, str(spool), flush_interval=0.01)
+        pipeline.start()
+        assert pipeline.get_stats()["replayed"] == 1
+        await asyncio.sleep(0.1) # flushed by the background task, without any new turn
+        assert manager.calls == [("u1", "c1", ["two"])]
+        await pipeline.stop()
+
+    asyncio.run(run())
+    assert [r["op"] for r in _spool_records(spool)] == ["turn", "ack"]
+
+
+def test_stop_without_start_drains_spooled_turns(tmp_path):
+    spool = tmp_path / "spool.jsonl"
+    _write_spool(spool, [_turn("a"), _turn("b", user_id="u2")])
+    manager = RecordingMemoryManager()
+
+    async def run():
+        pipeline = MemoryIngestionPipeline(manager, str(spool), flush_interval=60.0)
+        await pipeline.stop(timeout=5.0)
+
+    asyncio.run(run())
+    assert sorted(call[0] for call in manager.calls) == ["u1", "u2"]
+
+
+def test_unflushed_turns_survive_a_restart(tmp_path):
+    spool = tmp_path / "spool.jsonl"
+
+    async def crash():
+        pipeline = MemoryIngestionPipeline(RecordingMemoryManager(fail=True), str(spool), flush_interval=60.0)
+        pipeline.start()
+        assert pipeline.submit_turn("u1", "c1", [{"role": "user", "content": "remember me"}])
+        pipeline._task.cancel() # the process dies before anything is flushed
+
+    asyncio.run(crash())
+    manager = RecordingMemoryManager()
+
+    async def restart():
+        pipeline = MemoryIngestionPipeline(manager, str(spool), flush_interval=60.0)
+        pipeline.start()
+        await pipeline.stop(timeout=5.0)
+
+    asyncio.run(restart())
+    assert manager.calls == [("u1", "c1", ["remember me"])]
+
+
+def test_failed_flush_is_retried_then_dropped(tmp_path):
+    manager = RecordingMemoryManager(fail=True)
+
+    async def run():
+        pipeline = MemoryIngestionPipeline(manager, str(tmp_path / "spool.jsonl"), flush_interval=0.0,
+                                           max_retries=2)
+        pipeline.start()
+        pipeline.submit_turn("u1", "c1", [{"role": "user", "content": "x"}])
+        await pipeline.stop(timeout=5.0)
+        return pipeline.get_stats()
+
+    stats = asyncio.run(run())
+    assert stats["dropped"] == 1
+    assert stats["queue_depth"] == 0
+
+
+def test_spool_is_compacted_after_acknowledged_flushes(tmp_path):
+    spool = tmp_path / "spool.jsonl"
+    manager = RecordingMemoryManager()
+
+    async def run():
+        pipeline = MemoryIngestionPipeline(manager, str(spool), batch_size=1, flush_interval=0.0, compact_bytes=1024)
+        pipeline.start()
+        for i in range(50):
+            pipeline.submit_turn("u1", "c1", [{"role": "user", "content": f"message {i} " + "x" * 100}])
+            await asyncio.sleep(0)
+        await pipeline.stop(timeout=5.0)
+        return pipeline.get_stats()
+
+    stats = asyncio.run(run())
+    assert stats["flushed_turns"] == 50
+    assert stats["compactions"] >= 1
+    # Only what was written since the last compaction remains, and all of it is acknowledged
+    records = _spool_records(spool)
+    turns = {r["id"] for r in records if r["op"] == "turn"}
+    acked = {turn_id for r in records if r["op"] == "ack" for turn_id in r["ids"]}
+    assert turns <= acked
+    assert spool.stat().st_size < 50 * 150
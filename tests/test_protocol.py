@@ -0,0 +1,136 @@
+import json
+import zlib
+
+import pytest
+
+from allin_app.api.protocol import (COMPRESSED_FLAG, END_OF_TURN, CompactJsonCodec, EventType, LegacyJsonCodec,
+                                    MsgpackCodec, msgpack, negotiate)
+
+needs_msgpack = pytest.mark.skipif(msgpack is None, reason="msgpack not installed")
+
+EVENTS = [
+    {"type": "text", "content": "Hello there. "},
+    {"type": "code", "content": "print(1)"},
+    {"type": "busy", "content": "Slow down.", "reason": "rate_limited", "retry_after": 1.5},
+    {"type": "code_output_chunk", "content": "row 1\n", "seq": 0},
+    {"type": "something_new", "content": "x"},
+    END_OF_TURN,
+]
+
+
+def _codecs():
+    codecs = [LegacyJsonCodec(), CompactJsonCodec()]
+    if msgpack is not None:
+        codecs += [MsgpackCodec(), MsgpackCodec(compress_threshold=16)]
+    return codecs
+
+
+def _decode_server_frame(codec, frame) -> dict:
+    """Decodes what the server sent, as a client would."""
+    if isinstance(codec, LegacyJsonCodec):
+        return json.loads(frame)
+    if isinstance(codec, CompactJsonCodec):
+        decoded = json.loads(frame)
+    else:
+        decoded = msgpack.unpackb(frame, raw=False)
+        if decoded[0] & COMPRESSED_FLAG:
+            decoded[0] &= ~COMPRESSED_FLAG
+            decoded[1] = zlib.decompress(decoded[1]).decode("utf-8")
+    extras = decoded[2] if len(decoded) > 2 else {}
+    event = {"type": extras.get("type") or EventType(decoded[0]).name.lower()}
+    if len(decoded) > 1 and decoded[1] is not None:
+        event["content"] = decoded[1]
+    event.update((k, v) for k, v in extras.items() if k != "type")
+    return event
+
+
+@pytest.mark.parametrize("codec", _codecs(), ids=lambda codec: f"{codec.name}-{getattr(codec, 'compress_threshold', 0)}")
+def test_server_events_round_trip(codec):
+    names = {"end_of_turn": "end_of_response"}
+    for event in EVENTS:
+        decoded = _decode_server_frame(codec, codec.encode(event))
+        decoded["type"] = names.get(decoded["type"], decoded["type"])
+        assert decoded == event
+
+
+def test_compact_json_frames_use_integer_types():
+    assert CompactJsonCodec().encode(END_OF_TURN) == "[7]"
+    assert CompactJsonCodec().encode({"type": "text", "content": "hi"}) == '[1,"hi"]'
+
+
+@pytest.mark.parametrize("codec", [LegacyJsonCodec(), CompactJsonCodec()], ids=lambda codec: codec.name)
+def test_client_messages_decode(codec):
+    assert codec.decode('{"message": "hi"}') == {"message": "hi"}
+    assert codec.decode('{"type": "cancel"}') == {"type": "cancel"}
+
+
+def test_compact_json_decodes_frame_arrays():
+    assert CompactJsonCodec().decode('[1, "hi"]') == {"type": "text", "message": "hi"}
+    assert CompactJsonCodec().decode("[10]")["type"] == "cancel"
+
+
+@pytest.mark.parametrize("data", ["not json", "[]", '"a string"', "42", '["x", 1]', b"\xff\xfe"])
+def test_compact_json_rejects_malformed_frames(data):
+    with pytest.raises(ValueError):
+        CompactJsonCodec().decode(data)
+
+
+@pytest.mark.parametrize("data", ["not json", "[1, 2]", '"a string"', b"\xff\xfe", None])
+def test_legacy_json_rejects_malformed_frames(data):
+    with pytest.raises(ValueError):
+        LegacyJsonCodec().decode(data)
+
+
+@needs_msgpack
+def test_msgpack_decodes_client_frames():
+    codec = MsgpackCodec()
+    assert codec.decode(msgpack.packb({"message": "hi"})) == {"message": "hi"}
+    assert codec.decode(msgpack.packb([1, "hi"])) == {"type": "text", "message": "hi"}
+    compressed = zlib.compress("hello".encode("utf-8"))
+    assert codec.decode(msgpack.packb([1 | COMPRESSED_FLAG, compressed], use_bin_type=True))["message"] == "hello"
+    # Text frames from simple clients
+    assert codec.decode('{"message": "hi"}') == {"message": "hi"}
+
+
+@needs_msgpack
+@pytest.mark.parametrize("frame", [
+    b"\xc1", # never used in MessagePack
+    b"\x2a", # a bare integer
+    None,
+], ids=["invalid", "not-a-frame", "none"])
+def test_msgpack_rejects_malformed_frames(frame):
+    with pytest.raises(ValueError):
+        MsgpackCodec().decode(frame if frame is not None else msgpack.packb(None))
+
+
+@needs_msgpack
+@pytest.mark.parametrize("content", [
+    "not bytes", # flag set but the payload is a string
+    b"definitely not zlib",
+    zlib.compress(b"\xff\xfe invalid utf-8"),
+    zlib.compress(b"truncated stream" * 100)[:20],
+], ids=["str-payload", "not-zlib", "bad-utf8", "truncated"])
+def test_msgpack_rejects_bad_compressed_content(content):
+    frame = msgpack.packb([1 | COMPRESSED_FLAG, content], use_bin_type=True)
+    with pytest.raises(ValueError):
+        MsgpackCodec().decode(frame)
+
+
+@needs_msgpack
+def test_msgpack_refuses_decompression_bombs():
+    bomb = zlib.compress(b"a" * (64 << 20), 9) # ~64 KB on the wire
+    frame = msgpack.packb([1 | COMPRESSED_FLAG, bomb], use_bin_type=True)
+    with pytest.raises(ValueError, match="expands beyond"):
+        MsgpackCodec(max_decompressed_bytes=1 << 20).decode(frame)
+
+
+def test_negotiate_prefers_the_clients_order():
+    subprotocol, codec = negotiate(["unknown", "allin.v2.json", "allin.v1.json"])
+    assert subprotocol == "allin.v2.json"
+    assert isinstance(codec, CompactJsonCodec)
+
+
+def test_negotiate_without_an_offer_uses_v1_and_no_subprotocol():
+    subprotocol, codec = negotiate([])
+    assert subprotocol is None
+    assert isinstance(codec, LegacyJsonCodec)
@@ -0,0 +1,139 @@
+import asyncio
+import multiprocessing
+
+import numpy as np
+
+from allin_app.rag.rag_handler import RAGHandler, content_hash, upload_doc_id
+from allin_app.rag.vector_store import MmapVectorStore
+
+DIM = 8
+
+
+def _records(doc_id, texts):
+    return [{"doc_id": doc_id, "chunk_no": i, "start_offset": i * 10, "text": text, "content_hash": content_hash(text)}
+            for i, text in enumerate(texts)]
+
+
+def _unit(rows):
+    vectors = np.random.default_rng(rows).standard_normal((rows, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_append_and_search_across_handles(tmp_path):
+    writer = MmapVectorStore(str(tmp_path), dim=DIM)
+    reader = MmapVectorStore(str(tmp_path), dim=DIM)
+    vectors = _unit(3)
+    assert writer.append(vectors, _records("a", ["x", "y", "z"])) == [0, 1, 2]
+    assert reader.count == 0 # not refreshed yet
+
+    hits = reader.search(vectors[1], k=1) # search refreshes
+    assert reader.count == 3
+    assert hits[0][0] == 1
+    assert [c["text"] for c in reader.get_chunks([2, 0])] == ["z", "x"]
+
+    assert writer.append(_unit(2), _records("b", ["p", "q"])) == [3, 4]
+    reader.refresh()
+    assert reader.count == 5
+    assert reader.live_mask(["b"]).tolist() == [False, False, False, True, True]
+    writer.close()
+    reader.close()
+
+
+def test_tombstones_are_visible_to_other_handles(tmp_path):
+    writer = MmapVectorStore(str(tmp_path), dim=DIM)
+    reader = MmapVectorStore(str(tmp_path), dim=DIM)
+    vectors = _unit(3)
+    writer.append(vectors, _records("a", ["x", "y", "z"]))
+    reader.refresh()
+    assert reader.rows_live([0, 1, 2])
+
+    assert writer.tombstone_rows([1]) == 1
+    reader.refresh()
+    assert not reader.rows_live([1])
+    assert 1 not in [row for row, _ in reader.search(vectors[1], k=3)]
+    assert [row for row, _ in reader.live_chunk_hashes("a")] == [0, 2]
+
+    assert writer.tombstone_document("a") == 2
+    reader.refresh()
+    assert reader.search(vectors[0], k=3) == []
+    assert reader.documents() == []
+    writer.close()
+    reader.close()
+
+
+def test_reopened_store_rejects_other_dimension(tmp_path):
+    MmapVectorStore(str(tmp_path), dim=DIM).close()
+    try:
+        MmapVectorStore(str(tmp_path), dim=DIM * 2)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("dimension mismatch was not rejected")
+
+
+def test_reupload_replaces_only_changed_chunks(tmp_path):
+    source = tmp_path / "notes.txt"
+    handler = RAGHandler(index_dir=str(tmp_path / "index"))
+    doc_id = upload_doc_id(str(source))
+    first = ["alpha " * 150, "bravo " * 150, "charlie " * 150]
+
+    source.write_text("\n\n".join(first), encoding="utf-8")
+    assert asyncio.run(handler.upload_file(str(source))) == doc_id
+    live = len(handler.store.live_chunk_hashes(doc_id))
+    assert live > 1
+
+    # Same content again: nothing appended
+    assert handler.ingest_file_sync(str(source)) == 0
+    assert len(handler.store.live_chunk_hashes(doc_id)) == live
+    count = handler.store.count
+
+    # One paragraph changed: only its chunks are re-embedded, the old ones are tombstoned
+    source.write_text("\n\n".join(first[:2] + ["delta " * 150]), encoding="utf-8")
+    added = handler.ingest_file_sync(str(source))
+    assert 0 < added < live
+    assert handler.store.count == count + added
+    texts = [c["text"] for c in handler.store.get_chunks([row for row, _ in handler.store.live_chunk_hashes(doc_id)])]
+    assert any("delta" in text for text in texts)
+    assert not any("charlie" in text for text in texts)
+
+
+def test_same_name_in_different_directories_stays_separate(tmp_path):
+    (tmp_path / "one").mkdir()
+    (tmp_path / "two").mkdir()
+    first, second = tmp_path / "one" / "readme.txt", tmp_path / "two" / "readme.txt"
+    first.write_text("first document", encoding="utf-8")
+    second.write_text("second document", encoding="utf-8")
+    handler = RAGHandler(index_dir=str(tmp_path / "index"))
+
+    first_id = asyncio.run(handler.upload_file(str(first)))
+    second_id = asyncio.run(handler.upload_file(str(second)))
+    assert first_id != second_id
+    assert first_id.endswith("/readme.txt")
+    assert sorted(handler.store.documents()) == sorted([first_id, second_id])
+
+
+def _append_batches(index_dir, writer, batches):
+    store = MmapVectorStore(index_dir, dim=DIM)
+    for batch in range(batches):
+        texts = [f"{writer}:{batch}:{i}" for i in range(4)]
+        # The first component tags each vector with its writer, so rows can be checked against their text
+        vectors = np.full((4, DIM), float(writer), dtype=np.float32)
+        store.append(vectors, _records(f"doc{writer}", texts))
+    store.close()
+
+
+def test_concurrent_appends_from_two_processes_stay_consistent(tmp_path):
+    context = multiprocessing.get_context("spawn")
+    writers = [context.Process(target=_append_batches, args=(str(tmp_path), writer, 40)) for writer in (1, 2)]
+    for process in writers:
+        process.start()
+    for process in writers:
+        process.join(60)
+        assert process.exitcode == 0
+
+    store = MmapVectorStore(str(tmp_path), dim=DIM)
+    assert store.count == 2 * 40 * 4
+    vectors = store.vectors()
+    for chunk in store.get_chunks(list(range(store.count))):
+        assert vectors[chunk["row"], 0] == float(chunk["text"].split(":")[0])
+    store.close()
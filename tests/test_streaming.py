@@ -0,0 +1,71 @@
+import asyncio
+
+from allin_app.core.streaming import TextStreamEmitter, receive_with_deadline
+
+
+def test_boundary_split_across_fragments():
+    emitter = TextStreamEmitter("boundary", interval_ms=60_000)
+    assert emitter.push("Start") == "Start" # first fragment goes out at once
+    assert emitter.push(" it is done.") is None # no whitespace after the period yet
+    assert emitter.push(" Next") == " it is done."
+    assert emitter.flush() == " Next"
+
+
+def test_boundary_sends_up_to_last_boundary():
+    emitter = TextStreamEmitter("boundary", interval_ms=60_000)
+    emitter.push("a")
+    assert emitter.push("b. c\nd") == "b. c\n"
+    assert emitter.push("e") is None
+    assert emitter.flush() == "de"
+    assert emitter.flush() is None
+
+
+def test_interval_due_in():
+    emitter = TextStreamEmitter("interval", interval_ms=50)
+    assert emitter.due_in() is None
+    emitter.push("first")
+    assert emitter.due_in() is None # nothing pending
+    assert emitter.push("second") is None
+    assert 0 < emitter.due_in() <= 0.05
+
+
+def test_immediate_sends_every_fragment():
+    emitter = TextStreamEmitter("immediate")
+    assert [emitter.push(f) for f in ("a", "b", "")] == ["a", "b", None]
+
+
+def test_receive_with_deadline_flushes_during_upstream_pause():
+    async def upstream():
+        yield "Hello"
+        yield " there"
+        await asyncio.sleep(0.3) # the model pauses
+        yield " again"
+
+    async def run():
+        emitter = TextStreamEmitter("interval", interval_ms=20)
+        sent = []
+        async for fragment in receive_with_deadline(upstream(), emitter.due_in):
+            text = emitter.flush() if fragment is None else emitter.push(fragment)
+            if text:
+                sent.append(text)
+        return sent, emitter.flush()
+
+    # " there" is sent during the pause, not held until " again" arrives
+    assert asyncio.run(run()) == (["Hello", " there", " again"], None)
+
+
+def test_receive_with_deadline_does_not_cancel_pending_read():
+    received = []
+
+    async def upstream():
+        for i in range(3):
+            await asyncio.sleep(0.03)
+            yield i
+
+    async def run():
+        async for item in receive_with_deadline(upstream(), lambda: 0.005):
+            received.append(item)
+
+    asyncio.run(run())
+    assert [item for item in received if item is not None] == [0, 1, 2]
+    assert None in received
@@ -0,0 +1,65 @@
+import json
+
+
+def _turn(ws, decode=json.loads):
+    events = []
+    while True:
+        event = decode(ws.receive_text())
+        events.append(event)
+        if event in ([7], {"type": "end_of_response"}) or (isinstance(event, dict) and event.get("type") == "error"):
+            return events
+
+
+def test_turn_over_the_default_protocol(client):
+    with client.websocket_connect("/ws/u1/c1") as ws:
+        assert ws.accepted_subprotocol is None
+        ws.send_text(json.dumps({"message": "hello"}))
+        events = _turn(ws)
+    assert events[-1] == {"type": "end_of_response"}
+    assert any(event["type"] == "text" for event in events)
+
+
+def test_header_subprotocol_is_echoed(client):
+    with client.websocket_connect("/ws/u2/c1", subprotocols=["allin.v2.json"]) as ws:
+        assert ws.accepted_subprotocol == "allin.v2.json"
+        ws.send_text(json.dumps({"message": "hello"}))
+        assert _turn(ws)[-1] == [7]
+
+
+def test_query_protocol_selects_the_codec_without_echoing_a_subprotocol(client):
+    # The client never sent Sec-WebSocket-Protocol, so echoing one would fail its handshake
+    with client.websocket_connect("/ws/u3/c1?protocol=allin.v2.json") as ws:
+        assert ws.accepted_subprotocol is None
+        ws.send_text(json.dumps({"message": "hello"}))
+        assert _turn(ws)[-1] == [7]
+
+
+def test_undecodable_frame_gets_an_error_and_the_socket_stays_usable(client):
+    with client.websocket_connect("/ws/u4/c1") as ws:
+        ws.send_text("not json")
+        assert json.loads(ws.receive_text())["type"] == "error"
+        ws.send_text(json.dumps({"message": "hello"}))
+        assert _turn(ws)[-1] == {"type": "end_of_response"}
+
+
+def test_failed_send_replaces_the_live_session(client, monkeypatch):
+    from allin_app.core.fakes import FakeLiveSession
+
+    send = FakeLiveSession.send_client_content
+    failed = []
+
+    async def send_once_broken(self, *args, **kwargs):
+        if not failed:
+            failed.append(self)
+            self.closed = True # the upstream connection dropped
+        return await send(self, *args, **kwargs)
+
+    monkeypatch.setattr(FakeLiveSession, "send_client_content", send_once_broken)
+    with client.websocket_connect("/ws/u5/c1") as ws:
+        ws.send_text(json.dumps({"message": "hello"}))
+        events = _turn(ws)
+        assert [event["type"] for event in events] == ["api_error", "end_of_response"]
+        ws.send_text(json.dumps({"message": "hello again"}))
+        events = _turn(ws)
+    assert events[-1] == {"type": "end_of_response"}
+    assert any(event["type"] == "text" for event in events)